@@ -0,0 +1,107 @@
+"""
+Microbenchmark of parse_date_from_filename over a synthetic filename corpus.
+
+The corpus mixes camera/phone naming schemes (IMG_/VID_/PXL_ compact dates,
+dashed dates, WhatsApp, Unix timestamps) with names that carry no date. Reports
+ns per filename for the current parser and for the previous implementation
+(three re.search calls with strptime), the names only the new schemes date,
+and any name both parse to different dates.
+
+  python benchmarks/bench_date_parse.py --count 200000
+"""
+import argparse
+import json
+import random
+import re
+import time
+from datetime import datetime
+
+import fixtures  # noqa: F401  (makes the tool importable)
+from utils.date_utils import parse_date_from_filename
+
+
+def legacy_parse(filename):
+  """parse_date_from_filename before the combined matcher, kept as the baseline."""
+  match = re.search(r'(\d{8})_(\d{6})', filename)
+  if match:
+    try:
+      return datetime.strptime(match.group(1) + match.group(2), '%Y%m%d%H%M%S')
+    except Exception:
+      pass
+  match = re.search(r'(\d{4})-(\d{2})-(\d{2})[_\s](\d{2})-(\d{2})-(\d{2})', filename)
+  if match:
+    try:
+      return datetime.strptime(''.join(match.groups()), '%Y%m%d%H%M%S')
+    except Exception:
+      pass
+  match = re.search(r'(\d{10})', filename)
+  if match:
+    try:
+      return datetime.fromtimestamp(int(match.group(1)))
+    except Exception:
+      pass
+  return None
+
+
+def make_corpus(count, seed=0):
+  rng = random.Random(seed)
+  def stamp(sep='_'):
+    return (f"{rng.randint(2005, 2025)}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}{sep}"
+            f"{rng.randint(0, 23):02d}{rng.randint(0, 59):02d}{rng.randint(0, 59):02d}")
+  def dashed(sep='_', tsep='-'):
+    return (f"{rng.randint(2005, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}{sep}"
+            f"{rng.randint(0, 23):02d}{tsep}{rng.randint(0, 59):02d}{tsep}{rng.randint(0, 59):02d}")
+  makers = [
+    lambda: f"IMG_{stamp()}.jpg",
+    lambda: f"VID_{stamp()}.mp4",
+    lambda: f"PXL_{stamp()}{rng.randint(0, 999):03d}.jpg",
+    lambda: f"{stamp()}_CanonEOS5D.jpg",
+    lambda: f"Screenshot_{stamp('-')}.png",
+    lambda: f"{dashed()}.mov",
+    lambda: f"WhatsApp Image {dashed(' at ', '.')}.jpeg",
+    lambda: f"IMG-{stamp()[:8]}-WA{rng.randint(0, 9999):04d}.jpg",
+    lambda: f"clip_{rng.randint(1_000_000_000, 1_700_000_000)}.mp4",
+    lambda: f"IMG_{rng.randint(0, 9999):04d}.JPG",
+    lambda: f"DSC{rng.randint(0, 99999):05d}.JPG",
+    lambda: f"holiday photo {rng.randint(1, 500)}.png",
+  ]
+  return [rng.choice(makers)() for _ in range(count)]
+
+
+def time_parser(parse, corpus, repeat):
+  best = float('inf')
+  for _ in range(repeat):
+    start = time.perf_counter()
+    for name in corpus:
+      parse(name)
+    best = min(best, time.perf_counter() - start)
+  return round(best * 1e9 / len(corpus), 1)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--count', type=int, default=100000, help='filenames in the corpus')
+  parser.add_argument('--repeat', type=int, default=3, help='timed passes (best is reported)')
+  args = parser.parse_args()
+
+  corpus = make_corpus(args.count)
+  current = [parse_date_from_filename(name) for name in corpus]
+  legacy = [legacy_parse(name) for name in corpus]
+  # Names only the new schemes date, and names where both parse but disagree
+  newly_dated = [n for n, a, b in zip(corpus, current, legacy) if a is not None and b is None]
+  changed = [(n, str(a), str(b)) for n, a, b in zip(corpus, current, legacy) if a != b and b is not None]
+  report = {
+    'filenames': len(corpus),
+    'dated': sum(1 for dt in current if dt is not None),
+    'ns_per_name': time_parser(parse_date_from_filename, corpus, args.repeat),
+    'legacy_ns_per_name': time_parser(legacy_parse, corpus, args.repeat),
+    'newly_dated': len(newly_dated),
+    'newly_dated_examples': newly_dated[:5],
+    'changed': len(changed),
+    'changed_examples': changed[:5],
+  }
+  print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,131 @@
+"""
+Per-file cost of the real import pipeline with the current staging folder
+creation and output stamping, against the previous steps put back in place.
+
+A burst of JPEGs (half of them resized, half passed through) dated across a
+few months is imported with main.process_file, once as the code is and once
+with ensure_dir replaced by os.makedirs per file and stamp_fd disabled, so
+resized outputs are stamped by path after they are closed as before. Every
+pass starts from a fresh copy of the sources and an empty staging tree.
+Reports us per file for each, the speedup, and the makedirs/utime calls per
+file.
+
+  python benchmarks/bench_finalize.py --count 200 --folders 12
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from contextlib import ExitStack
+from unittest import mock
+
+from fixtures import exif_bytes, noise_image
+
+import main as pipeline
+from config_loader import ConfigLoader
+from utils import file_ops
+
+
+def make_sources(folder, count, folders):
+  """count JPEGs, every other one larger than photo.max_width, dated over folders months."""
+  os.makedirs(folder)
+  large, small = noise_image((2400, 1800)), noise_image((1200, 900))
+  for i in range(count):
+    month = 1 + i % folders
+    taken = f'2024:{month:02d}:01 12:{i // 60 % 60:02d}:{i % 60:02d}'
+    (large if i % 2 else small).save(os.path.join(folder, f'IMG_{i:05d}.jpg'), 'JPEG', quality=90,
+                                     exif=exif_bytes(taken=taken))
+
+
+def write_config(path, src, staging):
+  with open(path, 'w') as f:
+    f.write(f"""
+source_folder: "{src}"
+staging_folder: "{staging}"
+log_file: "{os.path.join(os.path.dirname(path), 'bench.log')}"
+duplicate_strategy: "counter"
+photo:
+  max_width: 2048
+  max_height: 2048
+  quality: 90
+  extensions: [".jpg"]
+video:
+  target_width: 1920
+  target_height: 1080
+  max_bitrate: "8M"
+  extensions: [".mp4"]
+""")
+
+
+def previous_steps():
+  """Patches that put back a makedirs per file and the path utime after close."""
+  def makedirs(path):
+    os.makedirs(path, exist_ok=True)
+  return [
+    mock.patch('main.ensure_dir', makedirs),
+    mock.patch('utils.file_ops.ensure_dir', makedirs),
+    mock.patch('media.photo.stamp_fd', return_value=False),
+  ]
+
+
+def run(root, sources, label, patches, calls=None):
+  """Import a fresh copy of sources; returns the seconds spent in process_file."""
+  src = os.path.join(root, f'{label}-src')
+  shutil.copytree(sources, src)
+  config_path = os.path.join(root, f'{label}.yaml')
+  write_config(config_path, src, os.path.join(root, f'{label}-stage'))
+  config = ConfigLoader(config_path)
+  logger = logging.getLogger('media_tool_bench')
+  logger.addHandler(logging.NullHandler())
+  logger.propagate = False
+  files = sorted(os.path.join(src, f) for f in os.listdir(src))
+  file_ops._made_dirs.clear()
+  with ExitStack() as stack:
+    for patch in patches:
+      stack.enter_context(patch)
+    if calls is not None:
+      for name in ('makedirs', 'utime'):
+        stack.enter_context(mock.patch(f'os.{name}', counted(calls, name, getattr(os, name))))
+    start = time.perf_counter()
+    for path in files:
+      _, result = pipeline.process_file(path, config, logger)
+      assert result['status'] == 'success', result
+    return time.perf_counter() - start
+
+
+def counted(calls, name, fn):
+  def wrapper(*args, **kwargs):
+    calls[name] += 1
+    return fn(*args, **kwargs)
+  return wrapper
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--count', type=int, default=200, help='files per pass')
+  parser.add_argument('--folders', type=int, default=12, help='staging month folders they land in')
+  parser.add_argument('--repeat', type=int, default=3, help='timed passes (best is reported)')
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    sources = os.path.join(tmp, 'sources')
+    make_sources(sources, args.count, args.folders)
+    report = {'files': args.count, 'folders': args.folders}
+    for name, patches in (('previous', previous_steps), ('current', list)):
+      best = min(run(tmp, sources, f'{name}{i}', patches()) for i in range(args.repeat))
+      calls = Counter()
+      run(tmp, sources, f'{name}-count', patches(), calls)
+      report[name] = {
+        'us_per_file': round(best * 1e6 / args.count, 1),
+        'calls_per_file': {call: round(calls[call] / args.count, 3) for call in ('makedirs', 'utime')},
+      }
+    report['speedup'] = round(report['previous']['us_per_file'] / report['current']['us_per_file'], 2)
+  print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+  main()
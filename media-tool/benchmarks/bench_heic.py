@@ -0,0 +1,86 @@
+"""
+Throughput of HEIC to JPEG conversion: one file at a time in-process vs the
+HeicConverter process pool fed by as many I/O threads as it has workers.
+
+Reports files per second and peak worker RSS for each, and the pool's speedup
+over the single process.
+
+  python benchmarks/bench_heic.py --count 16 --processes 4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fixtures import make_heic
+
+from media.heic import HeicConverter, convert_heic_file
+
+
+def run_single(paths, out_dir, max_size):
+  stats = []
+  start = time.perf_counter()
+  for path in paths:
+    stats.append(convert_heic_file(path, os.path.join(out_dir, os.path.basename(path) + '.jpg'),
+                                   max_size, max_size, 90))
+  return time.perf_counter() - start, stats
+
+
+def run_pooled(paths, out_dir, max_size, processes):
+  converter = HeicConverter(processes, time_budget=600, quality=90)
+  try:
+    # Warm the pool up so process start-up is not billed to the conversions
+    converter.convert(paths[0], os.path.join(out_dir, 'warmup.jpg'), max_size, max_size)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=converter.processes) as threads:
+      stats = list(threads.map(
+        lambda p: converter.convert(p, os.path.join(out_dir, os.path.basename(p) + '.jpg'), max_size, max_size),
+        paths
+      ))
+    return time.perf_counter() - start, stats
+  finally:
+    converter.shutdown()
+
+
+def report(mode, elapsed, stats, workers):
+  return {
+    'mode': mode,
+    'workers': workers,
+    'files': len(stats),
+    'files_per_sec': round(len(stats) / elapsed, 2),
+    'ms_per_file': round(elapsed * 1000 / len(stats), 1),
+    'peak_worker_rss_mb': max(s['peak_rss_mb'] or 0 for s in stats),
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--count', type=int, default=16)
+  parser.add_argument('--width', type=int, default=4032)
+  parser.add_argument('--height', type=int, default=3024)
+  parser.add_argument('--max-size', type=int, default=2048)
+  parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    src = os.path.join(tmp, 'src')
+    os.makedirs(src)
+    paths = [make_heic(os.path.join(src, f'IMG_{i:05d}.heic'), (args.width, args.height), seed=i)
+             for i in range(args.count)]
+    if None in paths:
+      sys.exit('HEIC encoding is not available here')
+    os.makedirs(os.path.join(tmp, 'single'))
+    os.makedirs(os.path.join(tmp, 'pooled'))
+    elapsed, stats = run_single(paths, os.path.join(tmp, 'single'), args.max_size)
+    results = [report('single', elapsed, stats, 1)]
+    elapsed, stats = run_pooled(paths, os.path.join(tmp, 'pooled'), args.max_size, args.processes)
+    results.append(report('pooled', elapsed, stats, args.processes))
+    results[1]['speedup'] = round(results[0]['ms_per_file'] / results[1]['ms_per_file'], 2)
+  print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,84 @@
+"""
+Per-file I/O cost of the photo path: metadata extraction followed by resize/copy.
+
+Reports wall time, file opens (via audit hook) and read syscalls / bytes read
+(from /proc/self/io on Linux) per file, for a metadata-only scan, a
+passthrough set (no resize) and a resize set. Run from the media-tool folder at two commits to compare.
+
+  python benchmarks/bench_photo_open.py --count 20
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from fixtures import make_photo_set
+
+from media.photo import Photo
+
+_opens = {'count': 0, 'prefix': None}
+
+
+def _audit(event, args):
+  if event == 'open' and _opens['prefix'] and isinstance(args[0], str) and args[0].startswith(_opens['prefix']):
+    _opens['count'] += 1
+
+
+def _proc_io():
+  try:
+    with open('/proc/self/io') as f:
+      return {k: int(v) for k, v in (line.split(': ') for line in f)}
+  except OSError:
+    return {}
+
+
+def run_set(name, paths, out_dir, max_size=None):
+  _opens['count'] = 0
+  io_before = _proc_io()
+  start = time.perf_counter()
+  for path in paths:
+    _opens['prefix'] = os.path.dirname(path)
+    photo = Photo(path)
+    if max_size:
+      photo.resize(os.path.join(out_dir, os.path.basename(path)), max_size, max_size, 90)
+    photo.close()
+  elapsed = time.perf_counter() - start
+  _opens['prefix'] = None
+  io_after = _proc_io()
+  n = len(paths)
+  result = {
+    'set': name,
+    'files': n,
+    'ms_per_file': round(elapsed * 1000 / n, 2),
+    'source_opens_per_file': round(_opens['count'] / n, 2),
+  }
+  if io_before:
+    result['read_syscalls_per_file'] = round((io_after['syscr'] - io_before['syscr']) / n, 1)
+    result['kb_read_per_file'] = round((io_after['rchar'] - io_before['rchar']) / 1024 / n, 1)
+  return result
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--count', type=int, default=10)
+  parser.add_argument('--width', type=int, default=4000)
+  parser.add_argument('--height', type=int, default=3000)
+  args = parser.parse_args()
+
+  sys.addaudithook(_audit)
+  with tempfile.TemporaryDirectory() as tmp:
+    paths = make_photo_set(os.path.join(tmp, 'src'), args.count, (args.width, args.height))
+    out_dir = os.path.join(tmp, 'out')
+    os.makedirs(out_dir)
+    results = [
+      run_set('metadata', paths, out_dir),
+      run_set('passthrough', paths, out_dir, max(args.width, args.height)),
+      run_set('resize', paths, out_dir, max(args.width, args.height) // 2),
+    ]
+  print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+  main()
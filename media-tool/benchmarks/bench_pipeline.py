@@ -0,0 +1,241 @@
+"""
+End-to-end throughput and per-stage latency of the import pipeline.
+
+Builds a synthetic source folder (large JPEGs that get resized, small JPEGs,
+PNGs and HEICs that pass through, and short H.264 clips when ffmpeg/ffprobe
+are installed), then runs process_file over it in a fresh process and reports
+as JSON:
+
+  - files/sec and MB/sec over the whole run, and peak RSS of the pipeline
+  - p50/p95/max latency per file and per stage: scan, metadata, rename,
+    resize, copy (passthrough/video transfer), timestamp
+
+Stages are timed by wrapping the functions main.py calls, so the numbers
+cover the real code paths. Save the output at two commits to compare:
+
+  python benchmarks/bench_pipeline.py --count 20 --output before.json
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from fixtures import make_heic, make_png, make_photo_set, make_video
+from utils.memory import peak_rss_mb
+
+import main as pipeline
+from config_loader import ConfigLoader
+from media.photo import Photo
+from media.video import Video
+from utils.file_ops import scan_folder_recursive
+from utils.workers import imap_bounded
+
+STAGES = ['scan', 'metadata', 'rename', 'resize', 'copy', 'timestamp']
+
+
+def percentile(values, pct):
+  """Nearest-rank percentile of values (0 if empty)."""
+  if not values:
+    return 0.0
+  ordered = sorted(values)
+  rank = max(1, math.ceil(pct / 100 * len(ordered)))
+  return ordered[rank - 1]
+
+
+def summarize(samples_ms):
+  return {
+    'count': len(samples_ms),
+    'p50_ms': round(percentile(samples_ms, 50), 2),
+    'p95_ms': round(percentile(samples_ms, 95), 2),
+    'max_ms': round(max(samples_ms, default=0.0), 2),
+    'total_ms': round(sum(samples_ms), 1),
+  }
+
+
+class StageTimer:
+  """Wraps pipeline functions in place and records how long each call takes, per stage."""
+
+  def __init__(self):
+    self.samples = defaultdict(list)
+    self._lock = threading.Lock()
+    self._patched = []
+
+  def record(self, stage, ms):
+    with self._lock:
+      self.samples[stage].append(ms)
+
+  def wrap(self, owner, name, stage):
+    original = getattr(owner, name)
+    def timed(*args, **kwargs):
+      start = time.perf_counter()
+      try:
+        result = original(*args, **kwargs)
+      finally:
+        elapsed = (time.perf_counter() - start) * 1000
+      # Photo.resize returns a transfer method when it passed the file through
+      self.record('copy' if stage == 'resize' and result is not None else stage, elapsed)
+      return result
+    self._patched.append((owner, name, original))
+    setattr(owner, name, timed)
+
+  def install(self):
+    self.wrap(Photo, '_extract_metadata', 'metadata')
+    self.wrap(Video, '_extract_metadata', 'metadata')
+    self.wrap(pipeline, 'rename_source_file', 'rename')
+    self.wrap(Photo, 'resize', 'resize')
+    self.wrap(pipeline, 'copy_file', 'copy')
+    self.wrap(pipeline, 'apply_timestamp', 'timestamp')
+
+  def uninstall(self):
+    for owner, name, original in reversed(self._patched):
+      setattr(owner, name, original)
+    self._patched = []
+
+
+def build_source(folder, count, width, height, with_videos):
+  """Create the fixture set; returns notes on any kinds that had to be skipped."""
+  notes = {}
+  make_photo_set(os.path.join(folder, 'large'), count, (width, height), prefix='IMG')
+  make_photo_set(os.path.join(folder, 'small'), count, (1600, 1200), prefix='SMALL')
+  os.makedirs(os.path.join(folder, 'png'))
+  os.makedirs(os.path.join(folder, 'heic'))
+  for i in range(count):
+    make_png(os.path.join(folder, 'png', f'Screenshot_2024060{1 + i % 9}_1200{i % 60:02d}.png'), (1280, 720), seed=i)
+  if make_heic(os.path.join(folder, 'heic', 'IMG_0000.heic'), (2000, 1500)) is None:
+    notes['heic'] = 'skipped: HEIC encoding not available'
+  else:
+    for i in range(1, count):
+      make_heic(os.path.join(folder, 'heic', f'IMG_{i:04d}.heic'), (2000, 1500), seed=i,
+                taken=f'2024:06:02 12:00:{i % 60:02d}')
+  if not with_videos:
+    notes['video'] = 'skipped: disabled'
+  elif shutil.which('ffmpeg') is None or shutil.which('ffprobe') is None:
+    notes['video'] = 'skipped: ffmpeg/ffprobe not found'
+  else:
+    os.makedirs(os.path.join(folder, 'video'))
+    for i in range(count):
+      make_video(os.path.join(folder, 'video', f'VID_{i:04d}.mp4'))
+  return notes
+
+
+def write_config(path, src, staging, io_threads):
+  with open(path, 'w') as f:
+    f.write(f"""
+source_folder: "{src}"
+staging_folder: "{staging}"
+log_file: "{os.path.join(os.path.dirname(path), 'bench.log')}"
+duplicate_strategy: "counter"
+photo:
+  max_width: 2048
+  max_height: 2048
+  quality: 90
+  extensions: [".jpg", ".jpeg", ".png", ".heic"]
+video:
+  target_width: 1920
+  target_height: 1080
+  max_bitrate: "8M"
+  extensions: [".mp4", ".mov"]
+workers:
+  io_threads: {io_threads}
+""")
+
+
+def run_pipeline(config_path):
+  """Child process: scan and import the source folder, return the measurements."""
+  config = ConfigLoader(config_path)
+  logger = logging.getLogger('media_tool_bench')
+  logger.addHandler(logging.NullHandler())
+  logger.propagate = False
+  source = config.get('source_folder')
+  extensions = config.get('photo.extensions') + config.get('video.extensions')
+
+  timer = StageTimer()
+  scan_start = time.perf_counter()
+  files = scan_folder_recursive(source, extensions)
+  timer.record('scan', (time.perf_counter() - scan_start) * 1000)
+  total_bytes = sum(os.path.getsize(f) for f in files)
+
+  file_ms = []
+  statuses = defaultdict(int)
+  def timed_file(path):
+    start = time.perf_counter()
+    _, result = pipeline.process_file(path, config, logger)
+    return (time.perf_counter() - start) * 1000, result
+
+  timer.install()
+  start = time.perf_counter()
+  try:
+    for _, (ms, result) in imap_bounded(timed_file, files, max(1, config.get('workers.io_threads', 1))):
+      file_ms.append(ms)
+      statuses[result['status']] += 1
+  finally:
+    timer.uninstall()
+  wall = time.perf_counter() - start
+
+  return {
+    'files': len(files),
+    'megabytes': round(total_bytes / 1e6, 1),
+    'io_threads': config.get('workers.io_threads', 1),
+    'wall_s': round(wall, 3),
+    'files_per_s': round(len(files) / wall, 2) if wall else 0.0,
+    'mb_per_s': round(total_bytes / 1e6 / wall, 2) if wall else 0.0,
+    'peak_rss_mb': peak_rss_mb(),
+    'results': dict(statuses),
+    'per_file': summarize(file_ms),
+    'stages': {stage: summarize(timer.samples.get(stage, [])) for stage in STAGES},
+  }
+
+
+def git_commit():
+  try:
+    return subprocess.run(
+      ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+      cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--count', type=int, default=10, help='files of each kind')
+  parser.add_argument('--width', type=int, default=4000, help='size of the large JPEGs')
+  parser.add_argument('--height', type=int, default=3000)
+  parser.add_argument('--io-threads', type=int, default=1)
+  parser.add_argument('--no-video', action='store_true')
+  parser.add_argument('--output', help='write the JSON report here as well')
+  parser.add_argument('--worker', metavar='CONFIG', help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.worker:
+    print(json.dumps(run_pipeline(args.worker)))
+    return
+
+  with tempfile.TemporaryDirectory() as tmp:
+    src = os.path.join(tmp, 'Source')
+    notes = build_source(src, args.count, args.width, args.height, not args.no_video)
+    config_path = os.path.join(tmp, 'config.yaml')
+    write_config(config_path, src, os.path.join(tmp, 'Staging'), args.io_threads)
+    # Fresh process so peak RSS covers the pipeline, not fixture generation
+    proc = subprocess.run(
+      [sys.executable, os.path.abspath(__file__), '--worker', config_path],
+      capture_output=True, text=True, check=True
+    )
+    report = {'commit': git_commit(), **json.loads(proc.stdout), 'notes': notes}
+  text = json.dumps(report, indent=2)
+  if args.output:
+    with open(args.output, 'w') as f:
+      f.write(text + '\n')
+  print(text)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,93 @@
+"""
+Compare Photo.resize modes: full-resolution decode, JPEG draft decoding and
+the memory-budgeted mode (photo.max_rss_mb, see --max-rss-mb).
+
+For each mode reports ms per file and peak RSS growth; for the other modes also
+the PSNR of their output against the full-decode output (higher is closer,
+>40 dB is visually indistinguishable).
+
+  python benchmarks/bench_resize.py --count 5 --width 8000 --height 6000
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fixtures import make_photo_set
+
+from PIL import Image, ImageChops, ImageStat
+from media.photo import Photo
+from utils.memory import peak_rss_mb
+
+
+def psnr(path_a, path_b):
+  with Image.open(path_a) as a, Image.open(path_b) as b:
+    diff = ImageChops.difference(a.convert('RGB'), b.convert('RGB'))
+    mse = sum(v * v for v in ImageStat.Stat(diff).rms) / 3
+  return float('inf') if mse == 0 else 20 * math.log10(255 / math.sqrt(mse))
+
+
+def run_mode(mode, paths, out_dir, max_size, max_rss_mb):
+  """Resize all paths in-process and return timing plus peak RSS (MB)."""
+  strategies = {}
+  start = time.perf_counter()
+  for path in paths:
+    with Photo(path) as photo:
+      photo.resize(os.path.join(out_dir, os.path.basename(path)), max_size, max_size, 90, mode,
+                   max_rss_mb=max_rss_mb)
+      strategy = (photo.resize_stats or {}).get('strategy', 'copy')
+      strategies[strategy] = strategies.get(strategy, 0) + 1
+  elapsed = time.perf_counter() - start
+  return {
+    'mode': mode,
+    'files': len(paths),
+    'ms_per_file': round(elapsed * 1000 / len(paths), 1),
+    'peak_rss_mb': peak_rss_mb(),
+    'strategies': strategies,
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--count', type=int, default=5)
+  parser.add_argument('--width', type=int, default=8000)
+  parser.add_argument('--height', type=int, default=6000)
+  parser.add_argument('--max-size', type=int, default=2048)
+  parser.add_argument('--max-rss-mb', type=int, default=512, help="RSS ceiling for 'budget' mode")
+  parser.add_argument('--worker', nargs=3, metavar=('MODE', 'SRC', 'OUT'), help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.worker:
+    # Child process: one mode per process so peak RSS is not shared between modes
+    mode, src, out = args.worker
+    paths = sorted(os.path.join(src, f) for f in os.listdir(src))
+    print(json.dumps(run_mode(mode, paths, out, args.max_size, args.max_rss_mb)))
+    return
+
+  with tempfile.TemporaryDirectory() as tmp:
+    src = os.path.join(tmp, 'src')
+    paths = make_photo_set(src, args.count, (args.width, args.height))
+    results = []
+    for mode in ('full', 'draft', 'budget'):
+      out = os.path.join(tmp, mode)
+      os.makedirs(out)
+      proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--max-size', str(args.max_size),
+         '--max-rss-mb', str(args.max_rss_mb), '--worker', mode, src, out],
+        capture_output=True, text=True, check=True
+      )
+      results.append(json.loads(proc.stdout))
+    for result in results[1:]:
+      result['psnr_vs_full_db'] = round(min(
+        psnr(os.path.join(tmp, 'full', os.path.basename(p)), os.path.join(tmp, result['mode'], os.path.basename(p)))
+        for p in paths
+      ), 2)
+  print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+  main()
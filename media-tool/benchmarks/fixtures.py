@@ -0,0 +1,80 @@
+"""Synthetic media fixtures for the benchmarks."""
+import os
+import random
+import shutil
+import subprocess
+import sys
+from typing import List, Optional, Tuple
+
+# Benchmarks run from the media-tool folder like the tests; make the tool importable
+# when a script is launched directly (python benchmarks/bench_x.py).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import piexif
+from PIL import Image
+
+
+def exif_bytes(model: str = 'Canon EOS 5D', taken: str = '2024:06:01 12:00:00') -> bytes:
+  return piexif.dump({
+    '0th': {piexif.ImageIFD.Model: model.encode()},
+    'Exif': {piexif.ExifIFD.DateTimeOriginal: taken.encode()},
+  })
+
+
+def noise_image(size: Tuple[int, int], seed: int = 0) -> Image.Image:
+  """
+  Build a photo-like image that does not compress to nothing.
+  A coarse random field is upscaled and mixed with fine noise, so JPEGs of
+  realistic size (several MB at 12MP) come out of it.
+  """
+  rnd = random.Random(seed)
+  coarse = Image.frombytes('RGB', (64, 48), bytes(rnd.getrandbits(8) for _ in range(64 * 48 * 3)))
+  base = coarse.resize(size, Image.Resampling.BICUBIC)
+  grain = Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3))
+  return Image.blend(base, grain, 0.25)
+
+
+def make_jpeg(path: str, size: Tuple[int, int], seed: int = 0, quality: int = 92, **exif_kwargs) -> str:
+  noise_image(size, seed).save(path, 'JPEG', quality=quality, exif=exif_bytes(**exif_kwargs))
+  return path
+
+
+def make_photo_set(folder: str, count: int, size: Tuple[int, int], prefix: str = 'IMG') -> List[str]:
+  """Write count JPEGs of the given size; returns their paths."""
+  os.makedirs(folder, exist_ok=True)
+  template = noise_image(size)
+  paths = []
+  for i in range(count):
+    path = os.path.join(folder, f'{prefix}_{i:05d}.jpg')
+    template.save(path, 'JPEG', quality=92, exif=exif_bytes(taken=f'2024:06:01 12:{i // 60 % 60:02d}:{i % 60:02d}'))
+    paths.append(path)
+  return paths
+
+
+def make_png(path: str, size: Tuple[int, int], seed: int = 0) -> str:
+  noise_image(size, seed).save(path, 'PNG')
+  return path
+
+
+def make_heic(path: str, size: Tuple[int, int], seed: int = 0, **exif_kwargs) -> Optional[str]:
+  """Write a HEIC photo, or return None if pillow_heif cannot encode here."""
+  try:
+    import pillow_heif
+    pillow_heif.register_heif_opener()
+    noise_image(size, seed).save(path, 'HEIF', quality=80, exif=exif_bytes(**exif_kwargs))
+  except Exception:
+    return None
+  return path
+
+
+def make_video(path: str, size: Tuple[int, int] = (640, 360), seconds: float = 1.0,
+               ffmpeg: str = 'ffmpeg') -> Optional[str]:
+  """Encode a short test-pattern H.264 clip, or return None if ffmpeg is unavailable."""
+  if shutil.which(ffmpeg) is None:
+    return None
+  subprocess.run([
+    ffmpeg, '-y', '-v', 'error', '-f', 'lavfi', '-i', f'testsrc=size={size[0]}x{size[1]}:rate=30',
+    '-t', str(seconds), '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
+    '-metadata', 'creation_time=2024-06-01T12:00:00Z', path
+  ], check=True)
+  return path
@@ -3,15 +3,41 @@
 from __future__ import annotations
 
 import os
+import threading
+import time
 import yaml
-from typing import Any, Dict, List, Tuple, Union
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple, Union
 from copy import deepcopy
 
+from media.camera_models import CameraModelMapper
 from media.exceptions import ConfigError
 
 _ENV_PREFIX = "${"
 _ENV_SUFFIX = "}"
 
+class PhotoSettings(NamedTuple):
+  """Typed, read-only view of the validated photo section."""
+  max_width: int
+  max_height: int
+  quality: int
+  resize_mode: str
+  filename_pattern: str
+  extensions: Tuple[str, ...]
+  max_rss_mb: int
+
+
+class VideoSettings(NamedTuple):
+  """Typed, read-only view of the validated video section."""
+  target_width: int
+  target_height: int
+  max_bitrate: str
+  filename_pattern: str
+  extensions: Tuple[str, ...]
+  duration_tolerance_sec: float
+  bitrate_tolerance_ratio: float
+
+
 class ConfigLoader:
   """Advanced configuration loader.
 
@@ -22,6 +48,7 @@ class ConfigLoader:
     - Environment variable substitution (${VAR})
     - Path expansion (relative to config file and ~)
     - Reload capability
+    - Frozen flat view of the validated config: get() is a single dict lookup
   """
 
   # key -> (expected_type(s), required, default)
@@ -34,6 +61,12 @@ class ConfigLoader:
     "photo.max_height": (int, True, None),
     "photo.extensions": ((list, tuple), True, None),
     "photo.filename_pattern": (str, False, "{date}_{model}.{ext}"),
+    "photo.resize_mode": (str, False, "draft"),
+    "photo.quality": (int, False, 95),
+    "photo.max_rss_mb": (int, False, 512),
+    "photo.heic.enabled": (bool, False, False),
+    "photo.heic.processes": (int, False, 0),
+    "photo.heic.time_budget_sec": ((int, float), False, 120.0),
 
     "video.target_width": (int, True, None),
     "video.target_height": (int, True, None),
@@ -42,18 +75,67 @@ class ConfigLoader:
     "video.filename_pattern": (str, False, "{date}.{ext}"),
     "video.duration_tolerance_sec": (float, False, 1.0),
     "video.bitrate_tolerance_ratio": (float, False, 1.2),
+    "video.probe_workers": (int, False, 4),
+    "video.transcode.enabled": (bool, False, False),
+    "video.transcode.max_jobs": (int, False, 0),
+    "video.transcode.threads_per_job": (int, False, 0),
+    "video.transcode.journal": (str, False, None),
 
     "duplicate_strategy": (str, False, "counter"),
+    "skip_unchanged": (bool, False, True),
     "ffmpeg_path": (str, False, None),
     "ffprobe_path": (str, False, None),
     "camera_model_mapping": (dict, False, {}),
+    "camera_model_rules": (dict, False, {}),
+
+    "metadata_cache.enabled": (bool, False, False),
+    "metadata_cache.path": (str, False, None),
+    "metadata_cache.max_entries": (int, False, 200000),
+
+    "dedup.enabled": (bool, False, False),
+    "dedup.index": (str, False, None),
+
+    "logging.async": (bool, False, False),
+    "logging.flush_interval": ((int, float), False, 1.0),
+    "logging.batch_size": (int, False, 256),
+    "logging.json_log": (str, False, None),
+
+    "manifest.enabled": (bool, False, False),
+    "manifest.path": (str, False, None),
+    "manifest.fsync": (bool, False, False),
+
+    "scan.incremental": (bool, False, False),
+    "scan.journal": (str, False, None),
+
+    "workers.io_threads": (int, False, 1),
+    "workers.resize_processes": (int, False, 0),
+    "workers.queue_size": (int, False, 0),
+
+    "watch.stable_seconds": (int, False, 5),
+    "watch.poll_interval": (int, False, 10),
+    "watch.use_inotify": (bool, False, True),
+
+    "reload.enabled": (bool, False, False),
+    "reload.check_interval": ((int, float), False, 2.0),
   }
 
+  # Keys and sections only read when the run starts; editing them needs a restart
+  STARTUP_ONLY = (
+    "source_folder", "staging_folder", "log_file", "ffmpeg_path", "ffprobe_path", "logging",
+    "metadata_cache", "dedup", "manifest", "scan", "workers", "watch", "reload",
+    "photo.heic", "photo.extensions", "video.extensions", "video.probe_workers", "video.transcode",
+  )
+
   def __init__(self, path: str, strict: bool = False):
     self.path = path
     self.strict = strict
+    # Bumped each time the config is reloaded; shown in per-file log records
+    self.generation = 1
     self._raw: Dict[str, Any] = {}
     self._config: Dict[str, Any] = {}
+    self._flat: Optional[Mapping[str, Any]] = None
+    self.photo: Optional[PhotoSettings] = None
+    self.video: Optional[VideoSettings] = None
     self._load()
     self._validate()
 
@@ -62,19 +144,43 @@ class ConfigLoader:
     if not os.path.exists(self.path):
       raise ConfigError(f"Config file not found: {self.path}")
     with open(self.path, "r", encoding="utf-8") as f:
-      data = yaml.safe_load(f) or {}
+      try:
+        data = yaml.safe_load(f) or {}
+      except yaml.YAMLError as e:
+        raise ConfigError(f"Invalid YAML in {self.path}: {e}")
     if not isinstance(data, dict):
       raise ConfigError("Top-level config must be a mapping object.")
     self._raw = data
+    self._flat = None
     substituted = self._substitute_env(deepcopy(data))
     self._config = self._expand_paths(substituted)
 
   def reload(self) -> None:
-    """Reload configuration from disk and re-validate."""
-    self._load()
-    self._validate()
+    """
+    Reload configuration from disk and re-validate. The new config is built
+    separately and only swapped in once valid; on ConfigError nothing changes.
+    """
+    fresh = ConfigLoader(self.path, self.strict)
+    fresh.generation = self.generation + 1
+    self.__dict__.update(fresh.__dict__)
+
+  @classmethod
+  def needs_restart(cls, key: str) -> bool:
+    """True if a change to the dotted key only takes effect after a restart."""
+    return any(key == k or key.startswith(k + '.') for k in cls.STARTUP_ONLY)
+
+  def changed_keys(self, other: "ConfigLoader") -> List[str]:
+    """Dotted keys of leaf values that differ between this config and other."""
+    mine, theirs = self._flat or {}, other._flat or {}
+    return sorted(
+      k for k in set(mine) | set(theirs)
+      if mine.get(k) != theirs.get(k) and not isinstance(mine.get(k, theirs.get(k)), dict)
+    )
 
   def get(self, key: str, default: Any = None) -> Any:
+    flat = self._flat
+    if flat is not None:
+      return flat.get(key, default)
     parts = key.split('.')
     cur: Any = self._config
     for p in parts:
@@ -108,6 +214,12 @@ class ConfigLoader:
           errors.append(f"Value for '{key}' must be > 0")
         if "tolerance" in key and val < 0:
           errors.append(f"Value for '{key}' must be >= 0")
+        if key.startswith(("workers.", "video.transcode.", "photo.heic.")) and val < 0:
+          errors.append(f"Value for '{key}' must be >= 0")
+        if key in ("watch.stable_seconds", "watch.poll_interval", "logging.flush_interval",
+                   "logging.batch_size", "reload.check_interval", "photo.max_rss_mb",
+                   "photo.heic.time_budget_sec") and val <= 0:
+          errors.append(f"Value for '{key}' must be > 0")
 
     # Strict mode: flag unknown top-level keys
     if self.strict:
@@ -116,20 +228,61 @@ class ConfigLoader:
         if root_key not in known_roots:
           errors.append(f"Unknown top-level key (strict mode): {root_key}")
 
+    resize_mode = self.get("photo.resize_mode")
+    if isinstance(resize_mode, str) and resize_mode not in ("draft", "full", "budget"):
+      errors.append(f"Value for 'photo.resize_mode' must be 'draft', 'full' or 'budget', got '{resize_mode}'")
+
     for key in ("ffmpeg_path", "ffprobe_path"):
       path_val = self.get(key)
       if path_val and not os.path.isfile(path_val):
         errors.append(f"{key} does not exist: {path_val}")
 
+    # Compile the camera model lookup once per load
+    mapping, rules = self.get("camera_model_mapping"), self.get("camera_model_rules")
+    try:
+      self.camera_models = CameraModelMapper(
+        mapping if isinstance(mapping, dict) else {},
+        rules if isinstance(rules, dict) else {}
+      )
+    except ConfigError as e:
+      errors.append(str(e))
+
     if errors:
       raise ConfigError("Configuration validation failed:\n" + "\n".join(errors))
+    self._freeze()
+
+  def _freeze(self) -> None:
+    """Build the flat dotted-key view and the typed section views of the validated config."""
+    flat: Dict[str, Any] = {}
+    def walk(prefix: str, node: Dict[str, Any]) -> None:
+      for k, v in node.items():
+        key = f"{prefix}{k}"
+        flat[key] = v
+        if isinstance(v, dict):
+          walk(key + '.', v)
+    walk('', self._config)
+    self._flat = MappingProxyType(flat)
+    self.photo = PhotoSettings(
+      flat['photo.max_width'], flat['photo.max_height'], flat['photo.quality'],
+      flat['photo.resize_mode'], flat['photo.filename_pattern'], tuple(flat['photo.extensions']),
+      flat['photo.max_rss_mb']
+    )
+    self.video = VideoSettings(
+      flat['video.target_width'], flat['video.target_height'], flat['video.max_bitrate'],
+      flat['video.filename_pattern'], tuple(flat['video.extensions']),
+      flat['video.duration_tolerance_sec'], flat['video.bitrate_tolerance_ratio']
+    )
 
   def list_missing(self) -> List[str]:
     return [k for k, (t, req, _) in self.SCHEMA.items() if req and self.get(k) is None]
 
   def _assign(self, key: str, value: Any) -> None:
+    self._flat = None
+    self._nested_set(self._config, key, value)
+
+  def _nested_set(self, config: Dict[str, Any], key: str, value: Any) -> None:
     parts = key.split('.')
-    target = self._config
+    target = config
     for p in parts[:-1]:
       if p not in target or not isinstance(target[p], dict):
         target[p] = {}
@@ -169,7 +322,11 @@ class ConfigLoader:
     return out
 
   def _expand_paths(self, config: Dict[str, Any]) -> Dict[str, Any]:
-    path_keys = ["source_folder", "staging_folder", "log_file", "ffmpeg_path", "ffprobe_path"]
+    path_keys = [
+      "source_folder", "staging_folder", "log_file", "ffmpeg_path", "ffprobe_path",
+      "metadata_cache.path", "video.transcode.journal", "scan.journal", "dedup.index",
+      "logging.json_log", "manifest.path",
+    ]
     base_dir = os.path.dirname(os.path.abspath(self.path))
     for pk in path_keys:
       raw = self._nested_get(config, pk)
@@ -177,7 +334,7 @@ class ConfigLoader:
         expanded = os.path.expanduser(raw)
         if not os.path.isabs(expanded):
           expanded = os.path.abspath(os.path.join(base_dir, expanded))
-        self._assign(pk, expanded)
+        self._nested_set(config, pk, expanded)
     return config
 
   def _nested_get(self, config: Dict[str, Any], key: str) -> Any:
@@ -189,3 +346,61 @@ class ConfigLoader:
       else:
         return None
     return cur
+
+
+class ConfigReloader:
+  """
+  Hot reload for long runs: hands out the current validated ConfigLoader and
+  replaces it when the config file changes on disk.
+
+  poll() is cheap (a stat at most every check_interval seconds) and is called
+  before each file, so a file is processed entirely with one config and a new
+  one takes effect from the next file on. The replacement is a fresh
+  ConfigLoader that is swapped in as a whole once it validates; a file that
+  fails to load or validate is reported through on_error and the running
+  config stays in place until the file changes again.
+  """
+
+  def __init__(self, config: ConfigLoader, check_interval: float = 2.0,
+               on_reload: Optional[Callable[[ConfigLoader, List[str]], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None):
+    self.current = config
+    self.check_interval = check_interval
+    self.on_reload = on_reload
+    self.on_error = on_error
+    self._lock = threading.Lock()
+    self._stamp = self._file_stamp()
+    self._next_check = time.monotonic() + check_interval
+
+  def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+    try:
+      st = os.stat(self.current.path)
+    except OSError:
+      return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+  def poll(self, now: Optional[float] = None) -> ConfigLoader:
+    """Config to use for the next file, reloaded first if the file has changed."""
+    now = time.monotonic() if now is None else now
+    if now < self._next_check or not self._lock.acquire(blocking=False):
+      return self.current
+    try:
+      self._next_check = now + self.check_interval
+      stamp = self._file_stamp()
+      if stamp is None or stamp == self._stamp:
+        return self.current
+      self._stamp = stamp
+      previous = self.current
+      try:
+        fresh = ConfigLoader(previous.path, previous.strict)
+      except (ConfigError, OSError) as e:
+        if self.on_error is not None:
+          self.on_error(e)
+        return previous
+      fresh.generation = previous.generation + 1
+      self.current = fresh
+      if self.on_reload is not None:
+        self.on_reload(fresh, previous.changed_keys(fresh))
+      return fresh
+    finally:
+      self._lock.release()
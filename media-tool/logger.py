@@ -1,31 +1,203 @@
 import logging
-from typing import Dict
+import logging.handlers
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
 import json
 
-def setup_logger(log_path: str) -> logging.Logger:
+from utils.timing import stage
+
+_formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+_context = threading.local()
+
+
+class StructuredMessage:
+  """
+  Log message carrying the structured info dict. It is rendered to JSON only
+  when a handler formats it, so with the async logger the worker thread never
+  pays for json.dumps.
+  """
+  __slots__ = ('info',)
+
+  def __init__(self, info: Dict):
+    self.info = info
+
+  def __str__(self) -> str:
+    return json.dumps(self.info, ensure_ascii=False)
+
+
+class _DeferredFlush:
+  """Handler mixin: emit() does not flush; the writer thread flushes once per batch."""
+
+  def flush(self):
+    pass
+
+  def flush_batch(self):
+    super().flush()
+
+  def close(self):
+    self.flush_batch()
+    super().close()
+
+
+class _BatchFileHandler(_DeferredFlush, logging.FileHandler):
+  pass
+
+
+class _BatchStreamHandler(_DeferredFlush, logging.StreamHandler):
+  pass
+
+
+class JsonLinesFormatter(logging.Formatter):
+  """One compact JSON object per record: ts, level, then the structured fields (or message)."""
+
+  def format(self, record: logging.LogRecord) -> str:
+    entry = {'ts': round(record.created, 3), 'level': record.levelname}
+    if isinstance(record.msg, StructuredMessage):
+      entry.update(record.msg.info)
+    else:
+      entry['message'] = record.getMessage()
+    if record.exc_info:
+      entry['exc'] = self.formatException(record.exc_info)
+    return json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+  """Enqueues the record untouched; formatting happens on the writer thread."""
+
+  def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+    return record
+
+
+class AsyncLogWriter:
+  """
+  Background thread that drains the log queue into the real handlers.
+
+  Records are written as they arrive but flushed once per batch (batch_size
+  records, or flush_interval seconds after the first unflushed record), so
+  slow storage sees a few large writes instead of one per record.
+  """
+
+  def __init__(self, log_queue: queue.SimpleQueue, handlers: List[logging.Handler],
+               flush_interval: float = 1.0, batch_size: int = 256):
+    self.queue = log_queue
+    self.handlers = handlers
+    self.flush_interval = flush_interval
+    self.batch_size = batch_size
+    self._stopped = object()
+    self._thread = threading.Thread(target=self._run, name='media-tool-log', daemon=True)
+    self._thread.start()
+
+  def _run(self):
+    pending = 0
+    deadline = None
+    while True:
+      timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+      try:
+        record = self.queue.get(timeout=timeout)
+      except queue.Empty:
+        record = None
+      if record is self._stopped:
+        self._flush()
+        return
+      if record is not None:
+        for handler in self.handlers:
+          if record.levelno >= handler.level:
+            handler.handle(record)
+        pending += 1
+        if deadline is None:
+          deadline = time.monotonic() + self.flush_interval
+      if pending and (pending >= self.batch_size or time.monotonic() >= deadline):
+        self._flush()
+        pending = 0
+        deadline = None
+
+  def _flush(self):
+    for handler in self.handlers:
+      handler.flush_batch()
+
+  def stop(self):
+    """Write out everything queued so far and close the handlers."""
+    self.queue.put(self._stopped)
+    self._thread.join()
+    for handler in self.handlers:
+      handler.close()
+
+
+_writer: Optional[AsyncLogWriter] = None
+
+
+def setup_logger(log_path: str, async_mode: bool = False, json_path: Optional[str] = None,
+                 flush_interval: float = 1.0, batch_size: int = 256) -> logging.Logger:
+  """
+  Log to log_path and the console. With async_mode, callers only enqueue
+  records and an AsyncLogWriter does the formatting and (batched) writing.
+  json_path adds a JSON-lines sink with one compact record per line.
+  """
+  global _writer
   logger = logging.getLogger("media_tool")
   logger.setLevel(logging.INFO)
-  
+  if logger.handlers:
+    return logger
+
+  file_cls, stream_cls = (_BatchFileHandler, _BatchStreamHandler) if async_mode else \
+    (logging.FileHandler, logging.StreamHandler)
+
   # File handler
-  fh = logging.FileHandler(log_path, encoding='utf-8')
-  formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
-  fh.setFormatter(formatter)
-  
+  fh = file_cls(log_path, encoding='utf-8')
+  fh.setFormatter(_formatter)
+
   # Console handler
-  ch = logging.StreamHandler()
-  ch.setFormatter(formatter)
-  
-  if not logger.hasHandlers():
-    logger.addHandler(fh)
-    logger.addHandler(ch)
-  
+  ch = stream_cls()
+  ch.setFormatter(_formatter)
+
+  handlers = [fh, ch]
+  if json_path:
+    jh = file_cls(json_path, encoding='utf-8')
+    jh.setFormatter(JsonLinesFormatter())
+    handlers.append(jh)
+
+  if async_mode:
+    log_queue = queue.SimpleQueue()
+    _writer = AsyncLogWriter(log_queue, handlers, flush_interval, batch_size)
+    logger.addHandler(_QueueHandler(log_queue))
+  else:
+    for handler in handlers:
+      logger.addHandler(handler)
+
   return logger
 
+def shutdown_logger(logger: logging.Logger):
+  """Flush and detach all handlers (drains the async queue first)."""
+  global _writer
+  handlers = list(logger.handlers)
+  for handler in handlers:
+    logger.removeHandler(handler)
+  if _writer is not None:
+    _writer.stop()
+    _writer = None
+  for handler in handlers:
+    handler.close()
+
+@contextmanager
+def log_context(**fields) -> Iterator[None]:
+  """Add fields to every log_action record this thread makes inside the block (e.g. per file)."""
+  previous = getattr(_context, 'fields', None)
+  _context.fields = {**(previous or {}), **fields}
+  try:
+    yield
+  finally:
+    _context.fields = previous
+
+@stage('log')
 def log_action(logger: logging.Logger, info: Dict):
   """Log structured action information."""
-  # Convert dict to JSON string for structured logging
-  log_msg = json.dumps(info, ensure_ascii=False)
-  
+  # Rendered to JSON by the handlers (on the writer thread when logging is async)
+  fields = getattr(_context, 'fields', None)
+  log_msg = StructuredMessage({**info, **fields} if fields else dict(info))
+
   status = info.get('status', 'unknown')
   if status == 'success':
     logger.info(log_msg)
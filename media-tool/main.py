@@ -1,47 +1,51 @@
 """Main entry point for the media tool."""
+import argparse
+import json
 import os
+import signal
 import sys
 import time
 from datetime import datetime
 from typing import Optional
 
-from config_loader import ConfigLoader
-from logger import setup_logger, log_action
+from config_loader import ConfigLoader, ConfigReloader
+from logger import setup_logger, shutdown_logger, log_action, log_context
 from media.base import analyze_file_type, extract_metadata
-from media.photo import Photo
+from media.photo import Photo, resize_photo_file
+from media.heic import HEIF_FORMATS, HeicTimeout, open_heic_converter
 from media.video import Video, FFmpegWrapper
 from media.exceptions import MediaProcessingError
-from utils.file_ops import scan_folder_recursive, copy_file, handle_duplicates, rename_in_place
+from media.metadata_cache import open_metadata_cache
+from media.transcode import open_transcode_scheduler
+from utils.file_ops import (
+  scan_folder_recursive, iter_folder, copy_file, handle_duplicates, rename_in_place, release_path,
+  commit_path, ensure_dir
+)
+from utils.scan_journal import ScanJournal
+from utils.hash_index import open_hash_index
+from utils.import_plan import IMPORT, SKIP, ERROR, PlanWriter, read_plan, source_unchanged
+from utils.name_allocator import NameAllocator
+from utils.skip_plan import find_staged_output
+from utils.run_manifest import open_run_manifest, RENAMED, STAGING, STAGED, TIMESTAMPED, SOURCE_REMOVED
+from utils.transfer import RENAME
+from utils.timing import collect_stages, current_stages, stage, StageProfile
+from utils.workers import imap_bounded, create_process_pool
+from utils.watcher import create_watcher, InotifyWatcher, StableFileTracker
 from utils.date_utils import (
   parse_date_from_filename, get_file_modification_time, format_date_for_filename
 )
 
+# Metadata extraction threads of a --plan run, when workers.io_threads is lower
+PLAN_THREADS = 4
+
 
 def apply_camera_model_mapping(camera_model: str, config: ConfigLoader) -> str:
   """
-  Apply camera model name mapping from config.
-  Returns mapped name if found, otherwise returns original (stripped of whitespace).
+  Apply camera model name mapping from config (see CameraModelMapper).
+  Returns mapped name if found, 'Unknown' for an empty model, otherwise the
+  original cleaned up for use in a filename.
   """
-  if not camera_model:
-    return ''
-  
-  # Get mapping from config
-  mapping = config.get('camera_model_mapping', {})
-  
-  # Try exact match first
-  if camera_model in mapping:
-    return mapping[camera_model]
-  
-  # Try case-insensitive match
-  camera_model_lower = camera_model.lower()
-  for key, value in mapping.items():
-    if key.lower() == camera_model_lower:
-      return value
-  
-  # No mapping found, return original but clean it up
-  # Remove extra spaces and special characters that could cause issues in filenames
-  cleaned = camera_model.strip().replace(' ', '').replace('/', '_')
-  return cleaned
+  return config.camera_models.map(camera_model)
 
 
 def get_metadata_with_fallback(file_path: str, logger) -> dict:
@@ -97,6 +101,11 @@ def get_metadata_with_fallback(file_path: str, logger) -> dict:
     }
 
 
+def fallback_time_for(file_path: str) -> datetime:
+  """Date from the filename, else the file modification time."""
+  return parse_date_from_filename(os.path.basename(file_path)) or get_file_modification_time(file_path)
+
+
 def rename_source_file(file_path: str, new_filename: str, duplicate_strategy: str, logger) -> Optional[str]:
   """Rename the original file in-place before processing."""
   target_path = rename_in_place(file_path, new_filename, duplicate_strategy)
@@ -116,14 +125,29 @@ def rename_source_file(file_path: str, new_filename: str, duplicate_strategy: st
   return target_path
 
 
-def apply_timestamp(path: str, dt: Optional[datetime], logger, context: str):
-  if not path or not dt:
-    return
+def to_timestamp(dt: datetime) -> float:
+  """POSIX timestamp of dt; naive datetimes are local time."""
+  if dt.tzinfo is None:
+    return time.mktime(dt.timetuple()) + dt.microsecond / 1_000_000
+  return dt.timestamp()
+
+
+def file_time(dt: Optional[datetime]) -> Optional[float]:
+  """to_timestamp(dt), or None if there is no date or it cannot be represented."""
+  if dt is None:
+    return None
+  try:
+    return to_timestamp(dt)
+  except (OverflowError, ValueError):
+    return None
+
+
+@stage('timestamp')
+def apply_timestamp(path: str, timestamp: Optional[float], logger, context: str) -> bool:
+  """Set atime and mtime of path to timestamp (see file_time). Returns False if not set."""
+  if not path or timestamp is None:
+    return False
   try:
-    if dt.tzinfo is None:
-      timestamp = time.mktime(dt.timetuple()) + dt.microsecond / 1_000_000
-    else:
-      timestamp = dt.timestamp()
     os.utime(path, (timestamp, timestamp))
   except Exception as e:
     log_action(logger, {
@@ -131,11 +155,15 @@ def apply_timestamp(path: str, dt: Optional[datetime], logger, context: str):
       'file': path,
       'message': f'Failed to set timestamp ({context}): {e}'
     })
+    return False
+  return True
 
 
-def remove_source_file(path: Optional[str], logger, context: str):
+@stage('remove')
+def remove_source_file(path: Optional[str], logger, context: str) -> bool:
+  """Remove an imported source. Returns False if it is still there."""
   if not path:
-    return
+    return False
   try:
     os.remove(path)
     log_action(logger, {
@@ -144,60 +172,183 @@ def remove_source_file(path: Optional[str], logger, context: str):
       'message': f'Removed source after {context}'
     })
   except FileNotFoundError:
-    return
+    return True
   except Exception as e:
     log_action(logger, {
       'status': 'warning',
       'file': path,
       'message': f'Failed to remove source ({context}): {e}'
     })
+    return False
+  return True
+
+
+def finish_source(entry, path: str, moved: bool, logger, context: str) -> None:
+  """Remove the source unless it was moved into staging; the manifest records it once it is gone."""
+  removed = moved or remove_source_file(path, logger, context)
+  if entry is not None and removed:
+    entry.step(SOURCE_REMOVED)
+
+
+@stage('dedup')
+def check_duplicate_content(file_path: str, file_type: str, hash_index, logger, start_time: float):
+  """
+  Claim file_path in the content-hash index (None if dedup is off).
+  Logs the skip when the same content is already in the library.
+  """
+  if hash_index is None:
+    return None
+  claim = hash_index.claim(file_path)
+  if claim.duplicate:
+    log_action(logger, {
+      'status': 'skipped',
+      'type': file_type,
+      'file': file_path,
+      'reason': 'duplicate-content',
+      'duplicate_of': claim.duplicate,
+      'elapsed_ms': int((time.time() - start_time) * 1000),
+      'stages_ms': current_stages()
+    })
+  return claim
+
+
+def skip_if_staged(file_path: str, file_type: str, staging_path: str, timestamp: Optional[float],
+                   config: ConfigLoader, hash_index, logger, start_time: float) -> Optional[dict]:
+  """
+  Early exit for re-runs: the skip result if an earlier run already staged
+  file_path at staging_path (see utils.skip_plan), else None.
+  """
+  if not config.get('skip_unchanged', True):
+    return None
+  with stage('plan'):
+    try:
+      staged = find_staged_output(file_path, staging_path, timestamp, hash_index)
+    except OSError:
+      staged = None
+  if staged is None:
+    return None
+  log_action(logger, {
+    'status': 'skipped',
+    'type': file_type,
+    'file': file_path,
+    'reason': 'unchanged',
+    'staged_as': staged,
+    'elapsed_ms': int((time.time() - start_time) * 1000),
+    'stages_ms': current_stages()
+  })
+  return {'status': 'skipped', 'reason': f'already staged as {staged}'}
+
+
+def open_photo(file_path: str) -> Photo:
+  """Photo for file_path; the fallback time is only worked out if EXIF has no date."""
+  return Photo(
+    file_path,
+    fallback_time=lambda: fallback_time_for(file_path).strftime('%Y:%m:%d %H:%M:%S')
+  )
 
 
-def process_photo(file_path: str, config: ConfigLoader, logger) -> dict:
-  """Process a single photo file."""
+def photo_target(photo: Photo, config: ConfigLoader, heic_to_jpeg: bool = False):
+  """
+  Where a photo goes: (date, new source filename, staging path, convert to JPEG).
+  The staging path is the name before any duplicate counter is added.
+  """
+  # Apply camera model mapping
+  mapped_model = apply_camera_model_mapping(photo.camera_model, config)
+  pattern = config.photo.filename_pattern
+  file_path = photo.file_path
+  
+  # Parse date for folder structure
+  taken_time_str = photo.metadata.get('taken_time', '')
+  if taken_time_str:
+    try:
+      dt = datetime.strptime(taken_time_str, '%Y:%m:%d %H:%M:%S')
+    except:
+      dt = get_file_modification_time(file_path)
+  else:
+    dt = get_file_modification_time(file_path)
+  
+  # Generate new filename (update pattern to use mapped model)
+  ext = os.path.splitext(file_path)[1].lstrip('.')
+  if mapped_model.lower() == "unknown" or mapped_model == "":
+    pattern_with_model = '{date}.{ext}'
+  else:
+    pattern_with_model = pattern.replace('{model}', mapped_model.replace(' ', ''))
+  new_filename = photo.generate_filename(pattern_with_model, ext)
+  
+  # Build staging path with YYYY/YYYY.MM structure
+  year_folder = dt.strftime('%Y')
+  month_folder = dt.strftime('%Y.%m')
+  staging_path = os.path.join(config.get('staging_folder'), "Photos", year_folder, month_folder, new_filename)
+  convert_heic = heic_to_jpeg and photo.metadata.get('format') in HEIF_FORMATS
+  if convert_heic:
+    staging_path = os.path.splitext(staging_path)[0] + '.jpg'
+  return dt, new_filename, staging_path, convert_heic
+
+
+def planned_target(planned: dict, heic_to_jpeg: bool = False):
+  """photo_target/video_target as recorded in a plan entry, with the collision-free dest."""
+  dt = datetime.fromisoformat(planned['taken'])
+  staging_path = planned['dest']
+  convert_heic = planned.get('convert_heic', False)
+  if convert_heic and not heic_to_jpeg:
+    # Planned with HEIC conversion on, applied with it off: stage the original
+    staging_path = os.path.splitext(staging_path)[0] + os.path.splitext(planned['filename'])[1]
+    convert_heic = False
+  return dt, planned['filename'], staging_path, convert_heic
+
+
+def unnumbered_path(staging_path: str, new_filename: str) -> str:
+  """staging_path without a duplicate counter, e.g. a planned dest _1 back to the name the target had."""
+  return os.path.join(
+    os.path.dirname(staging_path), os.path.splitext(new_filename)[0] + os.path.splitext(staging_path)[1]
+  )
+
+
+def process_photo(file_path: str, config: ConfigLoader, logger, resize_pool=None, hash_index=None,
+                  entry=None, heic_converter=None, planned: Optional[dict] = None) -> dict:
+  """
+  Process a single photo file.
+  If resize_pool (a process pool) is given, the Pillow resize runs in a worker process.
+  If heic_converter (a HeicConverter) is given, HEIC/HEIF photos are staged as JPEGs;
+  one that exceeds its time budget is staged as the original instead.
+  If hash_index (a HashIndex) is given, photos already in the library are skipped.
+  If entry (a ManifestEntry) is given, each completed step is recorded in the run manifest.
+  If planned (a plan entry) is given, its metadata and target are used instead of analysing the photo.
+  """
   start_time = time.time()
+  final_path = None
+  photo = None
+  claim = None
   
   try:
-    # Parse fallback time from filename or file modification
-    fallback_time = None
-    filename_date = parse_date_from_filename(os.path.basename(file_path))
-    if filename_date:
-      fallback_time = filename_date.strftime('%Y:%m:%d %H:%M:%S')
+    # A planned photo (see plan_import) brings its metadata and target from the plan
+    if planned is None:
+      photo = open_photo(file_path)
+      dt, new_filename, staging_path, convert_heic = photo_target(photo, config, heic_converter is not None)
     else:
-      fallback_time = get_file_modification_time(file_path).strftime('%Y:%m:%d %H:%M:%S')
-    
-    # Create Photo object
-    photo = Photo(file_path, fallback_time=fallback_time)
-    
-    # Apply camera model mapping
-    mapped_model = apply_camera_model_mapping(photo.camera_model, config)
+      photo = Photo(file_path, metadata=planned['metadata'])
+      dt, new_filename, staging_path, convert_heic = planned_target(planned, heic_converter is not None)
+    timestamp_dt = dt
+    # Converted once for the skip check, the source and the output
+    timestamp = file_time(dt)
     
     # Get config settings
-    max_width = config.get('photo.max_width')
-    max_height = config.get('photo.max_height')
-    quality = config.get('photo.quality', 95)
-    pattern = config.get('photo.filename_pattern', '{date}_{model}.{ext}')
-    staging_folder = config.get('staging_folder')
+    settings = config.photo
+    max_width = settings.max_width
+    max_height = settings.max_height
+    quality = settings.quality
+    resize_mode = settings.resize_mode
     duplicate_strategy = config.get('duplicate_strategy', 'counter')
     
-    # Parse date for folder structure
-    taken_time_str = photo.metadata.get('taken_time', '')
-    if taken_time_str:
-      try:
-        dt = datetime.strptime(taken_time_str, '%Y:%m:%d %H:%M:%S')
-      except:
-        dt = get_file_modification_time(file_path)
-    else:
-      dt = get_file_modification_time(file_path)
-    timestamp_dt = dt
-    
-    # Generate new filename (update pattern to use mapped model)
-    ext = os.path.splitext(file_path)[1].lstrip('.')
-    if mapped_model.lower() == "unknown" or mapped_model == "":
-      pattern_with_model = '{date}.{ext}'
-    else:
-      pattern_with_model = pattern.replace('{model}', mapped_model.replace(' ', ''))
-    new_filename = photo.generate_filename(pattern_with_model, ext)
+    # Nothing is renamed, hashed or resized for a photo an earlier run already staged
+    # A planned dest may carry a counter; an earlier run may have staged the file under any of them
+    skipped = skip_if_staged(file_path, 'photo', unnumbered_path(staging_path, new_filename), timestamp, config,
+                             hash_index, logger, start_time)
+    if skipped is not None:
+      return skipped
+    claim = check_duplicate_content(file_path, 'photo', hash_index, logger, start_time)
+    if claim is not None and claim.duplicate:
+      return {'status': 'skipped', 'reason': f'duplicate-content of {claim.duplicate}'}
 
     renamed_path = rename_source_file(file_path, new_filename, duplicate_strategy, logger)
     if renamed_path is None:
@@ -207,17 +358,20 @@ def process_photo(file_path: str, config: ConfigLoader, logger) -> dict:
         'type': 'photo',
         'file': file_path,
         'reason': 'rename-conflict',
-        'elapsed_ms': elapsed_ms
+        'elapsed_ms': elapsed_ms,
+        'stages_ms': current_stages()
       })
       return {'status': 'skipped', 'reason': 'rename-conflict'}
     file_path = renamed_path
     photo.file_path = renamed_path
-    apply_timestamp(file_path, timestamp_dt, logger, 'source-photo')
-    
-    # Build staging path with YYYY/YYYY.MM structure
-    year_folder = dt.strftime('%Y')
-    month_folder = dt.strftime('%Y.%m')
-    staging_path = os.path.join(staging_folder, "Photos", year_folder, month_folder, new_filename)
+    if claim is not None:
+      claim.path = renamed_path
+    if entry is not None:
+      entry.step(RENAMED, path=renamed_path)
+    source_stamped = apply_timestamp(file_path, timestamp, logger, 'source-photo')
+    if Photo.metadata_cache is not None:
+      # Re-key the cache entry on the new mtime so an interrupted run can reuse it
+      Photo.metadata_cache.store(file_path, 'photo', photo.metadata)
     
     # Handle duplicates
     final_path = handle_duplicates(staging_path, duplicate_strategy)
@@ -226,16 +380,69 @@ def process_photo(file_path: str, config: ConfigLoader, logger) -> dict:
         'status': 'skipped',
         'file': file_path,
         'reason': 'File already exists and duplicate_strategy is skip',
-        'elapsed_ms': int((time.time() - start_time) * 1000)
+        'elapsed_ms': int((time.time() - start_time) * 1000),
+        'stages_ms': current_stages()
       })
       return {'status': 'skipped', 'reason': 'duplicate'}
     
     # Create temp output path
-    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    ensure_dir(os.path.dirname(final_path))
+    
+    if entry is not None:
+      entry.step(STAGING, dest=final_path)
+    
+    # HEIC/HEIF to JPEG; past the time budget the original is staged instead
+    converted = False
+    if convert_heic:
+      photo.close()
+      try:
+        with stage('heic'):
+          resize_stats = heic_converter.convert(file_path, final_path, max_width, max_height, timestamp)
+        transfer, converted = None, True
+      except HeicTimeout as e:
+        logger.warning(f"{e}, staging the original")
+        # Give back the .jpg name reserved for the conversion before taking the original's
+        release_path(final_path)
+        final_path = handle_duplicates(
+          os.path.join(os.path.dirname(final_path), new_filename), duplicate_strategy
+        )
+        if final_path is None:
+          raise
+        if entry is not None:
+          entry.step(STAGING, dest=final_path)
     
     # Resize photo using Photo object
-    photo.resize(final_path, max_width, max_height, quality)
-    apply_timestamp(final_path, timestamp_dt, logger, 'output-photo')
+    # Passthroughs may move the source (it is removed after a successful import anyway)
+    if not converted and resize_pool is not None:
+      photo.close()
+      with stage('resize'):
+        transfer, resize_stats = resize_pool.submit(
+          resize_photo_file, file_path, final_path, max_width, max_height, quality, resize_mode, True,
+          settings.max_rss_mb, timestamp
+        ).result()
+    elif not converted:
+      transfer = photo.resize(final_path, max_width, max_height, quality, resize_mode, move=True,
+                              max_rss_mb=settings.max_rss_mb, mtime=timestamp)
+      resize_stats = photo.resize_stats
+    photo.close()
+    # Encoders stamp their output while it is open; passthroughs carry the source's times
+    if transfer is None:
+      stamped = resize_stats is not None and resize_stats.pop('stamped', False)
+    else:
+      stamped = source_stamped
+    if resize_stats is not None and resize_stats['strategy'] == 'passthrough':
+      logger.warning(f"Copied {file_path} unresized: no resize strategy fits photo.max_rss_mb "
+                     f"({resize_stats['estimated_mb']} MB needed)")
+    moved = transfer == RENAME
+    if moved or converted:
+      # Renamed over the placeholder: our own change to the staging folder
+      commit_path(final_path)
+    if entry is not None:
+      record_staged(entry, file_path, final_path, timestamp_dt, moved)
+    if not stamped:
+      apply_timestamp(final_path, timestamp, logger, 'output-photo')
+    if entry is not None:
+      entry.step(TIMESTAMPED)
     
     elapsed_ms = int((time.time() - start_time) * 1000)
     log_action(logger, {
@@ -244,9 +451,17 @@ def process_photo(file_path: str, config: ConfigLoader, logger) -> dict:
       'source': file_path,
       'destination': final_path,
       'operations': ['resize', 'rename', 'copy'],
-      'elapsed_ms': elapsed_ms
+      'transfer': transfer or 'resize',
+      'resize': resize_stats,
+      'elapsed_ms': elapsed_ms,
+      'stages_ms': current_stages()
     })
-    remove_source_file(file_path, logger, 'photo-success')
+    if claim is not None:
+      if moved:
+        claim.path = final_path
+      with stage('dedup'):
+        hash_index.record(claim, final_path, same_content=transfer is not None)
+    finish_source(entry, file_path, moved, logger, 'photo-success')
     
     return {'status': 'success', 'path': final_path}
     
@@ -257,55 +472,98 @@ def process_photo(file_path: str, config: ConfigLoader, logger) -> dict:
       'type': 'photo',
       'file': file_path,
       'error': str(e),
-      'elapsed_ms': elapsed_ms
+      'elapsed_ms': elapsed_ms,
+      'stages_ms': current_stages()
     })
     return {'status': 'error', 'error': str(e)}
+  finally:
+    release_path(final_path)
+    if photo is not None:
+      photo.close()
+    if claim is not None:
+      hash_index.release(claim)
+
+
+def open_video(file_path: str) -> Video:
+  """Video for file_path; the fallback time is only worked out if metadata has no date."""
+  return Video(file_path, fallback_time=lambda: fallback_time_for(file_path).isoformat())
 
 
-def process_video(file_path: str, config: ConfigLoader, logger) -> dict:
-  """Process a single video file."""
+def video_target(video: Video, config: ConfigLoader):
+  """
+  Where a video goes: (date, new source filename, staging path, False), shaped
+  like photo_target. The staging path is the name before any duplicate counter.
+  """
+  file_path = video.file_path
+  
+  # Parse date for folder structure
+  creation_time_str = video.metadata.get('creation_time', '')
+  if creation_time_str:
+    try:
+      if 'T' in creation_time_str:
+        iso_str = creation_time_str.replace('Z', '+00:00')
+        dt = datetime.fromisoformat(iso_str)
+      else:
+        dt = datetime.strptime(creation_time_str, '%Y:%m:%d %H:%M:%S')
+    except:
+      dt = get_file_modification_time(file_path)
+  else:
+    dt = get_file_modification_time(file_path)
+  
+  # Generate new filename
+  ext = os.path.splitext(file_path)[1].lstrip('.')
+  new_filename = video.generate_filename(config.video.filename_pattern, ext)
+  
+  # Build staging path with YYYY/YYYY.MM structure
+  year_folder = dt.strftime('%Y')
+  month_folder = dt.strftime('%Y.%m')
+  staging_path = os.path.join(config.get('staging_folder'), "Videos", year_folder, month_folder, new_filename)
+  return dt, new_filename, staging_path, False
+
+
+def process_video(file_path: str, config: ConfigLoader, logger, transcoder=None, hash_index=None,
+                  entry=None, planned: Optional[dict] = None) -> dict:
+  """
+  Process a single video file.
+  If transcoder (a TranscodeScheduler) is given, videos larger than the target size
+  are re-encoded through it; otherwise they are copied as-is.
+  If hash_index (a HashIndex) is given, videos already in the library are skipped.
+  If entry (a ManifestEntry) is given, each completed step is recorded in the run manifest.
+  If planned (a plan entry) is given, its metadata and target are used instead of probing the video.
+  """
   start_time = time.time()
+  final_path = None
+  claim = None
   
   try:
-    # Parse fallback time from filename or file modification
-    fallback_time = None
-    filename_date = parse_date_from_filename(os.path.basename(file_path))
-    if filename_date:
-      fallback_time = filename_date.isoformat()
+    # A planned video (see plan_import) brings its metadata and target from the plan
+    if planned is None:
+      video = open_video(file_path)
+      dt, new_filename, staging_path, _ = video_target(video, config)
     else:
-      fallback_time = get_file_modification_time(file_path).isoformat()
-    
-    # Create Video object
-    video = Video(file_path, fallback_time=fallback_time)
+      video = Video(file_path, metadata=planned['metadata'])
+      dt, new_filename, staging_path, _ = planned_target(planned)
+    timestamp_dt = dt
+    # Converted once for the skip check, the source and the output
+    timestamp = file_time(dt)
     
     # Get config settings
-    target_width = config.get('video.target_width')
-    target_height = config.get('video.target_height')
-    max_bitrate = config.get('video.max_bitrate')
-    pattern = config.get('video.filename_pattern', '{date}.{ext}')
-    staging_folder = config.get('staging_folder')
+    settings = config.video
+    target_width = settings.target_width
+    target_height = settings.target_height
+    max_bitrate = settings.max_bitrate
     duplicate_strategy = config.get('duplicate_strategy', 'counter')
-    duration_tol = config.get('video.duration_tolerance_sec', 1.0)
-    bitrate_tol = config.get('video.bitrate_tolerance_ratio', 1.2)
+    duration_tol = settings.duration_tolerance_sec
+    bitrate_tol = settings.bitrate_tolerance_ratio
     
-    # Parse date for folder structure
-    creation_time_str = video.metadata.get('creation_time', '')
-    if creation_time_str:
-      try:
-        if 'T' in creation_time_str:
-          iso_str = creation_time_str.replace('Z', '+00:00')
-          dt = datetime.fromisoformat(iso_str)
-        else:
-          dt = datetime.strptime(creation_time_str, '%Y:%m:%d %H:%M:%S')
-      except:
-        dt = get_file_modification_time(file_path)
-    else:
-      dt = get_file_modification_time(file_path)
-    timestamp_dt = dt
-    
-    # Generate new filename
-    ext = os.path.splitext(file_path)[1].lstrip('.')
-    new_filename = video.generate_filename(pattern, ext)
+    # Nothing is renamed, hashed or encoded for a video an earlier run already staged
+    skipped = skip_if_staged(file_path, 'video', unnumbered_path(staging_path, new_filename), timestamp, config,
+                             hash_index, logger, start_time)
+    if skipped is not None:
+      return skipped
+    claim = check_duplicate_content(file_path, 'video', hash_index, logger, start_time)
+    if claim is not None and claim.duplicate:
+      return {'status': 'skipped', 'reason': f'duplicate-content of {claim.duplicate}'}
 
     renamed_path = rename_source_file(file_path, new_filename, duplicate_strategy, logger)
     if renamed_path is None:
@@ -315,72 +573,108 @@ def process_video(file_path: str, config: ConfigLoader, logger) -> dict:
         'type': 'video',
         'file': file_path,
         'reason': 'rename-conflict',
-        'elapsed_ms': elapsed_ms
+        'elapsed_ms': elapsed_ms,
+        'stages_ms': current_stages()
       })
       return {'status': 'skipped', 'reason': 'rename-conflict'}
     file_path = renamed_path
     video.file_path = renamed_path
-    apply_timestamp(file_path, timestamp_dt, logger, 'source-video')
-    
-    # Build staging path with YYYY/YYYY.MM structure
-    year_folder = dt.strftime('%Y')
-    month_folder = dt.strftime('%Y.%m')
-    staging_path = os.path.join(staging_folder, "Videos", year_folder, month_folder, new_filename)
-    
-    # Handle duplicates
-    final_path = handle_duplicates(staging_path, duplicate_strategy)
-    if final_path is None:
-      log_action(logger, {
-        'status': 'skipped',
-        'file': file_path,
-        'reason': 'File already exists and duplicate_strategy is skip',
-        'elapsed_ms': int((time.time() - start_time) * 1000)
-      })
-      return {'status': 'skipped', 'reason': 'duplicate'}
-    
-    # Create output directory
-    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    if claim is not None:
+      claim.path = renamed_path
+    if entry is not None:
+      entry.step(RENAMED, path=renamed_path)
+    source_stamped = apply_timestamp(file_path, timestamp, logger, 'source-video')
+    if Video.metadata_cache is not None:
+      Video.metadata_cache.store(file_path, 'video', video.metadata)
     
     # Select FFmpeg parameters
     file_ext = os.path.splitext(file_path)[1].lower()
     codec_params = FFmpegWrapper.select_codec_params(file_ext)
+    # Judged on the size as played back: a portrait phone clip is stored landscape plus a rotation
+    display_width, display_height = video.display_size
+    needs_resize = display_width > target_width or display_height > target_height
+    transcode = transcoder is not None and codec_params['codec'] != 'copy' and needs_resize
     
-    #####################################################
-    ## Skip resize video for now, need more research on latest iPhone videos
-    #####################################################
-
-    # Resize/convert video using FFmpegWrapper    
-    #FFmpegWrapper.resize_video(file_path, final_path, target_width, target_height, max_bitrate, codec_params)
+    # An encode of this source may have finished before an earlier run was interrupted
+    resumed_path = transcoder.completed_output(file_path) if transcode else None
+    if resumed_path:
+      final_path = resumed_path
+    else:
+      # Handle duplicates
+      final_path = handle_duplicates(staging_path, duplicate_strategy)
+      if final_path is None:
+        log_action(logger, {
+          'status': 'skipped',
+          'file': file_path,
+          'reason': 'File already exists and duplicate_strategy is skip',
+          'elapsed_ms': int((time.time() - start_time) * 1000),
+          'stages_ms': current_stages()
+        })
+        return {'status': 'skipped', 'reason': 'duplicate'}
     
-    # Validate output using FFmpegWrapper
-    #FFmpegWrapper.validate_video_output(
-    #  file_path,
-    #  final_path,
-    #  target_width,
-    #  target_height,
-    #  duration_tol,
-    #  bitrate_tol
-    #)
-
-    copy_file(file_path, final_path)
-    apply_timestamp(final_path, timestamp_dt, logger, 'output-video')
+    # Create output directory
+    ensure_dir(os.path.dirname(final_path))
+    if entry is not None:
+      # A reused encode is a finished output, not a copy in flight
+      entry.step(STAGING, dest=final_path, reused=bool(resumed_path))
     
-    elapsed_ms = int((time.time() - start_time) * 1000)
-    operations = ['validate', 'rename', 'copy']
-    if codec_params['codec'] != 'copy':
-      operations.insert(0, 'resize')
-      operations.insert(1, 'encode')
+    if transcode:
+      if not resumed_path:
+        with stage('encode'):
+          transcoder.transcode(
+            file_path, final_path, target_width, target_height, codec_params, video.duration
+          )
+      try:
+        FFmpegWrapper.validate_video_output(
+          file_path,
+          final_path,
+          target_width,
+          target_height,
+          duration_tol,
+          bitrate_tol,
+          src_info=video.metadata
+        )
+      except Exception:
+        os.remove(final_path)
+        raise
+      operations = ['resize', 'encode', 'validate', 'rename']
+      transfer = 'encode'
+      codec = codec_params['codec']
+    else:
+      # The source is removed after a successful import, so it may be moved instead
+      transfer = copy_file(file_path, final_path, move=True)
+      operations = ['rename', 'copy']
+      codec = 'copy'
+    if transfer in (RENAME, 'encode'):
+      # Renamed over the placeholder: our own change to the staging folder
+      commit_path(final_path)
+    if entry is not None:
+      record_staged(entry, file_path, final_path, timestamp_dt, transfer == RENAME)
+    # A moved or copied video carries the source's times; encodes are stamped here
+    if transfer == 'encode' or not source_stamped:
+      apply_timestamp(final_path, timestamp, logger, 'output-video')
+    if entry is not None:
+      entry.step(TIMESTAMPED)
     
+    elapsed_ms = int((time.time() - start_time) * 1000)
     log_action(logger, {
       'status': 'success',
       'type': 'video',
       'source': file_path,
       'destination': final_path,
-      'codec': codec_params['codec'],
+      'codec': codec,
       'operations': operations,
-      'elapsed_ms': elapsed_ms
+      'transfer': transfer,
+      'resumed': bool(resumed_path),
+      'elapsed_ms': elapsed_ms,
+      'stages_ms': current_stages()
     })
-    remove_source_file(file_path, logger, 'video-success')
+    if claim is not None:
+      if transfer == RENAME:
+        claim.path = final_path
+      with stage('dedup'):
+        hash_index.record(claim, final_path, same_content=transfer != 'encode')
+    finish_source(entry, file_path, transfer == RENAME, logger, 'video-success')
     
     return {'status': 'success', 'path': final_path}
     
@@ -391,20 +685,417 @@ def process_video(file_path: str, config: ConfigLoader, logger) -> dict:
       'type': 'video',
       'file': file_path,
       'error': str(e),
-      'elapsed_ms': elapsed_ms
+      'elapsed_ms': elapsed_ms,
+      'stages_ms': current_stages()
     })
     return {'status': 'error', 'error': str(e)}
+  finally:
+    release_path(final_path)
+    if claim is not None:
+      hash_index.release(claim)
 
 
-def main():
-  """Main orchestration function."""
-  # Default config path
-  config_path = os.path.join(os.path.dirname(__file__), 'config', 'config.yaml')
+def prefetch_video_metadata(files, logger):
+  """
+  Probe all videos up front with concurrent ffprobe processes so the per-file
+  pipeline finds results cached. Files already in the metadata cache are skipped.
+  """
+  videos = [
+    f for f in files
+    if analyze_file_type(f) == 'video'
+    and not (Video.metadata_cache is not None and Video.metadata_cache.contains(f, 'video'))
+  ]
+  if not videos:
+    return
+  start_time = time.time()
+  probed = FFmpegWrapper.probe_many(videos)
+  failed = sum(1 for info in probed.values() if isinstance(info, Exception))
+  log_action(logger, {
+    'status': 'info',
+    'message': f'Prefetched metadata for {len(videos)} videos ({failed} failed)',
+    'elapsed_ms': int((time.time() - start_time) * 1000)
+  })
+
+
+def analyse_for_plan(file_path: str, config: ConfigLoader, heic_to_jpeg: bool) -> dict:
+  """Plan entry of one source with its metadata and target, before any name is resolved."""
+  file_type = analyze_file_type(file_path)
+  entry = {'source': file_path, 'type': file_type}
+  try:
+    st = os.stat(file_path)
+    if file_type == 'photo':
+      with open_photo(file_path) as photo:
+        target = photo_target(photo, config, heic_to_jpeg)
+        metadata = photo.metadata
+    elif file_type == 'video':
+      video = open_video(file_path)
+      target = video_target(video, config)
+      metadata = video.metadata
+    else:
+      entry.update(action=SKIP, reason='Unknown file type')
+      return entry
+  except Exception as e:
+    entry.update(action=ERROR, error=str(e))
+    return entry
+  entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns, metadata=metadata, target=target)
+  return entry
+
+
+def plan_import(files, config: ConfigLoader, logger, plan_path: str, hash_index=None,
+                heic_to_jpeg: bool = False) -> dict:
+  """
+  Dry run: extract metadata of all files on the I/O thread pool, resolve every
+  staging name, duplicate counters included, in memory, and write one plan
+  entry per file to plan_path. Nothing is renamed, created or staged;
+  `main.py --apply plan_path` then imports the planned files without
+  analysing them again. Returns the number of entries per action.
+
+  Content duplicates and source rename conflicts are still detected when the
+  plan is applied: both depend on files the apply run itself moves.
+  """
+  duplicate_strategy = config.get('duplicate_strategy', 'counter')
+  skip_unchanged = config.get('skip_unchanged', True)
+  staging_names = NameAllocator(dry_run=True)
+  start_time = time.time()
+  writer = PlanWriter(
+    plan_path,
+    config=os.path.abspath(config.path),
+    source_folder=config.get('source_folder'),
+    staging_folder=config.get('staging_folder')
+  )
+  analysed = imap_bounded(
+    lambda path: analyse_for_plan(path, config, heic_to_jpeg),
+    files,
+    max(config.get('workers.io_threads', 1), PLAN_THREADS),
+    config.get('workers.queue_size', 0)
+  )
+  try:
+    # Names are resolved here as analyses complete; the order only decides which burst shot gets which counter
+    for file_path, entry in analysed:
+      if 'target' in entry:
+        dt, new_filename, staging_path, convert_heic = entry.pop('target')
+        staged = None
+        if skip_unchanged:
+          staged = find_staged_output(file_path, staging_path, file_time(dt), hash_index)
+        if staged is not None:
+          entry.update(action=SKIP, reason=f'already staged as {staged}')
+        else:
+          dest = staging_names.allocate(staging_path, duplicate_strategy)
+          if dest is None:
+            entry.update(action=SKIP, reason='File already exists and duplicate_strategy is skip')
+          else:
+            entry.update(action=IMPORT, taken=dt.isoformat(), filename=new_filename, dest=dest,
+                         convert_heic=convert_heic)
+      writer.add(entry)
+  except BaseException:
+    writer.abort()
+    raise
+  writer.close()
+  log_action(logger, {
+    'status': 'info',
+    'message': f'Planned {sum(writer.counts.values())} files into {plan_path}: {writer.counts}',
+    'elapsed_ms': int((time.time() - start_time) * 1000)
+  })
+  return writer.counts
+
+
+def load_plan(plan_path: str, config: ConfigLoader, logger):
+  """
+  Read a plan for --apply. Returns (files, plan): the sources to import, and
+  source path -> entry for those still as they were planned. Sources changed
+  since are imported without their plan entry; missing ones are dropped.
+  Raises ValueError if the plan was made for another staging folder, since
+  every planned destination lies under it.
+  """
+  header, entries = read_plan(plan_path)
+  planned_staging = header.get('staging_folder')
+  staging_folder = config.get('staging_folder')
+  if planned_staging and os.path.abspath(planned_staging) != os.path.abspath(staging_folder):
+    raise ValueError(
+      f"Plan {plan_path} stages into {planned_staging}, but staging_folder is now {staging_folder}; "
+      f"plan again with the current config"
+    )
+  files = []
+  plan = {}
+  for entry in entries:
+    if entry['action'] != IMPORT:
+      continue
+    if source_unchanged(entry):
+      plan[entry['source']] = entry
+    elif not os.path.exists(entry['source']):
+      log_action(logger, {'status': 'skipped', 'file': entry['source'], 'reason': 'gone since planned'})
+      continue
+    else:
+      log_action(logger, {'status': 'info', 'file': entry['source'], 'message': 'Changed since planned, re-analysing'})
+    files.append(entry['source'])
+  print(f"Plan {plan_path} (created {datetime.fromtimestamp(header['created']):%Y-%m-%d %H:%M:%S}): "
+        f"{len(files)} files to import, {len(plan)} as planned")
+  return files, plan
+
+
+def record_staged(entry, source_path: str, final_path: str, dt: datetime, moved: bool):
+  """Checkpoint a finished staging copy with what resume_from_manifest needs to trust it."""
+  fields = {'dest': final_path, 'dest_size': os.path.getsize(final_path), 'taken': dt.isoformat(), 'moved': moved}
+  if not moved:
+    st = os.stat(source_path)
+    fields.update(source_size=st.st_size, source_mtime_ns=st.st_mtime_ns)
+  entry.step(STAGED, **fields)
+
+
+def resume_from_manifest(entry, file_type: str, logger) -> Optional[dict]:
+  """
+  Pick up a file an interrupted run left half-done. A staging copy that was
+  completed (and is unchanged, as is the source) is kept: only the remaining
+  steps run, without reading metadata again. A copy that was still in flight
+  is deleted, unless it is a finished encode the run was reusing. Returns the
+  result, or None to process the file from scratch.
+  """
+  start_time = time.time()
+  dest = entry.data.get('dest')
+  if entry.state == STAGING:
+    if dest and os.path.abspath(dest) != os.path.abspath(entry.path) and not entry.data.get('reused'):
+      try:
+        os.remove(dest)
+      except FileNotFoundError:
+        pass
+    return None
+  if entry.state not in (STAGED, TIMESTAMPED):
+    return None
+  try:
+    src_st = os.stat(entry.path)
+    dest_size = os.path.getsize(dest)
+  except (OSError, TypeError):
+    return None
+  if (dest_size != entry.data.get('dest_size')
+      or src_st.st_size != entry.data.get('source_size')
+      or src_st.st_mtime_ns != entry.data.get('source_mtime_ns')):
+    return None
+  if entry.state == STAGED:
+    apply_timestamp(dest, file_time(datetime.fromisoformat(entry.data['taken'])), logger, f'output-{file_type}')
+    entry.step(TIMESTAMPED)
+  log_action(logger, {
+    'status': 'success',
+    'type': file_type,
+    'source': entry.path,
+    'destination': dest,
+    'resumed': True,
+    'elapsed_ms': int((time.time() - start_time) * 1000),
+    'stages_ms': current_stages()
+  })
+  finish_source(entry, entry.path, False, logger, f'{file_type}-resumed')
+  return {'status': 'success', 'path': dest}
+
+
+def process_file(file_path: str, config: ConfigLoader, logger, resize_pool=None, transcoder=None,
+                 hash_index=None, manifest=None, heic_converter=None, planned: Optional[dict] = None):
+  """
+  Dispatch a file to the photo or video pipeline. Returns (file_type, result).
+  result['stages_ms'] holds the time spent per stage on this file.
+  With a RunManifest, files an interrupted run left half-done are resumed.
+  With a plan entry (planned), the file is imported as planned without being analysed again.
+  Log records of the file carry the config generation it was processed with.
+  """
+  file_type = analyze_file_type(file_path)
+  entry = manifest.begin(file_path) if manifest is not None else None
+  with collect_stages(), log_context(config_generation=config.generation):
+    result = resume_from_manifest(entry, file_type, logger) if entry is not None else None
+    if result is None:
+      if file_type == 'photo':
+        result = process_photo(file_path, config, logger, resize_pool, hash_index, entry, heic_converter, planned)
+      elif file_type == 'video':
+        result = process_video(file_path, config, logger, transcoder, hash_index, entry, planned)
+      else:
+        result = {'status': 'skipped', 'reason': 'Unknown file type'}
+    result['stages_ms'] = current_stages()
+  if entry is not None:
+    entry.finish(result['status'])
+  return file_type, result
+
+
+def format_progress(idx: int, total: Optional[int]) -> str:
+  return f"{idx}/{total}" if total is not None else str(idx)
+
+
+def record_result(results: dict, file_type: Optional[str], result: dict, profile: StageProfile = None):
+  """Aggregate a single file result into the run summary and echo it to the console."""
+  results['total'] += 1
+  if profile is not None:
+    profile.add(result.get('stages_ms', {}))
+  if file_type == 'photo':
+    results['photos'] += 1
+  elif file_type == 'video':
+    results['videos'] += 1
   
-  # Allow config path override via command line
-  if len(sys.argv) > 1:
-    config_path = sys.argv[1]
+  if result['status'] == 'success':
+    results['success'] += 1
+    print(f"  ✓ Success: {result.get('path', 'N/A')}")
+  elif result['status'] == 'error':
+    results['error'] += 1
+    print(f"  ✗ Error: {result.get('error', 'Unknown error')}")
+  elif result['status'] == 'skipped':
+    results['skipped'] += 1
+    print(f"  - Skipped: {result.get('reason', 'Unknown reason')}")
+
+
+def run_batch(files, total: Optional[int], config: ConfigLoader, logger, results: dict,
+              resize_pool=None, transcoder=None, hash_index=None, profile: StageProfile = None,
+              manifest=None, reloader: ConfigReloader = None, heic_converter=None, plan: Optional[dict] = None):
+  """
+  Process files serially, or on the I/O thread pool when workers.io_threads > 1.
+  With a ConfigReloader, each file is processed with the config current when it starts.
+  With a plan (source path -> plan entry), planned files are imported as planned.
+  """
+  current_config = reloader.poll if reloader is not None else lambda: config
+  planned_for = plan.get if plan is not None else lambda path: None
+  io_threads = config.get('workers.io_threads', 1)
+  if io_threads <= 1:
+    for idx, file_path in enumerate(files, 1):
+      print(f"\nProcessing [{format_progress(idx, total)}]: {os.path.basename(file_path)}")
+      file_type, result = process_file(
+        file_path, current_config(), logger, transcoder=transcoder, hash_index=hash_index, manifest=manifest,
+        heic_converter=heic_converter, planned=planned_for(file_path)
+      )
+      record_result(results, file_type, result, profile)
+    return
+  completed = imap_bounded(
+    lambda path: process_file(
+      path, current_config(), logger, resize_pool, transcoder, hash_index, manifest, heic_converter,
+      planned_for(path)
+    ),
+    files,
+    io_threads,
+    config.get('workers.queue_size', 0)
+  )
+  for idx, (file_path, (file_type, result)) in enumerate(completed, 1):
+    print(f"\nProcessed [{format_progress(idx, total)}]: {os.path.basename(file_path)}")
+    record_result(results, file_type, result, profile)
+
+
+def _stop_on_sigterm(signum, frame):
+  raise KeyboardInterrupt
+
+
+def watch_source(config: ConfigLoader, logger, results: dict, resize_pool=None, transcoder=None,
+                 hash_index=None, profile: StageProfile = None, manifest=None,
+                 reloader: ConfigReloader = None, initial_pass=None, heic_converter=None):
+  """
+  Daemon mode: keep watching source_folder and import files as they arrive.
+
+  The watch starts before initial_pass (the normal one-off import) runs, so
+  nothing that lands meanwhile is missed. New files are only processed once
+  their size has stopped changing for watch.stable_seconds. Runs until
+  interrupted (Ctrl+C or SIGTERM).
+  """
+  source_folder = config.get('source_folder')
+  all_extensions = config.get('photo.extensions', []) + config.get('video.extensions', [])
+  watcher = create_watcher(
+    source_folder,
+    all_extensions,
+    config.get('watch.use_inotify', True),
+    config.get('watch.poll_interval', 10)
+  )
+  tracker = StableFileTracker(config.get('watch.stable_seconds', 5))
+  # Files already present belong to the initial pass; remembering them by inode also
+  # covers their in-place renames, so leftovers (errors, skips) are not retried
+  for file_path in iter_folder(source_folder, all_extensions):
+    tracker.mark_processed(file_path)
+
+  previous_handler = signal.signal(signal.SIGTERM, _stop_on_sigterm)
+  try:
+    if initial_pass is not None:
+      initial_pass()
+      tracker.renew_processed()
+    mode = 'inotify' if isinstance(watcher, InotifyWatcher) else f"polling every {watcher.interval}s"
+    print(f"\nWatching {source_folder} for new files ({mode}), press Ctrl+C to stop")
+    logger.info(f"Watch mode started on {source_folder} ({mode})")
+    while True:
+      for file_path in watcher.poll(1.0 if len(tracker) else 5.0):
+        tracker.add(file_path)
+      if reloader is not None:
+        # Pick up config edits while idle too, so errors are reported right away
+        reloader.poll()
+      ready = tracker.pop_ready()
+      if not ready:
+        continue
+      for file_path in ready:
+        tracker.mark_processed(file_path)
+      run_batch(
+        ready, len(ready), config, logger, results, resize_pool, transcoder, hash_index, profile, manifest,
+        reloader, heic_converter
+      )
+  except KeyboardInterrupt:
+    print("\nStopping watch mode")
+    logger.info("Watch mode stopped")
+  finally:
+    signal.signal(signal.SIGTERM, previous_handler)
+    watcher.close()
+
+
+def open_config_reloader(config: ConfigLoader, logger) -> Optional[ConfigReloader]:
+  """Hot reload of the config file between files, if reload.enabled is set."""
+  if not config.get('reload.enabled', False):
+    return None
+
+  def on_reload(fresh: ConfigLoader, changed):
+    restart = [k for k in changed if ConfigLoader.needs_restart(k)]
+    print(f"\nConfiguration reloaded (generation {fresh.generation})")
+    log_action(logger, {
+      'status': 'info',
+      'message': f'Configuration reloaded (generation {fresh.generation})',
+      'config_generation': fresh.generation,
+      'changed': changed
+    })
+    if restart:
+      log_action(logger, {
+        'status': 'warning',
+        'message': 'Changed settings only take effect after a restart',
+        'keys': restart
+      })
+
+  def on_error(error: Exception):
+    print(f"\nConfiguration reload failed, keeping the current config: {error}")
+    log_action(logger, {
+      'status': 'error',
+      'message': f'Configuration reload failed, keeping generation {reloader.current.generation}: {error}'
+    })
+
+  reloader = ConfigReloader(config, config.get('reload.check_interval', 2.0), on_reload, on_error)
+  return reloader
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description='Import photos and videos into the media library.')
+  parser.add_argument(
+    'config', nargs='?',
+    default=os.path.join(os.path.dirname(__file__), 'config', 'config.yaml'),
+    help='path to config.yaml (default: config/config.yaml next to this script)'
+  )
+  mode = parser.add_mutually_exclusive_group()
+  mode.add_argument(
+    '--watch', action='store_true',
+    help='after the initial pass, keep running and import new files as they arrive'
+  )
+  mode.add_argument(
+    '--plan', metavar='PLAN',
+    help='dry run: resolve where every file would go and write the plan (JSON lines) to PLAN'
+  )
+  mode.add_argument(
+    '--apply', metavar='PLAN',
+    help='import the files planned in PLAN by an earlier --plan run, without scanning the source folder'
+  )
+  return parser.parse_args(argv)
+
+
+def main(argv=None):
+  """Main orchestration function."""
+  args = parse_args(argv)
+  config_path = args.config
   
+  logger = None
+  metadata_cache = None
+  hash_index = None
+  manifest = None
+  resize_pool = None
   try:
     # Load configuration
     print(f"Loading configuration from: {config_path}")
@@ -419,7 +1110,48 @@ def main():
     # Setup logger
     log_file = config.get('log_file')
     os.makedirs(os.path.dirname(log_file), exist_ok=True)
-    logger = setup_logger(log_file)
+    logger = setup_logger(
+      log_file,
+      async_mode=config.get('logging.async', False),
+      json_path=config.get('logging.json_log'),
+      flush_interval=config.get('logging.flush_interval', 1.0),
+      batch_size=config.get('logging.batch_size', 256)
+    )
+    
+    # Open persistent metadata cache (skips EXIF/ffprobe for files seen before)
+    metadata_cache = open_metadata_cache(config, log_file)
+    Photo.metadata_cache = metadata_cache
+    Video.metadata_cache = metadata_cache
+    
+    # A --plan run only reads: no transcoder, HEIC pool or manifest
+    planning = args.plan is not None
+    
+    # Video transcoding (off unless video.transcode.enabled)
+    transcoder = None if planning else open_transcode_scheduler(config, log_file)
+    if transcoder is not None:
+      print(f"Video transcoding: up to {transcoder.max_jobs} jobs x {transcoder.threads_per_job} threads")
+      for job in transcoder.interrupted_jobs():
+        log_action(logger, {
+          'status': 'warning',
+          'file': job['input'],
+          'message': f"Transcode interrupted in previous run at {job['progress']:.0%}, will be redone"
+        })
+    
+    # HEIC/HEIF to JPEG conversion (off unless photo.heic.enabled)
+    heic_converter = None if planning else open_heic_converter(config)
+    if heic_converter is not None:
+      print(f"HEIC conversion: {heic_converter.processes} processes, "
+            f"{heic_converter.time_budget:g}s budget per file")
+    
+    # Content-hash index of the staging library (skips files imported before under another name)
+    hash_index = open_hash_index(config, log_file)
+    if hash_index is not None:
+      print(f"Dedup index: {len(hash_index)} entries")
+    
+    # Write-ahead manifest of per-file progress (resumes files an interrupted run left half-done)
+    manifest = None if planning else open_run_manifest(config, log_file)
+    if manifest is not None and len(manifest):
+      print(f"Run manifest: {len(manifest)} unfinished files from a previous run")
     
     # Get source folder and extensions
     source_folder = config.get('source_folder')
@@ -430,45 +1162,77 @@ def main():
     print(f"Source folder: {source_folder}")
     print(f"Scanning for files with extensions: {all_extensions}")
     
+    FFmpegWrapper.configure_probe(config.get('video.probe_workers', 4))
+    
     # Scan source folder
-    files = scan_folder_recursive(source_folder, all_extensions)
-    print(f"Found {len(files)} files to process")
+    plan = None
+    if args.apply:
+      # The plan lists the files; the source folder is not scanned again
+      files, plan = load_plan(args.apply, config, logger)
+      total = len(files)
+    elif config.get('scan.incremental', False):
+      # Stream files from an incremental scan so processing starts immediately
+      journal_path = config.get('scan.journal') or os.path.join(
+        os.path.dirname(log_file), 'media_tool_scan.json'
+      )
+      files = iter_folder(source_folder, all_extensions, ScanJournal(journal_path, all_extensions))
+      total = None
+      print("Streaming files from incremental scan")
+    else:
+      files = scan_folder_recursive(source_folder, all_extensions)
+      total = len(files)
+      print(f"Found {total} files to process")
+      # Probe videos concurrently before processing
+      prefetch_video_metadata(files, logger)
+    
+    if planning:
+      counts = plan_import(files, config, logger, args.plan, hash_index, config.get('photo.heic.enabled', False))
+      print("\n" + "=" * 80)
+      print("Plan Complete")
+      print("=" * 80)
+      print(f"To import:      {counts[IMPORT]}")
+      print(f"Skipped:        {counts[SKIP]}")
+      print(f"Errors:         {counts[ERROR]}")
+      print(f"\nPlan file: {args.plan}")
+      return 0 if counts[ERROR] == 0 else 1
     
     # Process each file
     results = {
-      'total': len(files),
+      'total': 0,
       'success': 0,
       'error': 0,
       'skipped': 0,
       'photos': 0,
       'videos': 0
     }
+    profile = StageProfile()
+    reloader = open_config_reloader(config, logger)
     
-    for idx, file_path in enumerate(files, 1):
-      print(f"\nProcessing [{idx}/{len(files)}]: {os.path.basename(file_path)}")
-      
-      file_type = analyze_file_type(file_path)
-      
-      if file_type == 'photo':
-        result = process_photo(file_path, config, logger)
-        results['photos'] += 1
-      elif file_type == 'video':
-        result = process_video(file_path, config, logger)
-        results['videos'] += 1
+    io_threads = config.get('workers.io_threads', 1)
+    if io_threads > 1:
+      resize_pool = create_process_pool(config.get('workers.resize_processes', 0))
+      print(f"Parallel mode: {io_threads} I/O threads, "
+            f"{config.get('workers.resize_processes', 0)} resize processes")
+    try:
+      if args.watch:
+        watch_source(
+          config, logger, results, resize_pool, transcoder, hash_index, profile, manifest, reloader,
+          initial_pass=lambda: run_batch(
+            files, total, config, logger, results, resize_pool, transcoder, hash_index, profile, manifest,
+            reloader, heic_converter
+          ),
+          heic_converter=heic_converter
+        )
       else:
-        print(f"  Skipped: Unknown file type")
-        results['skipped'] += 1
-        continue
-      
-      if result['status'] == 'success':
-        results['success'] += 1
-        print(f"  ✓ Success: {result.get('path', 'N/A')}")
-      elif result['status'] == 'error':
-        results['error'] += 1
-        print(f"  ✗ Error: {result.get('error', 'Unknown error')}")
-      elif result['status'] == 'skipped':
-        results['skipped'] += 1
-        print(f"  - Skipped: {result.get('reason', 'Unknown reason')}")
+        run_batch(
+          files, total, config, logger, results, resize_pool, transcoder, hash_index, profile, manifest,
+          reloader, heic_converter, plan
+        )
+    finally:
+      if resize_pool is not None:
+        resize_pool.shutdown()
+      if heic_converter is not None:
+        heic_converter.shutdown()
     
     # Print summary
     print("\n" + "=" * 80)
@@ -480,9 +1244,15 @@ def main():
     print(f"Successful:     {results['success']}")
     print(f"Errors:         {results['error']}")
     print(f"Skipped:        {results['skipped']}")
+    if metadata_cache is not None:
+      print(f"Metadata cache: {metadata_cache.hits} hits, {metadata_cache.misses} misses")
+    if results['total']:
+      print("\nTime per stage:")
+      print(profile.format_table())
     print(f"\nLog file: {log_file}")
     
     logger.info(f"Processing Complete - Summary: {results}")
+    logger.info(f"Stage profile: {json.dumps(profile.rows())}")
     
     return 0 if results['error'] == 0 else 1
     
@@ -491,6 +1261,15 @@ def main():
     import traceback
     traceback.print_exc()
     return 1
+  finally:
+    if metadata_cache is not None:
+      metadata_cache.close()
+    if hash_index is not None:
+      hash_index.close()
+    if manifest is not None:
+      manifest.close()
+    if logger is not None:
+      shutdown_logger(logger)
 
 
 if __name__ == "__main__":
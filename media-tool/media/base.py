@@ -20,8 +20,8 @@ def extract_metadata(file_path: str) -> Dict:
   
   if file_type == 'photo':
     from media.photo import Photo
-    photo = Photo(file_path)
-    metadata = photo.metadata.copy()
+    with Photo(file_path) as photo:
+      metadata = photo.metadata.copy()
     metadata['type'] = 'photo'
     return metadata
   elif file_type == 'video':
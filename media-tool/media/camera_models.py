@@ -0,0 +1,61 @@
+"""Camera model name mapping, compiled once from the config."""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from media.exceptions import ConfigError
+
+UNKNOWN = 'Unknown'
+
+
+class CameraModelMapper:
+  """
+  Maps EXIF camera model strings to the short names used in filenames.
+
+  Lookup order: exact key, case-insensitive key, then the regex rules in
+  order (full match, case-insensitive; the name may use \\1-style group
+  references, e.g. "iPhone (\\d+) Pro Max" -> "iP\\1Max"). Unmapped models
+  are cleaned up for use in a filename. Results are memoized per distinct
+  model string, so the cost per photo does not grow with the mapping.
+  """
+
+  def __init__(self, mapping: Optional[Dict] = None, rules: Optional[Dict] = None):
+    mapping = mapping or {}
+    self._exact: Dict[str, str] = {str(k): str(v) for k, v in mapping.items()}
+    self._folded: Dict[str, str] = {}
+    for key, value in self._exact.items():
+      # Like the old linear scan, the first key in config order wins
+      self._folded.setdefault(key.casefold(), value)
+    self._rules: List[Tuple['re.Pattern', str]] = []
+    for pattern, name in (rules or {}).items():
+      try:
+        self._rules.append((re.compile(str(pattern), re.IGNORECASE), str(name)))
+      except re.error as e:
+        raise ConfigError(f"Invalid camera_model_rules pattern '{pattern}': {e}")
+    self._memo: Dict[Optional[str], str] = {}
+
+  def map(self, camera_model: Optional[str]) -> str:
+    """Mapped name for camera_model; 'Unknown' if it is empty."""
+    try:
+      return self._memo[camera_model]
+    except KeyError:
+      pass
+    result = self._lookup(camera_model)
+    self._memo[camera_model] = result
+    return result
+
+  def _lookup(self, camera_model: Optional[str]) -> str:
+    if not camera_model or not camera_model.strip():
+      return UNKNOWN
+    if camera_model in self._exact:
+      return self._exact[camera_model]
+    folded = camera_model.casefold()
+    if folded in self._folded:
+      return self._folded[folded]
+    stripped = camera_model.strip()
+    for pattern, name in self._rules:
+      match = pattern.fullmatch(stripped)
+      if match:
+        return match.expand(name)
+    # No mapping found, return original but clean it up
+    # Remove extra spaces and special characters that could cause issues in filenames
+    return stripped.replace(' ', '').replace('/', '_')
@@ -0,0 +1,329 @@
+"""
+Header-only photo metadata reader.
+
+Parses just enough of a JPEG (APP1/EXIF and SOF segments) or HEIC/HEIF
+(ISO-BMFF `meta` box) to return camera model, capture time and dimensions,
+using a handful of small bounded reads instead of handing the file to Pillow.
+Anything unexpected returns None so callers can fall back to Pillow.
+"""
+import struct
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+# Upper bounds on what we are willing to read; EXIF is limited to 64KB in JPEG
+# and real-world HEIC meta boxes are a few KB.
+_MAX_JPEG_HEADER = 1024 * 1024
+_MAX_META_BOX = 1024 * 1024
+_MAX_EXIF_ITEM = 256 * 1024
+
+_TAG_MODEL = 0x0110
+_TAG_EXIF_IFD = 0x8769
+_TAG_DATETIME_ORIGINAL = 0x9003
+
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+HEIF_EXTENSIONS = ('.heic', '.heif')
+
+
+def read_photo_header(file_path: str, fileobj: Optional[BinaryIO] = None) -> Optional[Dict]:
+  """
+  Return {'camera_model', 'taken_time', 'width', 'height', 'format'} read from
+  the file header, or None if the format is unsupported or the parse fails.
+  An already-open binary file may be passed to avoid a second open; it is
+  left open (position undefined) for the caller.
+  """
+  lower = file_path.lower()
+  if lower.endswith(JPEG_EXTENSIONS):
+    reader = _read_jpeg
+  elif lower.endswith(HEIF_EXTENSIONS):
+    reader = _read_heif
+  else:
+    return None
+  try:
+    if fileobj is not None:
+      fileobj.seek(0)
+      return reader(fileobj)
+    with open(file_path, 'rb') as f:
+      return reader(f)
+  except (OSError, ValueError, KeyError, struct.error, IndexError):
+    return None
+
+
+def parse_tiff_fields(tiff: bytes) -> Tuple[str, str]:
+  """Return (model, DateTimeOriginal) from a TIFF-structured EXIF block."""
+  if tiff[:2] == b'II':
+    endian = '<'
+  elif tiff[:2] == b'MM':
+    endian = '>'
+  else:
+    raise ValueError('Bad TIFF byte order')
+  if struct.unpack_from(endian + 'H', tiff, 2)[0] != 42:
+    raise ValueError('Bad TIFF magic')
+  ifd0 = _read_ifd(tiff, endian, struct.unpack_from(endian + 'I', tiff, 4)[0])
+  model = _ascii_value(tiff, endian, ifd0.get(_TAG_MODEL))
+  taken = ''
+  exif_entry = ifd0.get(_TAG_EXIF_IFD)
+  if exif_entry:
+    exif_offset = _long_value(tiff, endian, exif_entry)
+    exif_ifd = _read_ifd(tiff, endian, exif_offset)
+    taken = _ascii_value(tiff, endian, exif_ifd.get(_TAG_DATETIME_ORIGINAL))
+  return model, taken
+
+
+def _read_ifd(tiff: bytes, endian: str, offset: int) -> Dict[int, Tuple[int, int, int]]:
+  """Map tag -> (type, count, entry_offset) for one IFD."""
+  count = struct.unpack_from(endian + 'H', tiff, offset)[0]
+  entries = {}
+  for i in range(count):
+    entry = offset + 2 + i * 12
+    tag, typ, n = struct.unpack_from(endian + 'HHI', tiff, entry)
+    entries[tag] = (typ, n, entry)
+  return entries
+
+
+def _value_bytes(tiff: bytes, endian: str, entry: Tuple[int, int, int]) -> bytes:
+  typ, count, entry_offset = entry
+  size = _TYPE_SIZES.get(typ, 1) * count
+  if size <= 4:
+    return tiff[entry_offset + 8:entry_offset + 8 + size]
+  offset = struct.unpack_from(endian + 'I', tiff, entry_offset + 8)[0]
+  if offset + size > len(tiff):
+    raise ValueError('EXIF value out of range')
+  return tiff[offset:offset + size]
+
+
+def _ascii_value(tiff: bytes, endian: str, entry: Optional[Tuple[int, int, int]]) -> str:
+  if not entry:
+    return ''
+  return _value_bytes(tiff, endian, entry).rstrip(b'\x00').decode(errors='ignore').strip()
+
+
+def _long_value(tiff: bytes, endian: str, entry: Tuple[int, int, int]) -> int:
+  return struct.unpack_from(endian + 'I', _value_bytes(tiff, endian, entry))[0]
+
+
+def _result(fmt: str, width: int, height: int, model: str, taken: str) -> Dict:
+  return {
+    'camera_model': model or 'Unknown',
+    'taken_time': taken,
+    'width': width,
+    'height': height,
+    'format': fmt,
+  }
+
+
+def _read_jpeg(f: BinaryIO) -> Optional[Dict]:
+  if f.read(2) != b'\xff\xd8':
+    return None
+  model, taken = '', ''
+  while f.tell() < _MAX_JPEG_HEADER:
+    marker = f.read(2)
+    if len(marker) < 2 or marker[0] != 0xFF:
+      return None
+    code = marker[1]
+    if code == 0xFF:
+      # Fill byte before the real marker
+      f.seek(-1, 1)
+      continue
+    if code == 0xD8 or 0xD0 <= code <= 0xD7 or code == 0x01:
+      continue
+    if code in (0xD9, 0xDA):
+      # End of image / start of scan before a frame header: give up
+      return None
+    length = struct.unpack('>H', f.read(2))[0]
+    if length < 2:
+      return None
+    if code == 0xE1 and not model and not taken:
+      segment = f.read(length - 2)
+      if segment[:6] == b'Exif\x00\x00':
+        model, taken = parse_tiff_fields(segment[6:])
+      continue
+    if code in _SOF_MARKERS:
+      height, width = struct.unpack('>xHH', f.read(5))
+      return _result('JPEG', width, height, model, taken)
+    f.seek(length - 2, 1)
+  return None
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+  """Yield (type, payload_start, payload_end) for ISO-BMFF boxes in data[start:end]."""
+  pos = start
+  end = len(data) if end is None else end
+  while pos + 8 <= end:
+    size, box_type = struct.unpack_from('>I4s', data, pos)
+    header = 8
+    if size == 1:
+      size = struct.unpack_from('>Q', data, pos + 8)[0]
+      header = 16
+    elif size == 0:
+      size = end - pos
+    if size < header or pos + size > end:
+      raise ValueError('Truncated box')
+    yield box_type, pos + header, pos + size
+    pos += size
+
+
+def _read_uint(data: bytes, pos: int, size: int) -> int:
+  if size == 0:
+    return 0
+  return int.from_bytes(data[pos:pos + size], 'big')
+
+
+def _read_heif(f: BinaryIO) -> Optional[Dict]:
+  # Locate the top-level meta box without reading mdat
+  meta = None
+  while meta is None:
+    header = f.read(8)
+    if len(header) < 8:
+      return None
+    size, box_type = struct.unpack('>I4s', header)
+    header_len = 8
+    if size == 1:
+      size = struct.unpack('>Q', f.read(8))[0]
+      header_len = 16
+    if box_type == b'meta':
+      if size - header_len > _MAX_META_BOX:
+        return None
+      meta = f.read(size - header_len)
+    elif size == 0:
+      return None
+    else:
+      f.seek(size - header_len, 1)
+
+  boxes = {t: (s, e) for t, s, e in _iter_boxes(meta, 4)}
+  primary = _heif_primary_item(meta, boxes)
+  exif_item = _heif_exif_item(meta, boxes)
+  width, height = _heif_dimensions(meta, boxes, primary)
+  if not width or not height:
+    return None
+  model, taken = '', ''
+  if exif_item is not None:
+    location = _heif_item_location(meta, boxes, exif_item)
+    if location:
+      offset, length = location
+      if length > _MAX_EXIF_ITEM:
+        return None
+      f.seek(offset)
+      item = f.read(length)
+      tiff_offset = struct.unpack_from('>I', item, 0)[0] + 4
+      tiff = item[tiff_offset:]
+      if tiff[:6] == b'Exif\x00\x00':
+        tiff = tiff[6:]
+      model, taken = parse_tiff_fields(tiff)
+  return _result('HEIF', width, height, model, taken)
+
+
+def _heif_primary_item(meta: bytes, boxes: Dict) -> Optional[int]:
+  if b'pitm' not in boxes:
+    return None
+  start, _ = boxes[b'pitm']
+  version = meta[start]
+  return _read_uint(meta, start + 4, 2 if version == 0 else 4)
+
+
+def _heif_exif_item(meta: bytes, boxes: Dict) -> Optional[int]:
+  if b'iinf' not in boxes:
+    return None
+  start, end = boxes[b'iinf']
+  version = meta[start]
+  pos = start + 4 + (2 if version == 0 else 4)
+  for box_type, s, _ in _iter_boxes(meta, pos, end):
+    if box_type != b'infe':
+      continue
+    infe_version = meta[s]
+    if infe_version < 2:
+      continue
+    id_size = 2 if infe_version == 2 else 4
+    item_id = _read_uint(meta, s + 4, id_size)
+    item_type = meta[s + 4 + id_size + 2:s + 4 + id_size + 6]
+    if item_type == b'Exif':
+      return item_id
+  return None
+
+
+def _heif_item_location(meta: bytes, boxes: Dict, wanted: int) -> Optional[Tuple[int, int]]:
+  if b'iloc' not in boxes:
+    return None
+  start, _ = boxes[b'iloc']
+  version = meta[start]
+  pos = start + 4
+  offset_size = meta[pos] >> 4
+  length_size = meta[pos] & 0x0F
+  base_offset_size = meta[pos + 1] >> 4
+  index_size = meta[pos + 1] & 0x0F if version in (1, 2) else 0
+  pos += 2
+  id_size = 2 if version < 2 else 4
+  item_count = _read_uint(meta, pos, id_size)
+  pos += id_size
+  for _ in range(item_count):
+    item_id = _read_uint(meta, pos, id_size)
+    pos += id_size
+    construction_method = 0
+    if version in (1, 2):
+      construction_method = _read_uint(meta, pos, 2) & 0x0F
+      pos += 2
+    pos += 2  # data_reference_index
+    base_offset = _read_uint(meta, pos, base_offset_size)
+    pos += base_offset_size
+    extent_count = _read_uint(meta, pos, 2)
+    pos += 2
+    extents: List[Tuple[int, int]] = []
+    for _ in range(extent_count):
+      pos += index_size
+      extent_offset = _read_uint(meta, pos, offset_size)
+      pos += offset_size
+      extent_length = _read_uint(meta, pos, length_size)
+      pos += length_size
+      extents.append((extent_offset, extent_length))
+    if item_id == wanted:
+      if construction_method != 0 or len(extents) != 1:
+        return None
+      return base_offset + extents[0][0], extents[0][1]
+  return None
+
+
+def _heif_dimensions(meta: bytes, boxes: Dict, primary: Optional[int]) -> Tuple[int, int]:
+  """Return the primary item's displayed size (ispe, swapped for 90/270 rotation)."""
+  if b'iprp' not in boxes or primary is None:
+    return 0, 0
+  start, end = boxes[b'iprp']
+  iprp = {t: (s, e) for t, s, e in _iter_boxes(meta, start, end)}
+  if b'ipco' not in iprp or b'ipma' not in iprp:
+    return 0, 0
+  properties = list(_iter_boxes(meta, *iprp[b'ipco']))
+
+  s, _ = iprp[b'ipma']
+  version, flags = meta[s], _read_uint(meta, s + 1, 3)
+  pos = s + 4
+  entry_count = _read_uint(meta, pos, 4)
+  pos += 4
+  associated: List[int] = []
+  for _ in range(entry_count):
+    item_id = _read_uint(meta, pos, 2 if version < 1 else 4)
+    pos += 2 if version < 1 else 4
+    count = meta[pos]
+    pos += 1
+    for _ in range(count):
+      if flags & 1:
+        index = _read_uint(meta, pos, 2) & 0x7FFF
+        pos += 2
+      else:
+        index = meta[pos] & 0x7F
+        pos += 1
+      if item_id == primary and index:
+        associated.append(index)
+
+  width = height = 0
+  rotation = 0
+  for index in associated:
+    if index > len(properties):
+      continue
+    box_type, ps, _ = properties[index - 1]
+    if box_type == b'ispe':
+      width, height = struct.unpack_from('>II', meta, ps + 4)
+    elif box_type == b'irot':
+      rotation = meta[ps] & 0x03
+  if rotation in (1, 3):
+    width, height = height, width
+  return width, height
@@ -0,0 +1,125 @@
+"""HEIC/HEIF to JPEG conversion on a process pool with a per-file time budget."""
+import concurrent.futures
+import os
+import time
+from typing import Dict, Optional
+
+import pillow_heif
+from PIL import Image
+
+from media.exceptions import MediaProcessingError
+from media.photo import fit_within
+from utils.file_ops import stamp_fd
+from utils.memory import reset_peak_rss, window_peak_rss_mb
+from utils.workers import create_process_pool
+
+pillow_heif.register_heif_opener()
+
+HEIF_FORMATS = ('HEIC', 'HEIF')
+
+# Extra wait in the parent for a worker that is finishing right at its deadline
+_DEADLINE_GRACE_SEC = 1.0
+
+
+class HeicTimeout(MediaProcessingError):
+  """Raised when a HEIC conversion does not finish within its time budget."""
+  pass
+
+
+def _check_deadline(file_path: str, deadline: Optional[float], step: str) -> None:
+  if deadline is not None and time.time() > deadline:
+    raise HeicTimeout(f"HEIC conversion of {file_path} exceeded its time budget ({step})")
+
+
+def convert_heic_file(file_path: str, output_path: str, max_width: int, max_height: int, quality: int,
+                      deadline: Optional[float] = None, mtime: Optional[float] = None) -> Dict:
+  """
+  Decode a HEIC/HEIF photo, downsize it to fit max_width x max_height and write
+  it to output_path as a JPEG, keeping its EXIF and ICC profile. Module-level
+  so it can be submitted to a process pool.
+
+  The deadline (a time.time() value) is checked between decode, resize and
+  encode; past it the partial output is removed and HeicTimeout raised.
+  With mtime, the output is stamped with it before it is moved into place.
+  Returns the same stats as Photo.resize_stats.
+  """
+  base, ext = os.path.splitext(output_path)
+  temp_path = f"{base}.tmp{ext}"
+  reset_peak_rss()
+  try:
+    with Image.open(file_path) as img:
+      # pillow_heif applies the rotation on decode and resets the EXIF orientation
+      exif_data = img.info.get('exif')
+      icc_profile = img.info.get('icc_profile')
+      img.load()
+      _check_deadline(file_path, deadline, 'decode')
+      target = fit_within(img.width, img.height, max_width, max_height)
+      converted = img if target == img.size else img.resize(target, Image.Resampling.LANCZOS)
+      if converted.mode != 'RGB':
+        converted = converted.convert('RGB')
+    _check_deadline(file_path, deadline, 'resize')
+    save_args = {'quality': quality}
+    if exif_data:
+      save_args['exif'] = exif_data
+    if icc_profile:
+      save_args['icc_profile'] = icc_profile
+    stamped = False
+    with open(temp_path, 'wb') as f:
+      converted.save(f, 'JPEG', **save_args)
+      if mtime is not None:
+        f.flush()
+        stamped = stamp_fd(f.fileno(), mtime)
+    _check_deadline(file_path, deadline, 'encode')
+    os.replace(temp_path, output_path)
+  except BaseException:
+    if os.path.exists(temp_path):
+      os.remove(temp_path)
+    raise
+  stats = {'strategy': 'heic-jpeg', 'peak_rss_mb': window_peak_rss_mb()}
+  if mtime is not None:
+    stats['stamped'] = stamped
+  return stats
+
+
+class HeicConverter:
+  """
+  Converts HEIC/HEIF photos to JPEG on a process pool of `processes` workers
+  (0 = one per CPU core), each file within time_budget seconds of being
+  handed to the pool. convert() blocks the calling I/O thread, so the I/O
+  thread pool provides the concurrency and the process pool caps it.
+  """
+
+  def __init__(self, processes: int = 0, time_budget: float = 120.0, quality: int = 95):
+    self.processes = processes if processes > 0 else (os.cpu_count() or 1)
+    self.time_budget = time_budget
+    self.quality = quality
+    self._pool = create_process_pool(self.processes)
+
+  def convert(self, file_path: str, output_path: str, max_width: int, max_height: int,
+              mtime: Optional[float] = None) -> Dict:
+    """Convert file_path to a JPEG at output_path. Raises HeicTimeout past the time budget."""
+    deadline = time.time() + self.time_budget
+    future = self._pool.submit(
+      convert_heic_file, file_path, output_path, max_width, max_height, self.quality, deadline, mtime
+    )
+    try:
+      return future.result(timeout=self.time_budget + _DEADLINE_GRACE_SEC)
+    except concurrent.futures.TimeoutError:
+      # The worker cannot be interrupted mid-step; it drops its output at the next deadline check
+      future.cancel()
+      raise HeicTimeout(f"HEIC conversion of {file_path} exceeded its time budget "
+                        f"({self.time_budget:g}s)")
+
+  def shutdown(self) -> None:
+    self._pool.shutdown(cancel_futures=True)
+
+
+def open_heic_converter(config) -> Optional[HeicConverter]:
+  """Create the converter configured under `photo.heic`, or None if disabled."""
+  if not config.get('photo.heic.enabled', False):
+    return None
+  return HeicConverter(
+    config.get('photo.heic.processes', 0),
+    config.get('photo.heic.time_budget_sec', 120.0),
+    config.photo.quality
+  )
@@ -0,0 +1,148 @@
+"""Persistent on-disk cache of extracted photo/video metadata."""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+  dev INTEGER NOT NULL,
+  ino INTEGER NOT NULL,
+  size INTEGER NOT NULL,
+  mtime_ns INTEGER NOT NULL,
+  kind TEXT NOT NULL,
+  path TEXT NOT NULL,
+  data TEXT NOT NULL,
+  accessed REAL NOT NULL,
+  PRIMARY KEY (dev, ino)
+)
+"""
+
+class MetadataCache:
+  """
+  SQLite-backed metadata cache keyed on (device, inode).
+
+  An entry is only valid while the file's size and mtime match the values
+  recorded when it was stored; stale entries are dropped on lookup. Keying on
+  the inode rather than the path keeps entries valid across the in-place
+  renames the pipeline performs. The cache is capped at max_entries, evicting
+  the least recently used rows.
+  """
+
+  COMMIT_EVERY = 200
+
+  def __init__(self, db_path: str, max_entries: int = 200000):
+    self.db_path = db_path
+    self.max_entries = max_entries
+    self._lock = threading.Lock()
+    self._pending_writes = 0
+    self.hits = 0
+    self.misses = 0
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    self._conn = sqlite3.connect(db_path, check_same_thread=False)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute("PRAGMA synchronous=NORMAL")
+    self._conn.execute(_SCHEMA)
+    self._conn.commit()
+
+  def lookup(self, path: str, kind: str) -> Optional[Dict]:
+    """Return cached metadata for path, or None if missing or stale."""
+    try:
+      st = os.stat(path)
+    except OSError:
+      return None
+    with self._lock:
+      row = self._conn.execute(
+        "SELECT size, mtime_ns, kind, data FROM metadata WHERE dev = ? AND ino = ?",
+        (st.st_dev, st.st_ino)
+      ).fetchone()
+      if row is None:
+        self.misses += 1
+        return None
+      size, mtime_ns, cached_kind, data = row
+      if size != st.st_size or mtime_ns != st.st_mtime_ns:
+        self._conn.execute("DELETE FROM metadata WHERE dev = ? AND ino = ?", (st.st_dev, st.st_ino))
+        self._note_write()
+        self.misses += 1
+        return None
+      if cached_kind != kind:
+        self.misses += 1
+        return None
+      self._conn.execute(
+        "UPDATE metadata SET accessed = ?, path = ? WHERE dev = ? AND ino = ?",
+        (time.time(), path, st.st_dev, st.st_ino)
+      )
+      self._note_write()
+      self.hits += 1
+    return json.loads(data)
+
+  def contains(self, path: str, kind: str) -> bool:
+    """True if a valid entry exists for path; does not count as a hit or refresh it."""
+    try:
+      st = os.stat(path)
+    except OSError:
+      return False
+    with self._lock:
+      row = self._conn.execute(
+        "SELECT size, mtime_ns, kind FROM metadata WHERE dev = ? AND ino = ?",
+        (st.st_dev, st.st_ino)
+      ).fetchone()
+    return row is not None and row == (st.st_size, st.st_mtime_ns, kind)
+
+  def store(self, path: str, kind: str, metadata: Dict) -> None:
+    """Record metadata for path against its current size and mtime."""
+    try:
+      st = os.stat(path)
+    except OSError:
+      return
+    with self._lock:
+      self._conn.execute(
+        "INSERT OR REPLACE INTO metadata (dev, ino, size, mtime_ns, kind, path, data, accessed) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, kind, path,
+         json.dumps(metadata, ensure_ascii=False), time.time())
+      )
+      self._note_write()
+
+  def _note_write(self) -> None:
+    self._pending_writes += 1
+    if self._pending_writes >= self.COMMIT_EVERY:
+      self._flush()
+
+  def _flush(self) -> None:
+    self._prune()
+    self._conn.commit()
+    self._pending_writes = 0
+
+  def _prune(self) -> None:
+    if not self.max_entries or self.max_entries <= 0:
+      return
+    count = self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+    excess = count - self.max_entries
+    if excess > 0:
+      self._conn.execute(
+        "DELETE FROM metadata WHERE rowid IN "
+        "(SELECT rowid FROM metadata ORDER BY accessed ASC LIMIT ?)",
+        (excess,)
+      )
+
+  def __len__(self) -> int:
+    with self._lock:
+      return self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+  def close(self) -> None:
+    with self._lock:
+      self._flush()
+      self._conn.close()
+
+
+def open_metadata_cache(config, log_file: str) -> Optional[MetadataCache]:
+  """Open the metadata cache configured under `metadata_cache`, or None if disabled."""
+  if not config.get('metadata_cache.enabled', False):
+    return None
+  db_path = config.get('metadata_cache.path')
+  if not db_path:
+    db_path = os.path.join(os.path.dirname(log_file), 'media_tool_cache.sqlite')
+  return MetadataCache(db_path, config.get('metadata_cache.max_entries', 200000))
@@ -3,45 +3,121 @@ import pillow_heif
 from PIL import Image
 import piexif
 import os
-import shutil
-from typing import Optional, Dict
+import threading
+from typing import Callable, Optional, Dict, Tuple, Union
+
+from media.exif_reader import read_photo_header
+from utils.file_ops import stamp_fd
+from utils.transfer import transfer_file
+from utils.timing import stage
+from utils.memory import current_rss_mb, reset_peak_rss, window_peak_rss_mb
 
 pillow_heif.register_heif_opener()
 
+_MB = 1024 * 1024
+# Modes Image.reduce averages correctly (palette and bilevel images are not)
+_REDUCIBLE_MODES = ('L', 'LA', 'RGB', 'RGBA', 'RGBX', 'CMYK', 'YCbCr', 'I', 'F')
+# Decoded rows per strip in 'budget' mode
+_STRIP_BYTES = 16 * _MB
+# Held while a resize in this process measures or budgets RSS
+_rss_window = threading.Lock()
+# Resizes running in this process, and started so far (to tell if a measured one overlapped another)
+_resizes = {'running': 0, 'started': 0}
+_resizes_lock = threading.Lock()
+
 class Photo:
-  def __init__(self, file_path: str, fallback_time: Optional[str] = None):
+  # Optional MetadataCache shared by all photos (configured by main)
+  metadata_cache = None
+  # Strategy and memory stats of the last resize(), None if it only copied
+  resize_stats = None
+
+  def __init__(self, file_path: str, fallback_time: Union[str, Callable[[], Optional[str]], None] = None,
+               metadata: Optional[Dict] = None):
     self.file_path = file_path
-    self.metadata = self._extract_metadata()
+    self._file = None
+    self._image = None
+    # Metadata already extracted elsewhere (e.g. by a planning run) is used as-is
+    self.metadata = metadata if metadata is not None else self._extract_metadata()
     self._official_time = self._calc_official_time(fallback_time)
 
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.close()
+
+  def _open_image(self) -> Image.Image:
+    """
+    Return the image handle, opening the file on first use.
+    Image.open only parses the header; pixel data is decoded on demand, so the
+    same handle serves both metadata extraction and a later resize.
+    """
+    if self._image is None:
+      if self._file is not None:
+        self._file.seek(0)
+        self._image = Image.open(self._file)
+      else:
+        self._image = Image.open(self.file_path)
+    return self._image
+
+  def close(self) -> None:
+    """Release the underlying file handle, if one was opened."""
+    if self._image is not None:
+      self._image.close()
+      self._image = None
+    if self._file is not None:
+      self._file.close()
+      self._file = None
+
+  @stage('metadata')
   def _extract_metadata(self) -> Dict:
+    if self.metadata_cache is not None:
+      cached = self.metadata_cache.lookup(self.file_path, 'photo')
+      if cached is not None:
+        return cached
+    # Fast path: parse only the JPEG/HEIC header, Pillow is not involved.
+    # The file object stays open so a later resize does not reopen the file.
+    try:
+      self._file = open(self.file_path, 'rb')
+    except OSError:
+      self._file = None
+    meta = read_photo_header(self.file_path, self._file) if self._file is not None else None
+    if meta is not None:
+      if self.metadata_cache is not None:
+        self.metadata_cache.store(self.file_path, 'photo', meta)
+      return meta
     meta = {'camera_model': 'Unknown', 'taken_time': '', 'width': 0, 'height': 0, 'format': ''}
     try:
-      with Image.open(self.file_path) as img:
-        meta['width'] = img.width
-        meta['height'] = img.height
-        meta['format'] = img.format or ''
-        exif_data = img.info.get('exif')
-        if exif_data:
-          exif_dict = piexif.load(exif_data)
-          model = exif_dict['0th'].get(piexif.ImageIFD.Model, b'').decode(errors='ignore').strip()
-          dt = exif_dict['Exif'].get(piexif.ExifIFD.DateTimeOriginal, b'').decode(errors='ignore').strip()
-          if model:
-            meta['camera_model'] = model
-          if dt:
-            meta['taken_time'] = dt
+      img = self._open_image()
+      meta['width'] = img.width
+      meta['height'] = img.height
+      meta['format'] = img.format or ''
+      exif_data = img.info.get('exif')
+      if exif_data:
+        exif_dict = piexif.load(exif_data)
+        model = exif_dict['0th'].get(piexif.ImageIFD.Model, b'').decode(errors='ignore').strip()
+        dt = exif_dict['Exif'].get(piexif.ExifIFD.DateTimeOriginal, b'').decode(errors='ignore').strip()
+        if model:
+          meta['camera_model'] = model
+        if dt:
+          meta['taken_time'] = dt
     except Exception:
-      pass
+      return meta
+    if self.metadata_cache is not None:
+      self.metadata_cache.store(self.file_path, 'photo', meta)
     return meta
 
-  def _calc_official_time(self, fallback_time: Optional[str]) -> str:
+  def _calc_official_time(self, fallback_time: Union[str, Callable[[], Optional[str]], None]) -> str:
     """
     Decide the official time for this photo (for filename, etc):
     1. Use EXIF taken_time if present
-    2. Else use fallback_time (e.g., from filename or file creation)
+    2. Else use fallback_time (e.g., from filename or file creation); it may be
+       a callable, which is then only called when the metadata has no time
     """
     if self.metadata.get('taken_time'):
       return self.metadata['taken_time']
+    if callable(fallback_time):
+      fallback_time = fallback_time()
     if fallback_time:
       return fallback_time
     return ''
@@ -62,22 +138,156 @@ class Photo:
   def camera_model(self):
     return self.metadata['camera_model']
 
-  def resize(self, output_path: str, max_width: int, max_height: int, quality: int) -> None:
-    """Resize photo if needed, else copy. Writes atomically."""
-    with Image.open(self.file_path) as img:
-      if img.width <= max_width and img.height <= max_height:
-        shutil.copy2(self.file_path, output_path)
-        return
-      if os.path.getsize(self.file_path) < 2 * 1024 * 1024:
-        shutil.copy2(self.file_path, output_path)
-        return
-      if img.format in ['HEIC', 'HEIF']:
-        shutil.copy2(self.file_path, output_path)
-        return
-      exif_data = img.info.get('exif')
-      img_copy = img.copy()
-      img_copy.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-      img_copy.save(output_path, quality=quality, exif=exif_data)
+  def resize(self, output_path: str, max_width: int, max_height: int, quality: int,
+             mode: str = 'draft', move: bool = False, max_rss_mb: int = 512,
+             mtime: Optional[float] = None) -> Optional[str]:
+    """
+    Resize photo if needed, else copy. Writes atomically.
+    The copy decision uses the metadata already extracted, so passthrough files
+    are never reopened and pixel data is only decoded when a resize happens.
+
+    mode 'draft' lets the JPEG decoder scale down by 1/2, 1/4 or 1/8 in the DCT
+    domain (never below the target size) before the final LANCZOS pass;
+    'full' decodes at full resolution first; 'budget' picks the cheapest
+    strategy whose estimated memory keeps the process under max_rss_mb (see
+    _resize_within_budget) and copies the photo unresized if none does.
+
+    Passthroughs go through utils.transfer; with move=True the source may be
+    renamed into place. Returns the transfer method for a passthrough
+    ('rename' means the source is gone), or None if the photo was resized.
+    The strategy and the peak RSS while resizing are left in resize_stats
+    (peak None if another resize in this process overlapped it). Budget
+    resizes in one process run one at a time.
+
+    With mtime, a resized photo gets it as atime and mtime through the still
+    open output right after the write; resize_stats['stamped'] tells whether
+    that worked. Passthroughs keep the source's times either way.
+    """
+    self.resize_stats = None
+    width, height, fmt = self.width, self.height, self.metadata.get('format')
+    if not width or not height:
+      img = self._open_image()
+      width, height, fmt = img.width, img.height, img.format
+    if (width <= max_width and height <= max_height
+        or os.path.getsize(self.file_path) < 2 * 1024 * 1024
+        or fmt in ['HEIC', 'HEIF']):
+      with stage('copy'):
+        return transfer_file(self.file_path, output_path, move)
+    img = self._open_image()
+    exif_data = img.info.get('exif')
+    target = fit_within(img.width, img.height, max_width, max_height)
+    # RSS readings are process-wide: budget resizes in this process take turns so
+    # each is checked against the others' memory, other modes report a peak only
+    # when no other resize overlapped
+    measured = _rss_window.acquire(blocking=mode == 'budget')
+    with _resizes_lock:
+      alone = _resizes['running'] == 0
+      _resizes['running'] += 1
+      _resizes['started'] += 1
+      started = _resizes['started']
+    try:
+      if measured:
+        reset_peak_rss()
+      if mode == 'budget':
+        strategy, resized, estimated = self._resize_within_budget(img, target, max_rss_mb)
+      else:
+        box = None
+        strategy = 'full'
+        if mode == 'draft':
+          # Only JPEG supports draft decoding; other formats return None
+          drafted = img.draft(None, target)
+          if drafted is not None:
+            box = drafted[1]
+            strategy = 'draft'
+        estimated = decoded_bytes(img.mode, img.size) + decoded_bytes(img.mode, target)
+        with stage('resize'):
+          resized = img.resize(target, Image.Resampling.LANCZOS, box=box)
+      self.resize_stats = {'strategy': strategy, 'estimated_mb': round(estimated / _MB, 1)}
+      if resized is None:
+        with stage('copy'):
+          return transfer_file(self.file_path, output_path, move)
+      with stage('encode'), open(output_path, 'wb') as f:
+        # JPEG and TIFF encoders reject exif=None; the format comes from f.name
+        if exif_data:
+          resized.save(f, quality=quality, exif=exif_data)
+        else:
+          resized.save(f, quality=quality)
+        if mtime is not None:
+          f.flush()
+          self.resize_stats['stamped'] = stamp_fd(f.fileno(), mtime)
+      with _resizes_lock:
+        alone = alone and _resizes['started'] == started
+      self.resize_stats['peak_rss_mb'] = window_peak_rss_mb() if measured and alone else None
+    finally:
+      with _resizes_lock:
+        _resizes['running'] -= 1
+      if measured:
+        _rss_window.release()
+    return None
+
+  def _resize_within_budget(self, img: Image.Image, target: Tuple[int, int],
+                            max_rss_mb: int) -> Tuple[str, Optional[Image.Image], int]:
+    """
+    Resize img to target with the first strategy whose estimated peak fits in
+    what is left of max_rss_mb:
+    - 'draft': JPEG decoded at reduced scale (the cheapest, JPEG only)
+    - 'reduce': full decode, Image.reduce to about twice the target, the
+      full-size buffer is freed before the final LANCZOS pass
+    - 'strips': uncompressed TIFF/BMP/PPM rows read and reduced a strip at a
+      time, so the full-size image is never in memory
+    Returns (strategy, resized image, estimated bytes); the image is None and
+    the strategy 'passthrough' if nothing fits.
+    """
+    budget = (max_rss_mb - (current_rss_mb() or 0)) * _MB
+    target_bytes = decoded_bytes(img.mode, target)
+    if img.format == 'JPEG':
+      drafted = img.draft(None, target)
+      estimated = decoded_bytes(img.mode, img.size) + target_bytes
+      if estimated > budget:
+        return 'passthrough', None, estimated
+      with stage('resize'):
+        return 'draft', img.resize(target, Image.Resampling.LANCZOS, box=drafted and drafted[1]), estimated
+
+    factor = reduce_factor(img.size, target) if img.mode in _REDUCIBLE_MODES else 1
+    reduced_size = (-(-img.width // factor), -(-img.height // factor))
+    reduced_bytes = decoded_bytes(img.mode, reduced_size)
+    estimated = decoded_bytes(img.mode, img.size) + reduced_bytes
+    if estimated <= budget:
+      with stage('resize'):
+        img.load()
+        reduced = img.reduce(factor) if factor > 1 else img
+        if reduced is not img:
+          self.close()
+        return 'reduce', reduced.resize(target, Image.Resampling.LANCZOS), estimated
+
+    layout = _raw_layout(img) if factor > 1 else None
+    if layout is not None:
+      row_bytes = decoded_bytes(img.mode, (img.width, 1)) + layout[2]
+      # At most an eighth of the image per strip, whole multiples of the reduce factor
+      rows = max(factor, min(_STRIP_BYTES // row_bytes, -(-img.height // 8)) // factor * factor)
+      estimated = reduced_bytes + target_bytes + rows * row_bytes
+      if estimated <= budget:
+        with stage('resize'):
+          reduced = self._reduce_strips(img, layout, factor, rows)
+          return 'strips', reduced.resize(target, Image.Resampling.LANCZOS), estimated
+    return 'passthrough', None, estimated
+
+  def _reduce_strips(self, img: Image.Image, layout: Tuple[int, str, int, int], factor: int,
+                     rows: int) -> Image.Image:
+    """Read img's raw pixel rows `rows` at a time and Image.reduce each strip into one canvas."""
+    offset, rawmode, stride, orientation = layout
+    width, height = img.size
+    canvas = Image.new(img.mode, (-(-width // factor), -(-height // factor)))
+    with open(self.file_path, 'rb') as f:
+      for top in range(0, height, rows):
+        count = min(rows, height - top)
+        # Bottom-up files (BMP) store the last row first
+        first_row = top if orientation > 0 else height - top - count
+        f.seek(offset + first_row * stride)
+        strip = Image.frombytes(img.mode, (width, count), f.read(count * stride),
+                                'raw', rawmode, stride, orientation)
+        canvas.paste(strip.reduce(factor), (0, top // factor))
+    return canvas
 
   def generate_filename(self, pattern: str, ext: str, counter: int = 0) -> str:
     """
@@ -91,3 +301,51 @@ class Photo:
       base, extension = os.path.splitext(name)
       name = f"{base}_{counter}{extension}"
     return name
+
+def fit_within(width: int, height: int, max_width: int, max_height: int):
+  """Largest size with the same aspect ratio that fits in max_width x max_height."""
+  scale = min(max_width / width, max_height / height, 1.0)
+  return max(1, round(width * scale)), max(1, round(height * scale))
+
+def decoded_bytes(mode: str, size: Tuple[int, int]) -> int:
+  """Bytes Pillow needs to hold an image of this mode and size in memory."""
+  if mode in ('1', 'L', 'P'):
+    bpp = 1
+  elif mode.startswith('I;16'):
+    bpp = 2
+  else:
+    bpp = 4
+  return size[0] * size[1] * bpp
+
+def reduce_factor(size: Tuple[int, int], target: Tuple[int, int]) -> int:
+  """Integer Image.reduce factor that keeps the image at least twice the target size."""
+  return max(1, min(size[0] // target[0], size[1] // target[1]) // 2)
+
+def _raw_layout(img: Image.Image) -> Optional[Tuple[int, str, int, int]]:
+  """
+  (offset, rawmode, stride, orientation) of an image stored as one block of
+  uncompressed rows, or None if its rows cannot be read independently.
+  """
+  if len(img.tile) != 1:
+    return None
+  codec, extents, offset, args = img.tile[0][:4]
+  if codec != 'raw' or tuple(extents) != (0, 0) + img.size:
+    return None
+  if not isinstance(args, tuple):
+    args = (args,)
+  rawmode, stride, orientation = (args + (0, 1))[:3]
+  if not stride:
+    # Packed rows; let the encoder tell the row size of this rawmode
+    stride = len(Image.new(img.mode, (img.width, 1)).tobytes('raw', rawmode))
+  return offset, rawmode, stride, orientation or 1
+
+def resize_photo_file(file_path: str, output_path: str, max_width: int, max_height: int, quality: int,
+                      mode: str = 'draft', move: bool = False,
+                      max_rss_mb: int = 512, mtime: Optional[float] = None) -> Tuple[Optional[str], Optional[Dict]]:
+  """
+  Resize a photo by path. Module-level so it can be submitted to a process pool.
+  Returns the transfer method (see Photo.resize) and the resize stats.
+  """
+  with Photo(file_path) as photo:
+    transfer = photo.resize(output_path, max_width, max_height, quality, mode, move, max_rss_mb, mtime)
+    return transfer, photo.resize_stats
@@ -0,0 +1,155 @@
+"""Shared ffprobe invocation, output parsing and per-file result caching."""
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from media.exceptions import MetadataError
+
+# One command serves both Video metadata and FFmpegWrapper.get_video_info
+_SHOW_ENTRIES = [
+  '-show_entries', 'stream=width,height,codec_name,bit_rate,color_primaries,color_trc,colorspace',
+  '-show_entries', 'stream_tags=rotate',
+  '-show_entries', 'stream_side_data=rotation',
+  '-show_entries', 'format=duration',
+  '-show_entries', 'format_tags=creation_time',
+]
+
+
+def build_probe_cmd(ffprobe_cmd: str, file_path: str) -> List[str]:
+  return [ffprobe_cmd, '-v', 'error', '-select_streams', 'v:0'] + _SHOW_ENTRIES + ['-of', 'json', file_path]
+
+
+def parse_probe_output(info: Dict) -> Dict:
+  """
+  Convert ffprobe JSON output into the metadata dict used by Video and FFmpegWrapper:
+  creation_time, codec, width, height, rotation, duration, bitrate, color_primaries, color_trc, colorspace
+  """
+  stream = info['streams'][0] if info.get('streams') else {}
+  # Phones record portrait clips as landscape frames plus a display rotation,
+  # in the side data (newer ffprobe) or the legacy rotate tag
+  rotation = stream.get('tags', {}).get('rotate', 0)
+  for side_data in stream.get('side_data_list', []):
+    if 'rotation' in side_data:
+      rotation = side_data['rotation']
+  format_info = info.get('format', {})
+  tags = format_info.get('tags', {})
+  return {
+    'creation_time': tags.get('creation_time', ''),
+    'codec': stream.get('codec_name', 'unknown'),
+    'width': stream.get('width', 0),
+    'height': stream.get('height', 0),
+    'rotation': int(float(rotation)) % 360,
+    'duration': float(format_info.get('duration', 0)),
+    'bitrate': int(stream.get('bit_rate', 0)) if stream.get('bit_rate') else 0,
+    'color_primaries': stream.get('color_primaries', ''),
+    'color_trc': stream.get('color_trc', ''),
+    'colorspace': stream.get('colorspace', '')
+  }
+
+
+def display_size(info: Dict) -> Tuple[int, int]:
+  """(width, height) of the frames as shown, i.e. with the display rotation applied."""
+  width, height = info.get('width') or 0, info.get('height') or 0
+  if info.get('rotation', 0) % 180 == 90:
+    return height, width
+  return width, height
+
+
+class ProbeService:
+  """
+  Runs ffprobe and caches parsed results in memory.
+
+  Results are keyed on (device, inode, size, mtime), so a file is probed at most
+  once while unchanged and a rewritten output is always re-probed. The cache
+  holds up to max_entries results, evicting the least recently used, so a long
+  watch run does not keep every file it ever probed. probe_many() keeps up to
+  max_workers ffprobe subprocesses running concurrently; its results are held
+  outside that cap until first used, so prefetching a batch larger than
+  max_entries still probes each file once.
+  """
+
+  def __init__(self, max_workers: int = 4, max_entries: int = 4096):
+    self.max_workers = max_workers
+    self.max_entries = max_entries
+    self._lock = threading.Lock()
+    self._results: 'OrderedDict[Tuple[int, int, int, int], Dict]' = OrderedDict()
+    # Prefetched by probe_many and not looked up yet
+    self._prefetched: Dict[Tuple[int, int, int, int], Dict] = {}
+    self.probe_count = 0
+
+  @staticmethod
+  def _key(file_path: str) -> Tuple[int, int, int, int]:
+    st = os.stat(file_path)
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+  def cached(self, file_path: str) -> Optional[Dict]:
+    try:
+      key = self._key(file_path)
+    except OSError:
+      return None
+    with self._lock:
+      result = self._lookup(key)
+    return dict(result) if result is not None else None
+
+  def _lookup(self, key: Tuple[int, int, int, int]) -> Optional[Dict]:
+    result = self._results.get(key)
+    if result is not None:
+      self._results.move_to_end(key)
+      return result
+    result = self._prefetched.pop(key, None)
+    if result is not None:
+      self._store(key, result)
+    return result
+
+  def _store(self, key: Tuple[int, int, int, int], result: Dict) -> None:
+    self._results[key] = result
+    self._results.move_to_end(key)
+    while len(self._results) > self.max_entries:
+      self._results.popitem(last=False)
+
+  def probe(self, file_path: str, ffprobe_cmd: str = 'ffprobe', prefetch: bool = False) -> Dict:
+    """
+    Return parsed probe info for file_path; raises MetadataError on failure.
+    With prefetch, a new result is held until first used instead of entering the LRU.
+    """
+    try:
+      key = self._key(file_path)
+    except OSError as e:
+      raise MetadataError(str(e))
+    with self._lock:
+      result = self._lookup(key)
+    if result is None:
+      try:
+        proc = subprocess.run(build_probe_cmd(ffprobe_cmd, file_path), capture_output=True, text=True, check=True)
+        result = parse_probe_output(json.loads(proc.stdout))
+      except Exception as e:
+        raise MetadataError(str(e))
+      with self._lock:
+        self.probe_count += 1
+        if prefetch:
+          self._prefetched[key] = result
+        else:
+          self._store(key, result)
+    return dict(result)
+
+  def probe_many(self, paths: Iterable[str], ffprobe_cmd: str = 'ffprobe') -> Dict[str, Union[Dict, Exception]]:
+    """Probe several files concurrently. Returns path -> info, or the exception raised."""
+    def probe_one(path):
+      try:
+        return path, self.probe(path, ffprobe_cmd, prefetch=True)
+      except MetadataError as e:
+        return path, e
+    paths = list(paths)
+    if not paths:
+      return {}
+    with ThreadPoolExecutor(max_workers=max(1, self.max_workers), thread_name_prefix='ffprobe') as pool:
+      return dict(pool.map(probe_one, paths))
+
+  def clear(self) -> None:
+    with self._lock:
+      self._results.clear()
+      self._prefetched.clear()
@@ -0,0 +1,199 @@
+"""Concurrent ffmpeg transcode scheduler with a persistent job journal."""
+import json
+import os
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from media.exceptions import FFmpegError
+from media.video import FFmpegWrapper
+
+# Job states recorded in the journal
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+INTERRUPTED = 'interrupted'
+
+
+def parse_progress_block(lines) -> Dict[str, str]:
+  """Parse one block of ffmpeg `-progress` key=value lines into a dict."""
+  block = {}
+  for line in lines:
+    key, sep, value = line.strip().partition('=')
+    if sep:
+      block[key] = value
+  return block
+
+
+def progress_fraction(block: Dict[str, str], duration: float) -> Optional[float]:
+  """Fraction complete (0..1) from a progress block, or None if unknown."""
+  if block.get('progress') == 'end':
+    return 1.0
+  # out_time_ms is (despite its name) in microseconds, like out_time_us
+  raw = block.get('out_time_us') or block.get('out_time_ms')
+  if not raw or not duration or duration <= 0:
+    return None
+  try:
+    return max(0.0, min(1.0, int(raw) / 1_000_000 / duration))
+  except ValueError:
+    return None
+
+
+class TranscodeScheduler:
+  """
+  Runs at most max_jobs ffmpeg encodes at once, each limited to threads_per_job
+  encoder threads, and records every job in a JSON journal on disk.
+
+  transcode() blocks the calling worker until its encode finishes, so callers
+  (the I/O thread pool) provide the concurrency and the scheduler caps it.
+  Jobs are keyed on the source path and size: after a restart a finished
+  encode is found via completed_output() instead of being redone, and jobs
+  that were queued or running when the process died are marked interrupted
+  and their partial output removed.
+  """
+
+  PROGRESS_SAVE_INTERVAL = 5.0
+
+  def __init__(self, journal_path: str, max_jobs: int = 0, threads_per_job: int = 0):
+    cores = os.cpu_count() or 1
+    if threads_per_job <= 0:
+      threads_per_job = max(1, cores // max(1, max_jobs)) if max_jobs > 0 else min(cores, 2)
+    if max_jobs <= 0:
+      max_jobs = max(1, cores // threads_per_job)
+    self.max_jobs = max_jobs
+    self.threads_per_job = threads_per_job
+    self.journal_path = journal_path
+    self._slots = threading.Semaphore(max_jobs)
+    self._lock = threading.Lock()
+    self._jobs: Dict[str, Dict] = {}
+    self._load()
+
+  @staticmethod
+  def job_id(input_path: str) -> str:
+    return f"{os.path.abspath(input_path)}|{os.path.getsize(input_path)}"
+
+  def _load(self) -> None:
+    if os.path.exists(self.journal_path):
+      try:
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+          self._jobs = json.load(f)
+      except (OSError, ValueError):
+        self._jobs = {}
+    for job_id, job in list(self._jobs.items()):
+      if not os.path.exists(job['input']):
+        # Source was imported and removed; the record is no longer useful
+        del self._jobs[job_id]
+      elif job['state'] in (QUEUED, RUNNING):
+        job['state'] = INTERRUPTED
+        temp_path = job.get('temp')
+        if temp_path and os.path.exists(temp_path):
+          os.remove(temp_path)
+    self._save()
+
+  def _save(self) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+    temp = self.journal_path + '.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+      json.dump(self._jobs, f, ensure_ascii=False, indent=1)
+    os.replace(temp, self.journal_path)
+
+  def _update(self, job_id: str, **fields) -> None:
+    with self._lock:
+      self._jobs[job_id].update(fields, updated=time.time())
+      self._save()
+
+  def interrupted_jobs(self) -> list:
+    """Jobs that were in flight when a previous run stopped."""
+    with self._lock:
+      return [dict(job) for job in self._jobs.values() if job['state'] == INTERRUPTED]
+
+  def completed_output(self, input_path: str) -> Optional[str]:
+    """Output of a finished encode of input_path from an earlier run, if it still exists."""
+    try:
+      job_id = self.job_id(input_path)
+    except OSError:
+      return None
+    with self._lock:
+      job = self._jobs.get(job_id)
+    if job and job['state'] == DONE and os.path.exists(job['output']):
+      return job['output']
+    return None
+
+  def transcode(self, input_path: str, output_path: str, target_width: int, target_height: int,
+                codec_params: Dict, duration: float = 0.0,
+                on_progress: Optional[Callable[[float], None]] = None) -> None:
+    """Encode input_path to output_path, waiting for a free slot. Raises FFmpegError on failure."""
+    job_id = self.job_id(input_path)
+    temp_path = FFmpegWrapper.temp_output_path(output_path)
+    with self._lock:
+      self._jobs[job_id] = {
+        'input': os.path.abspath(input_path),
+        'output': os.path.abspath(output_path),
+        'temp': os.path.abspath(temp_path),
+        'codec': codec_params['codec'],
+        'state': QUEUED,
+        'progress': 0.0,
+        'updated': time.time(),
+      }
+      self._save()
+
+    with self._slots:
+      self._update(job_id, state=RUNNING)
+      cmd = FFmpegWrapper.build_resize_cmd(
+        input_path, temp_path, target_width, target_height, codec_params,
+        ['-threads', str(self.threads_per_job), '-progress', 'pipe:1', '-nostats']
+      )
+      try:
+        self._run(job_id, cmd, duration, on_progress)
+        os.replace(temp_path, output_path)
+      except Exception as e:
+        if os.path.exists(temp_path):
+          os.remove(temp_path)
+        self._update(job_id, state=FAILED, error=str(e))
+        if isinstance(e, FFmpegError):
+          raise
+        raise FFmpegError(f"FFmpeg failed for {input_path} -> {output_path}: {e}") from e
+      self._update(job_id, state=DONE, progress=1.0)
+
+  def _run(self, job_id: str, cmd: list, duration: float,
+           on_progress: Optional[Callable[[float], None]]) -> None:
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    # Drain stderr on a side thread so a chatty encoder cannot block on a full pipe
+    stderr_lines = []
+    drain = threading.Thread(target=lambda: stderr_lines.extend(proc.stderr), daemon=True)
+    drain.start()
+    block = []
+    last_saved = time.time()
+    for line in proc.stdout:
+      block.append(line)
+      if not line.startswith('progress='):
+        continue
+      fraction = progress_fraction(parse_progress_block(block), duration)
+      block = []
+      if fraction is None:
+        continue
+      if on_progress is not None:
+        on_progress(fraction)
+      if time.time() - last_saved >= self.PROGRESS_SAVE_INTERVAL:
+        self._update(job_id, progress=round(fraction, 4))
+        last_saved = time.time()
+    returncode = proc.wait()
+    drain.join()
+    if returncode != 0:
+      raise FFmpegError(f"FFmpeg failed for {cmd[3]} -> {cmd[-1]}: {''.join(stderr_lines[-20:])}")
+
+
+def open_transcode_scheduler(config, log_file: str) -> Optional[TranscodeScheduler]:
+  """Create the scheduler configured under `video.transcode`, or None if disabled."""
+  if not config.get('video.transcode.enabled', False):
+    return None
+  journal_path = config.get('video.transcode.journal')
+  if not journal_path:
+    journal_path = os.path.join(os.path.dirname(log_file), 'media_tool_transcode.json')
+  return TranscodeScheduler(
+    journal_path,
+    config.get('video.transcode.max_jobs', 0),
+    config.get('video.transcode.threads_per_job', 0)
+  )
@@ -1,61 +1,54 @@
 
 import subprocess
 import os
-import json
 import shutil
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional, Union
+
+from media.probe import ProbeService, display_size
+from utils.timing import stage
 
 class Video:
-  def __init__(self, file_path: str, fallback_time: Optional[str] = None):
+  # Optional MetadataCache shared by all videos (configured by main)
+  metadata_cache = None
+
+  def __init__(self, file_path: str, fallback_time: Union[str, Callable[[], Optional[str]], None] = None,
+               metadata: Optional[Dict] = None):
     self.file_path = file_path
-    self.metadata = self._extract_metadata()
+    # Metadata already extracted elsewhere (e.g. by a planning run) is used as-is
+    self.metadata = metadata if metadata is not None else self._extract_metadata()
     self._official_time = self._calc_official_time(fallback_time)
 
+  @stage('metadata')
   def _extract_metadata(self) -> Dict:
     """
     Extract video metadata using ffprobe. Returns dict with keys:
-    creation_time, codec, width, height, duration, bitrate, color_primaries, color_trc, colorspace
+    creation_time, codec, width, height, rotation, duration, bitrate, color_primaries, color_trc, colorspace
     """
     from media.exceptions import MetadataError
+    if self.metadata_cache is not None:
+      cached = self.metadata_cache.lookup(self.file_path, 'video')
+      # Entries stored before rotation was probed are taken as stale
+      if cached is not None and 'rotation' in cached:
+        return cached
     try:
-      cmd = [
-        FFmpegWrapper.ffprobe_cmd,
-        '-v', 'error',
-        '-select_streams', 'v:0',
-        '-show_entries', 'stream=width,height,codec_name,bit_rate,color_primaries,color_trc,colorspace',
-        '-show_entries', 'format=duration',
-        '-show_entries', 'format_tags=creation_time',
-        '-of', 'json',
-        self.file_path
-      ]
-      result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-      info = json.loads(result.stdout)
-      stream = info['streams'][0] if info.get('streams') else {}
-      format_info = info.get('format', {})
-      tags = format_info.get('tags', {})
-      creation_time = tags.get('creation_time', '')
-      return {
-        'creation_time': creation_time,
-        'codec': stream.get('codec_name', 'unknown'),
-        'width': stream.get('width', 0),
-        'height': stream.get('height', 0),
-        'duration': float(format_info.get('duration', 0)),
-        'bitrate': int(stream.get('bit_rate', 0)) if stream.get('bit_rate') else 0,
-        'color_primaries': stream.get('color_primaries', ''),
-        'color_trc': stream.get('color_trc', ''),
-        'colorspace': stream.get('colorspace', '')
-      }
+      meta = FFmpegWrapper.probe(self.file_path)
     except Exception as e:
       raise MetadataError(f"Failed to get video metadata for {self.file_path}: {e}")
+    if self.metadata_cache is not None:
+      self.metadata_cache.store(self.file_path, 'video', meta)
+    return meta
 
-  def _calc_official_time(self, fallback_time: Optional[str]) -> str:
+  def _calc_official_time(self, fallback_time: Union[str, Callable[[], Optional[str]], None]) -> str:
     """
     Decide the official time for this video (for filename, etc):
     1. Use creation_time from metadata if present
-    2. Else use fallback_time (e.g., from filename or file creation)
+    2. Else use fallback_time (e.g., from filename or file creation); it may be
+       a callable, which is then only called when the metadata has no time
     """
     if self.metadata.get('creation_time'):
       return self.metadata['creation_time']
+    if callable(fallback_time):
+      fallback_time = fallback_time()
     if fallback_time:
       return fallback_time
     return ''
@@ -72,6 +65,11 @@ class Video:
   def height(self):
     return self.metadata['height']
 
+  @property
+  def display_size(self):
+    """(width, height) as played back, with the display rotation applied."""
+    return display_size(self.metadata)
+
   @property
   def codec(self):
     return self.metadata['codec']
@@ -114,6 +112,7 @@ class FFmpegWrapper:
   """
   ffmpeg_cmd = 'ffmpeg'
   ffprobe_cmd = 'ffprobe'
+  probe_service = ProbeService()
 
   @classmethod
   def configure(cls, ffmpeg_path: str = None, ffprobe_path: str = None) -> None:
@@ -121,34 +120,27 @@ class FFmpegWrapper:
       cls.ffmpeg_cmd = ffmpeg_path
     if ffprobe_path:
       cls.ffprobe_cmd = ffprobe_path
+
+  @classmethod
+  def configure_probe(cls, max_workers: int) -> None:
+    cls.probe_service.max_workers = max_workers
+
+  @classmethod
+  def probe(cls, file_path: str) -> Dict:
+    """Probe a file through the shared ProbeService (cached per unchanged file)."""
+    return cls.probe_service.probe(file_path, cls.ffprobe_cmd)
+
+  @classmethod
+  def probe_many(cls, file_paths) -> Dict:
+    """Probe several files concurrently, warming the cache for later Video/probe calls."""
+    return cls.probe_service.probe_many(file_paths, cls.ffprobe_cmd)
+
   @classmethod
   def get_video_info(cls, file_path: str) -> Dict:
     """Return video info: width, height, duration, bitrate, codec, color info."""
     from media.exceptions import MetadataError
     try:
-      cmd = [
-        cls.ffprobe_cmd,
-        '-v', 'error',
-        '-select_streams', 'v:0',
-        '-show_entries', 'stream=width,height,codec_name,bit_rate,color_primaries,color_trc,colorspace',
-        '-show_entries', 'format=duration',
-        '-of', 'json',
-        file_path
-      ]
-      result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-      info = json.loads(result.stdout)
-      stream = info['streams'][0] if info.get('streams') else {}
-      format_info = info.get('format', {})
-      return {
-        'width': stream.get('width', 0),
-        'height': stream.get('height', 0),
-        'duration': float(format_info.get('duration', 0)),
-        'bitrate': int(stream.get('bit_rate', 0)) if stream.get('bit_rate') else 0,
-        'codec': stream.get('codec_name', 'unknown'),
-        'color_primaries': stream.get('color_primaries', ''),
-        'color_trc': stream.get('color_trc', ''),
-        'colorspace': stream.get('colorspace', '')
-      }
+      return cls.probe(file_path)
     except Exception as e:
       raise MetadataError(f"Failed to get video info for {file_path}: {e}")
 
@@ -170,27 +162,45 @@ class FFmpegWrapper:
       return {'codec': 'flv', 'extra_args': []}
     return {'codec': 'copy', 'extra_args': []}
 
+  @staticmethod
+  def temp_output_path(output_path: str) -> str:
+    """Temp path next to output that keeps the extension, so ffmpeg can infer the container."""
+    base, ext = os.path.splitext(output_path)
+    return f"{base}.tmp{ext}"
+
   @classmethod
-  def resize_video(cls, input_path: str, output_path: str, target_width: int, target_height: int, max_bitrate: str, codec_params: Dict):
-    """
-    Use FFmpeg to resize/re-encode video with error handling.
-    Writes to temp file, validates, then moves atomically.
-    """
-    from media.exceptions import FFmpegError
+  def build_resize_cmd(cls, input_path: str, output_path: str, target_width: int, target_height: int,
+                       codec_params: Dict, extra_output_args=None) -> list:
+    """Build the ffmpeg command line used to resize/re-encode input_path into output_path."""
     codec = codec_params['codec']
     extra_args = codec_params.get('extra_args', [])
-    temp_path = output_path + '.tmp'
     cmd = [cls.ffmpeg_cmd, '-y', '-i', input_path]
     if codec == 'copy':
       cmd.extend(['-c:v', 'copy', '-c:a', 'copy'])
     else:
       cmd.extend([
-        '-vf', f'scale={target_width}:{target_height}',
+        # Fit inside the target box keeping the aspect ratio; ffmpeg has already
+        # applied the display rotation, so portrait clips come out portrait
+        '-vf', f'scale={target_width}:{target_height}:force_original_aspect_ratio=decrease:force_divisible_by=2',
         '-c:v', codec,
         '-c:a', 'copy'
       ])
       cmd.extend(extra_args)
-    cmd.append(temp_path)
+    if extra_output_args:
+      cmd.extend(extra_output_args)
+    cmd.append(output_path)
+    return cmd
+
+  @classmethod
+  @stage('encode')
+  def resize_video(cls, input_path: str, output_path: str, target_width: int, target_height: int, max_bitrate: str, codec_params: Dict):
+    """
+    Use FFmpeg to resize/re-encode video with error handling.
+    Writes to temp file, validates, then moves atomically.
+    """
+    from media.exceptions import FFmpegError
+    temp_path = cls.temp_output_path(output_path)
+    cmd = cls.build_resize_cmd(input_path, temp_path, target_width, target_height, codec_params)
     try:
       result = subprocess.run(cmd, capture_output=True, text=True, check=True)
       shutil.move(temp_path, output_path)
@@ -201,20 +211,32 @@ class FFmpegWrapper:
       raise FFmpegError(error_msg) from e
 
   @staticmethod
+  @stage('validate')
   def validate_video_output(src_path: str, out_path: str, target_width: int = None, target_height: int = None, 
-               duration_tol_sec: float = 1.0, bitrate_tol_ratio: float = 1.2):
+               duration_tol_sec: float = 1.0, bitrate_tol_ratio: float = 1.2, src_info: Dict = None):
     """
     Validate output video resolution, duration, and bitrate.
+    Pass src_info (e.g. Video.metadata) to reuse the source probe instead of running ffprobe again.
     Raises ValidationError if validation fails.
     """
     from media.exceptions import ValidationError
-    src_info = FFmpegWrapper.get_video_info(src_path)
+    if src_info is None:
+      src_info = FFmpegWrapper.get_video_info(src_path)
     out_info = FFmpegWrapper.get_video_info(out_path)
     if target_width and target_height:
-      if out_info['width'] != target_width or out_info['height'] != target_height:
+      out_width, out_height = display_size(out_info)
+      if out_width > target_width or out_height > target_height:
+        raise ValidationError(
+          f"Output video resolution {out_width}x{out_height} "
+          f"does not fit target {target_width}x{target_height}"
+        )
+      src_width, src_height = display_size(src_info)
+      # Rounding to even dimensions moves the aspect ratio by at most a pixel
+      if src_width and src_height and out_height and \
+          abs(out_width / out_height - src_width / src_height) > 2 / out_height * (src_width / src_height + 1):
         raise ValidationError(
-          f"Output video resolution {out_info['width']}x{out_info['height']} "
-          f"does not match target {target_width}x{target_height}"
+          f"Output video resolution {out_width}x{out_height} "
+          f"does not keep the source aspect ratio of {src_width}x{src_height}"
         )
     if abs(src_info['duration'] - out_info['duration']) > duration_tol_sec:
       raise ValidationError(
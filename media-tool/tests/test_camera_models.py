@@ -0,0 +1,42 @@
+"""Tests for the compiled camera model mapping."""
+import unittest
+from media.camera_models import CameraModelMapper
+from media.exceptions import ConfigError
+
+class TestCameraModelMapper(unittest.TestCase):
+  def setUp(self):
+    self.mapper = CameraModelMapper(
+      {'Canon EOS 5D': '5D', 'iPhone 6 Plus': 'iP6+', 'canon eos 5d': 'other'},
+      {r'iPhone (\d+) Pro Max': r'iP\1Max', r'iPhone (\d+)(\w?)': r'iP\1\2', r'Canon EOS (.+)': r'EOS-\1'}
+    )
+
+  def test_exact_then_casefolded(self):
+    self.assertEqual(self.mapper.map('Canon EOS 5D'), '5D')
+    self.assertEqual(self.mapper.map('CANON EOS 5D'), '5D')
+    self.assertEqual(self.mapper.map('canon eos 5d'), 'other')
+
+  def test_mapping_beats_rules(self):
+    self.assertEqual(self.mapper.map('iPhone 6 Plus'), 'iP6+')
+
+  def test_rules_in_order(self):
+    self.assertEqual(self.mapper.map('iPhone 15 Pro Max'), 'iP15Max')
+    self.assertEqual(self.mapper.map('iphone 4S'), 'iP4S')
+    self.assertEqual(self.mapper.map('Canon EOS R5'), 'EOS-R5')
+
+  def test_unmapped_and_empty(self):
+    self.assertEqual(self.mapper.map('Nikon D850/D810'), 'NikonD850_D810')
+    self.assertEqual(self.mapper.map(''), 'Unknown')
+    self.assertEqual(self.mapper.map('  '), 'Unknown')
+    self.assertEqual(self.mapper.map(None), 'Unknown')
+
+  def test_results_are_memoized(self):
+    self.mapper.map('iPhone 15 Pro Max')
+    self.mapper._rules = []
+    self.assertEqual(self.mapper.map('iPhone 15 Pro Max'), 'iP15Max')
+
+  def test_invalid_rule(self):
+    with self.assertRaises(ConfigError):
+      CameraModelMapper({}, {'iPhone (': 'x'})
+
+if __name__ == '__main__':
+  unittest.main()
@@ -2,7 +2,7 @@
 import unittest
 import tempfile
 import os
-from config_loader import ConfigLoader
+from config_loader import ConfigLoader, ConfigReloader
 from media.exceptions import ConfigError
 
 VALID_BASE = """
@@ -116,8 +116,99 @@ video:
         f.write('\nvideo:\n  target_width: 1280\n  target_height: 720\n  max_bitrate: "4M"\n  extensions: [".mp4"]')
       cfg.reload()
       self.assertEqual(cfg.get('video.target_width'), 1280)
+      self.assertEqual(cfg.video.target_width, 1280)
     finally:
       os.remove(path)
 
+  def test_frozen_view_and_typed_sections(self):
+    path = self._write_temp_config(VALID_BASE)
+    try:
+      cfg = ConfigLoader(path)
+      self.assertEqual(cfg.get('photo')['max_width'], 3840)
+      self.assertEqual(cfg.get('photo.missing', 'dflt'), 'dflt')
+      self.assertIsNone(cfg.get('no.such.key'))
+      with self.assertRaises(TypeError):
+        cfg._flat['photo.max_width'] = 1
+      self.assertEqual(cfg.photo.max_width, 3840)
+      self.assertEqual(cfg.photo.quality, 95)
+      self.assertEqual(cfg.photo.extensions, ('.jpg', '.png'))
+      self.assertEqual(cfg.video.bitrate_tolerance_ratio, 1.2)
+      with self.assertRaises(AttributeError):
+        cfg.photo.max_width = 1
+    finally:
+      os.remove(path)
+
+  def test_reload_keeps_config_on_error(self):
+    path = self._write_temp_config(VALID_BASE)
+    try:
+      cfg = ConfigLoader(path)
+      with open(path, 'w', encoding='utf-8') as f:
+        f.write(VALID_BASE.replace('max_width: 3840', 'max_width: "wide"'))
+      with self.assertRaises(ConfigError):
+        cfg.reload()
+      self.assertEqual(cfg.photo.max_width, 3840)
+      self.assertEqual(cfg.generation, 1)
+    finally:
+      os.remove(path)
+
+  def test_needs_restart(self):
+    self.assertTrue(ConfigLoader.needs_restart('workers.io_threads'))
+    self.assertTrue(ConfigLoader.needs_restart('photo.heic.processes'))
+    self.assertFalse(ConfigLoader.needs_restart('photo.max_width'))
+    self.assertFalse(ConfigLoader.needs_restart('photo.heic_extra'))
+    for key in ('staging_folder', 'photo.extensions', 'video.extensions', 'video.probe_workers',
+                'video.transcode.max_jobs'):
+      self.assertTrue(ConfigLoader.needs_restart(key), key)
+
+class TestConfigReloader(unittest.TestCase):
+  def setUp(self):
+    f = tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False)
+    f.write(VALID_BASE)
+    f.close()
+    self.path = f.name
+    self.reloaded = []
+    self.errors = []
+    self.reloader = ConfigReloader(
+      ConfigLoader(self.path), check_interval=5,
+      on_reload=lambda cfg, changed: self.reloaded.append((cfg.generation, changed)),
+      on_error=self.errors.append
+    )
+
+  def tearDown(self):
+    os.remove(self.path)
+
+  def _rewrite(self, content):
+    with open(self.path, 'w', encoding='utf-8') as f:
+      f.write(content)
+    st = os.stat(self.path)
+    os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+  def test_swaps_in_new_config_when_file_changes(self):
+    first = self.reloader.current
+    self.assertIs(self.reloader.poll(now=0), first)
+    self._rewrite(VALID_BASE.replace('max_width: 3840', 'max_width: 2048'))
+    self.assertIs(self.reloader.poll(), first)  # not due yet
+    fresh = self.reloader.poll(now=float('inf'))
+    self.assertIsNot(fresh, first)
+    self.assertEqual(fresh.photo.max_width, 2048)
+    self.assertEqual(first.photo.max_width, 3840)
+    self.assertEqual(self.reloaded, [(2, ['photo.max_width'])])
+
+  def test_startup_only_change_is_flagged(self):
+    self._rewrite(VALID_BASE.replace('extensions: [".jpg", ".png"]', 'extensions: [".jpg", ".png", ".heic"]'))
+    self.reloader.poll(now=float('inf'))
+    self.assertEqual(self.reloaded, [(2, ['photo.extensions'])])
+    self.assertTrue(ConfigLoader.needs_restart('photo.extensions'))
+
+  def test_invalid_config_is_reported_and_ignored(self):
+    first = self.reloader.current
+    self._rewrite(VALID_BASE.replace('max_width: 3840', 'max_width: [oops'))
+    self.assertIs(self.reloader.poll(now=float('inf')), first)
+    self.assertEqual(len(self.errors), 1)
+    self.assertIsInstance(self.errors[0], ConfigError)
+    # Reported once, not on every poll
+    self.assertIs(self.reloader.poll(now=float('inf')), first)
+    self.assertEqual(len(self.errors), 1)
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,44 @@
+"""Tests for filename date parsing."""
+import unittest
+from datetime import datetime
+from utils.date_utils import parse_date_from_filename
+
+class TestParseDateFromFilename(unittest.TestCase):
+  def test_known_schemes(self):
+    cases = {
+      '20240101_120000.jpg': datetime(2024, 1, 1, 12, 0, 0),
+      'IMG_20230708_091011.jpg': datetime(2023, 7, 8, 9, 10, 11),
+      'VID_20230708_091011.mp4': datetime(2023, 7, 8, 9, 10, 11),
+      'PXL_20231125_183045123.jpg': datetime(2023, 11, 25, 18, 30, 45),
+      'Screenshot_20240601-120005.png': datetime(2024, 6, 1, 12, 0, 5),
+      '2024-01-02_03-04-05.mp4': datetime(2024, 1, 2, 3, 4, 5),
+      '2024-01-02 03-04-05.mov': datetime(2024, 1, 2, 3, 4, 5),
+      'WhatsApp Image 2024-01-02 at 03.04.05.jpeg': datetime(2024, 1, 2, 3, 4, 5),
+      'IMG-20240102-WA0007.jpg': datetime(2024, 1, 2),
+      'VID-20240102-WA0007.mp4': datetime(2024, 1, 2),
+      'clip_1700000000.mp4': datetime.fromtimestamp(1700000000),
+    }
+    for name, expected in cases.items():
+      with self.subTest(name=name):
+        self.assertEqual(parse_date_from_filename(name), expected)
+
+  def test_no_date(self):
+    for name in ('IMG_1234.jpg', 'DSC00042.JPG', 'holiday.png', ''):
+      with self.subTest(name=name):
+        self.assertIsNone(parse_date_from_filename(name))
+
+  def test_invalid_date_is_ignored(self):
+    self.assertIsNone(parse_date_from_filename('20241301_120000.jpg'))
+    self.assertEqual(
+      parse_date_from_filename('20241301_120000_2024-01-02_03-04-05.jpg'),
+      datetime(2024, 1, 2, 3, 4, 5)
+    )
+
+  def test_higher_priority_scheme_wins(self):
+    self.assertEqual(
+      parse_date_from_filename('1700000000_20240101_120000.jpg'),
+      datetime(2024, 1, 1, 12, 0, 0)
+    )
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,71 @@
+"""Tests for the header-only EXIF reader."""
+import os
+import tempfile
+import unittest
+import piexif
+from PIL import Image
+import pillow_heif
+from media.exif_reader import read_photo_header
+
+pillow_heif.register_heif_opener()
+
+EXIF = piexif.dump({
+  '0th': {piexif.ImageIFD.Make: b'Apple', piexif.ImageIFD.Model: b'iPhone 13 Pro Max'},
+  'Exif': {piexif.ExifIFD.DateTimeOriginal: b'2023:07:08 09:10:11'},
+})
+
+class TestExifReader(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.TemporaryDirectory()
+
+  def tearDown(self):
+    self.tmpdir.cleanup()
+
+  def _path(self, name):
+    return os.path.join(self.tmpdir.name, name)
+
+  def test_jpeg_with_exif(self):
+    path = self._path('a.jpg')
+    Image.new('RGB', (320, 240)).save(path, exif=EXIF)
+    meta = read_photo_header(path)
+    self.assertEqual(meta['camera_model'], 'iPhone 13 Pro Max')
+    self.assertEqual(meta['taken_time'], '2023:07:08 09:10:11')
+    self.assertEqual((meta['width'], meta['height'], meta['format']), (320, 240, 'JPEG'))
+
+  def test_jpeg_little_endian_exif(self):
+    path = self._path('le.jpg')
+    exif = Image.Exif()
+    exif[0x0110] = 'Pixel 5'
+    exif.get_ifd(0x8769)[0x9003] = '2021:01:02 03:04:05'
+    Image.new('RGB', (64, 32)).save(path, exif=exif.tobytes())
+    meta = read_photo_header(path)
+    self.assertEqual(meta['camera_model'], 'Pixel 5')
+    self.assertEqual(meta['taken_time'], '2021:01:02 03:04:05')
+
+  def test_jpeg_without_exif(self):
+    path = self._path('plain.jpg')
+    Image.new('RGB', (10, 20)).save(path, progressive=True)
+    meta = read_photo_header(path)
+    self.assertEqual(meta['camera_model'], 'Unknown')
+    self.assertEqual(meta['taken_time'], '')
+    self.assertEqual((meta['width'], meta['height']), (10, 20))
+
+  def test_heic_with_exif(self):
+    path = self._path('a.heic')
+    Image.new('RGB', (300, 200)).save(path, exif=EXIF)
+    meta = read_photo_header(path)
+    self.assertEqual(meta['camera_model'], 'iPhone 13 Pro Max')
+    self.assertEqual(meta['taken_time'], '2023:07:08 09:10:11')
+    self.assertEqual((meta['width'], meta['height'], meta['format']), (300, 200, 'HEIF'))
+
+  def test_unsupported_or_corrupt_returns_none(self):
+    png = self._path('a.png')
+    Image.new('RGB', (8, 8)).save(png)
+    self.assertIsNone(read_photo_header(png))
+    bad = self._path('bad.jpg')
+    with open(bad, 'wb') as f:
+      f.write(b'\xff\xd8\xff\xe1\x00')
+    self.assertIsNone(read_photo_header(bad))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -2,7 +2,10 @@
 import unittest
 import os
 import tempfile
-from utils.file_ops import handle_duplicates, scan_folder_recursive
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from utils.file_ops import ensure_dir, handle_duplicates, iter_folder, release_path, scan_folder_recursive, stamp_fd
+from utils.scan_journal import ScanJournal
 
 class TestFileOps(unittest.TestCase):
   def test_handle_duplicates_counter(self):
@@ -29,5 +32,77 @@ class TestFileOps(unittest.TestCase):
       new_path = handle_duplicates(test_file, 'skip')
       self.assertIsNone(new_path)
 
+  def test_ensure_dir_creates_each_directory_once(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      target = os.path.join(tmpdir, 'Photos', '2024', '2024.06')
+      with mock.patch('os.makedirs', wraps=os.makedirs) as makedirs:
+        for _ in range(3):
+          ensure_dir(target)
+      self.assertTrue(os.path.isdir(target))
+      # makedirs recurses into itself for the missing parents
+      self.assertEqual([c for c in makedirs.call_args_list if c.args[0] == target],
+                       [mock.call(target, exist_ok=True)])
+
+  def test_stamp_fd(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'a.jpg')
+      with open(path, 'wb') as f:
+        f.write(b'data')
+        f.flush()
+        self.assertTrue(stamp_fd(f.fileno(), 1_600_000_000.0))
+      self.assertEqual(os.stat(path).st_mtime, 1_600_000_000.0)
+      with mock.patch('os.utime', side_effect=PermissionError('not permitted')):
+        self.assertFalse(stamp_fd(0, 1_600_000_000.0))
+
+  def test_handle_duplicates_concurrent_claims(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      target = os.path.join(tmpdir, 'burst.jpg')
+      with ThreadPoolExecutor(max_workers=8) as pool:
+        paths = list(pool.map(lambda _: handle_duplicates(target, 'counter'), range(20)))
+      
+      # Every caller gets a distinct name, with no gaps in the counters
+      self.assertEqual(len(set(paths)), 20)
+      self.assertIn(target, paths)
+      self.assertIn(os.path.join(tmpdir, 'burst_19.jpg'), paths)
+      
+      # Releasing without writing the file frees the name again
+      for path in paths:
+        release_path(path)
+      self.assertEqual(handle_duplicates(target, 'counter'), target)
+      release_path(target)
+
+  def test_iter_folder_incremental_journal(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      src = os.path.join(tmpdir, 'src')
+      os.makedirs(os.path.join(src, 'a', 'deep'))
+      os.makedirs(os.path.join(src, 'b'))
+      for rel in ('1.jpg', 'a/2.JPG', 'a/deep/3.mp4', 'b/4.jpg', 'b/skip.txt'):
+        with open(os.path.join(src, rel), 'w') as f:
+          f.write('x')
+      # Age the directories so their listings are trusted by the journal
+      for root, dirs, _ in os.walk(src):
+        for d in [root] + [os.path.join(root, d) for d in dirs]:
+          os.utime(d, (1_600_000_000, 1_600_000_000))
+      journal_path = os.path.join(tmpdir, 'journal.json')
+      exts = ['.jpg', '.mp4']
+
+      first = ScanJournal(journal_path, exts)
+      found = sorted(iter_folder(src, exts, first))
+      self.assertEqual(found, sorted(scan_folder_recursive(src, exts)))
+      self.assertEqual(len(found), 4)
+      self.assertEqual((first.listed, first.reused), (4, 0))
+
+      # Unchanged tree: nothing is listed again, same files come back
+      second = ScanJournal(journal_path, exts)
+      self.assertEqual(sorted(iter_folder(src, exts, second)), found)
+      self.assertEqual((second.listed, second.reused), (0, 4))
+
+      # A new file only causes its own directory to be re-listed
+      with open(os.path.join(src, 'a', 'deep', '5.jpg'), 'w') as f:
+        f.write('x')
+      third = ScanJournal(journal_path, exts)
+      self.assertEqual(len(list(iter_folder(src, exts, third))), 5)
+      self.assertEqual((third.listed, third.reused), (1, 3))
+
 if __name__ == '__main__':
   unittest.main()
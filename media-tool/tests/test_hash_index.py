@@ -0,0 +1,119 @@
+"""Tests for the content-hash dedup index."""
+import unittest
+import os
+import tempfile
+import threading
+from unittest import mock
+from utils.hash_index import CHUNK_SIZE, HashIndex, partial_hash
+
+def _write(path, data):
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path, 'wb') as f:
+    f.write(data)
+
+class TestHashIndex(unittest.TestCase):
+  def setUp(self):
+    self._tmp = tempfile.TemporaryDirectory()
+    self.tmpdir = self._tmp.name
+    self.library = os.path.join(self.tmpdir, 'Staging', 'Photos')
+    self.index = HashIndex(os.path.join(self.tmpdir, 'hashes.sqlite'))
+
+  def tearDown(self):
+    self.index.close()
+    self._tmp.cleanup()
+
+  def test_refresh_finds_copy_under_other_name(self):
+    data = os.urandom(3 * CHUNK_SIZE)
+    _write(os.path.join(self.library, '2024', 'a.jpg'), data)
+    self.assertEqual(self.index.refresh([self.library]), (1, 0))
+    source = os.path.join(self.tmpdir, 'src', 'IMG_0001.jpg')
+    _write(source, data)
+    claim = self.index.claim(source)
+    self.index.release(claim)
+    self.assertEqual(claim.duplicate, os.path.join(self.library, '2024', 'a.jpg'))
+
+  def test_same_ends_different_middle_is_not_duplicate(self):
+    head, tail = os.urandom(CHUNK_SIZE), os.urandom(CHUNK_SIZE)
+    _write(os.path.join(self.library, 'a.jpg'), head + b'A' * CHUNK_SIZE + tail)
+    self.index.refresh([self.library])
+    source = os.path.join(self.tmpdir, 'src', 'b.jpg')
+    _write(source, head + b'B' * CHUNK_SIZE + tail)
+    self.assertEqual(
+      partial_hash(source, os.path.getsize(source)),
+      partial_hash(os.path.join(self.library, 'a.jpg'), os.path.getsize(source))
+    )
+    claim = self.index.claim(source)
+    self.index.release(claim)
+    self.assertIsNone(claim.duplicate)
+
+  def test_record_matches_source_of_resized_output(self):
+    source = os.path.join(self.tmpdir, 'src', 'big.jpg')
+    _write(source, os.urandom(4 * CHUNK_SIZE))
+    claim = self.index.claim(source)
+    self.assertIsNone(claim.duplicate)
+    output = os.path.join(self.library, 'small.jpg')
+    _write(output, os.urandom(1000))
+    self.index.record(claim, output)
+    self.index.release(claim)
+    with open(source, 'rb') as f:
+      data = f.read()
+    os.remove(source)
+    again = os.path.join(self.tmpdir, 'src', 'renamed.jpg')
+    _write(again, data)
+    claim = self.index.claim(again)
+    self.index.release(claim)
+    self.assertEqual(claim.duplicate, output)
+
+  def test_record_of_moved_source_does_not_hash_it_in_full(self):
+    data = os.urandom(4 * CHUNK_SIZE)
+    source = os.path.join(self.tmpdir, 'src', 'clip.mp4')
+    _write(source, data)
+    claim = self.index.claim(source)
+    moved = os.path.join(self.library, 'clip.mp4')
+    os.makedirs(self.library, exist_ok=True)
+    os.replace(source, moved)
+    claim.path = moved
+    with mock.patch('utils.hash_index.full_hash', side_effect=AssertionError('full hash taken')):
+      self.index.record(claim, moved, same_content=True)
+    self.index.release(claim)
+    again = os.path.join(self.tmpdir, 'src', 'copy.mp4')
+    _write(again, data)
+    claim = self.index.claim(again)
+    self.index.release(claim)
+    self.assertEqual(claim.duplicate, moved)
+
+  def test_refresh_drops_deleted_files(self):
+    _write(os.path.join(self.library, 'a.jpg'), b'abc')
+    self.index.refresh([self.library])
+    os.remove(os.path.join(self.library, 'a.jpg'))
+    self.assertEqual(self.index.refresh([self.library]), (0, 1))
+    self.assertEqual(len(self.index), 0)
+
+  def test_refresh_skips_unchanged_files(self):
+    _write(os.path.join(self.library, 'a.jpg'), b'abc')
+    self.index.refresh([self.library])
+    self.assertEqual(self.index.refresh([self.library]), (0, 0))
+
+  def test_concurrent_claims_of_same_content(self):
+    data = os.urandom(1000)
+    first = os.path.join(self.tmpdir, 'src', 'one.jpg')
+    second = os.path.join(self.tmpdir, 'src', 'two.jpg')
+    _write(first, data)
+    _write(second, data)
+    claim = self.index.claim(first)
+    result = {}
+    waiter = threading.Thread(target=lambda: result.update(claim=self.index.claim(second)))
+    waiter.start()
+    waiter.join(0.2)
+    # The second claim waits until the first import finishes
+    self.assertTrue(waiter.is_alive())
+    output = os.path.join(self.library, 'one.jpg')
+    _write(output, data)
+    self.index.record(claim, output)
+    self.index.release(claim)
+    waiter.join(5)
+    self.index.release(result['claim'])
+    self.assertEqual(result['claim'].duplicate, output)
+
+if __name__ == '__main__':
+  unittest.main()
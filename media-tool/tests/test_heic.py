@@ -0,0 +1,108 @@
+"""Tests for HEIC to JPEG conversion."""
+import os
+import tempfile
+import logging
+import unittest
+from unittest import mock
+import piexif
+from PIL import Image
+import main
+from config_loader import ConfigLoader
+from media.heic import HeicConverter, HeicTimeout, convert_heic_file
+
+def _write_heic(path, size):
+  exif = piexif.dump({
+    '0th': {piexif.ImageIFD.Model: b'iPhone 15 Pro'},
+    'Exif': {piexif.ExifIFD.DateTimeOriginal: b'2024:06:01 12:00:00'},
+  })
+  Image.new('RGB', size, (120, 80, 40)).save(path, 'HEIF', quality=80, exif=exif)
+
+class TestHeicConversion(unittest.TestCase):
+  def setUp(self):
+    self._tmp = tempfile.TemporaryDirectory()
+    self.src = os.path.join(self._tmp.name, 'a.heic')
+    self.out = os.path.join(self._tmp.name, 'a.jpg')
+    _write_heic(self.src, (1600, 1200))
+
+  def tearDown(self):
+    self._tmp.cleanup()
+
+  def _assert_jpeg(self, size):
+    with Image.open(self.out) as img:
+      self.assertEqual(img.format, 'JPEG')
+      self.assertEqual(img.size, size)
+      exif = piexif.load(img.info['exif'])
+    self.assertEqual(exif['0th'][piexif.ImageIFD.Model], b'iPhone 15 Pro')
+    self.assertEqual(exif['Exif'][piexif.ExifIFD.DateTimeOriginal], b'2024:06:01 12:00:00')
+
+  def test_converts_and_downsizes_with_exif(self):
+    stats = convert_heic_file(self.src, self.out, 800, 800, 90)
+    self.assertEqual(stats['strategy'], 'heic-jpeg')
+    self._assert_jpeg((800, 600))
+
+  def test_output_is_stamped_before_it_is_moved_into_place(self):
+    stats = convert_heic_file(self.src, self.out, 800, 800, 90, mtime=1_700_000_000.0)
+    self.assertTrue(stats['stamped'])
+    self.assertEqual(os.stat(self.out).st_mtime, 1_700_000_000.0)
+
+  def test_small_photo_is_only_reencoded(self):
+    convert_heic_file(self.src, self.out, 4000, 4000, 90)
+    self._assert_jpeg((1600, 1200))
+
+  def test_past_deadline_leaves_no_output(self):
+    with self.assertRaises(HeicTimeout):
+      convert_heic_file(self.src, self.out, 800, 800, 90, deadline=0)
+    self.assertEqual(os.listdir(self._tmp.name), ['a.heic'])
+
+  def test_converter_runs_in_process_pool(self):
+    converter = HeicConverter(processes=1, time_budget=60, quality=90)
+    try:
+      converter.convert(self.src, self.out, 800, 800)
+    finally:
+      converter.shutdown()
+    self._assert_jpeg((800, 600))
+
+class TestHeicTimeoutFallback(unittest.TestCase):
+  def setUp(self):
+    self._tmp = tempfile.TemporaryDirectory()
+    tmpdir = self._tmp.name
+    self.src = os.path.join(tmpdir, 'src')
+    self.stage = os.path.join(tmpdir, 'stage')
+    os.makedirs(self.src)
+    config_path = os.path.join(tmpdir, 'config.yaml')
+    with open(config_path, 'w') as f:
+      f.write(f"""
+source_folder: {self.src}
+staging_folder: {self.stage}
+log_file: {os.path.join(tmpdir, 'media.log')}
+duplicate_strategy: counter
+photo:
+  max_width: 800
+  max_height: 800
+  extensions: [".heic"]
+video:
+  target_width: 1920
+  target_height: 1080
+  max_bitrate: "8M"
+  extensions: [".mp4"]
+""")
+    self.config = ConfigLoader(config_path)
+    self.logger = logging.getLogger('test_heic_fallback')
+    self.logger.addHandler(logging.NullHandler())
+    self.logger.propagate = False
+
+  def tearDown(self):
+    self._tmp.cleanup()
+
+  def test_timeout_stages_original_without_leftover_placeholder(self):
+    _write_heic(os.path.join(self.src, 'a.heic'), (1600, 1200))
+    converter = mock.Mock()
+    converter.convert.side_effect = HeicTimeout('too slow')
+    result = main.process_photo(os.path.join(self.src, 'a.heic'), self.config, self.logger,
+                                heic_converter=converter)
+    self.assertEqual(result['status'], 'success')
+    month = os.path.join(self.stage, 'Photos', '2024', '2024.06')
+    self.assertEqual(os.listdir(month), ['20240601_120000_iPhone15Pro.heic'])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,177 @@
+"""Tests for import plans and the --plan / --apply runs."""
+import unittest
+import os
+import shutil
+import tempfile
+from unittest import mock
+import piexif
+from PIL import Image
+import main
+from utils.import_plan import IMPORT, SKIP, ERROR, PlanWriter, read_plan, source_unchanged
+
+def _photo(path, taken=b'2021:05:06 07:08:09', color=(200, 100, 50)):
+  exif = piexif.dump({'0th': {piexif.ImageIFD.Model: b'Canon EOS 5D'},
+                      'Exif': {piexif.ExifIFD.DateTimeOriginal: taken}})
+  Image.new('RGB', (64, 48), color).save(path, exif=exif)
+  return path
+
+class TestPlanFile(unittest.TestCase):
+  def setUp(self):
+    self._tmp = tempfile.TemporaryDirectory()
+    self.tmpdir = self._tmp.name
+    self.path = os.path.join(self.tmpdir, 'plans', 'plan.jsonl')
+
+  def tearDown(self):
+    self._tmp.cleanup()
+
+  def test_round_trip(self):
+    writer = PlanWriter(self.path, source_folder='/src')
+    writer.add({'source': '/src/a.jpg', 'action': IMPORT, 'dest': '/stage/a.jpg'})
+    writer.add({'source': '/src/b.txt', 'action': SKIP, 'reason': 'Unknown file type'})
+    writer.add({'source': '/src/c.mp4', 'action': ERROR, 'error': 'probe failed'})
+    self.assertFalse(os.path.exists(self.path))
+    writer.close()
+    self.assertEqual(writer.counts, {IMPORT: 1, SKIP: 1, ERROR: 1})
+    header, entries = read_plan(self.path)
+    self.assertEqual(header['source_folder'], '/src')
+    self.assertEqual([e['action'] for e in entries], [IMPORT, SKIP, ERROR])
+
+  def test_abort_leaves_no_plan(self):
+    writer = PlanWriter(self.path)
+    writer.add({'source': '/src/a.jpg', 'action': IMPORT})
+    writer.abort()
+    self.assertEqual(os.listdir(os.path.dirname(self.path)), [])
+
+  def test_rejects_other_files(self):
+    os.makedirs(os.path.dirname(self.path))
+    with open(self.path, 'w') as f:
+      f.write('{"plan": 99}\n')
+    with self.assertRaises(ValueError):
+      read_plan(self.path)
+    with open(self.path, 'w') as f:
+      f.write('not json\n')
+    with self.assertRaises(ValueError):
+      read_plan(self.path)
+
+  def test_source_unchanged(self):
+    source = os.path.join(self.tmpdir, 'a.jpg')
+    with open(source, 'wb') as f:
+      f.write(b'abc')
+    st = os.stat(source)
+    entry = {'source': source, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    self.assertTrue(source_unchanged(entry))
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    self.assertFalse(source_unchanged(entry))
+    os.remove(source)
+    self.assertFalse(source_unchanged(entry))
+
+class TestPlanAndApply(unittest.TestCase):
+  def setUp(self):
+    self._tmp = tempfile.TemporaryDirectory()
+    self.tmpdir = self._tmp.name
+    self.src = os.path.join(self.tmpdir, 'src')
+    self.stage = os.path.join(self.tmpdir, 'stage')
+    os.makedirs(self.src)
+    self.config = os.path.join(self.tmpdir, 'config.yaml')
+    with open(self.config, 'w') as f:
+      f.write(f"""
+source_folder: {self.src}
+staging_folder: {self.stage}
+log_file: {os.path.join(self.tmpdir, 'log', 'media.log')}
+duplicate_strategy: counter
+photo:
+  max_width: 1000
+  max_height: 1000
+  extensions: [".jpg"]
+video:
+  target_width: 1920
+  target_height: 1080
+  max_bitrate: "8M"
+  extensions: [".mp4"]
+""")
+    self.plan = os.path.join(self.tmpdir, 'plan.jsonl')
+
+  def tearDown(self):
+    self._tmp.cleanup()
+
+  def staged(self):
+    return sorted(os.listdir(os.path.join(self.stage, 'Photos', '2021', '2021.05')))
+
+  def test_plan_changes_nothing_and_apply_imports_as_planned(self):
+    # A burst: both photos want the same staging name
+    _photo(os.path.join(self.src, 'a.jpg'))
+    _photo(os.path.join(self.src, 'b.jpg'), color=(10, 20, 30))
+    self.assertEqual(main.main([self.config, '--plan', self.plan]), 0)
+    self.assertEqual(sorted(os.listdir(self.src)), ['a.jpg', 'b.jpg'])
+    self.assertFalse(os.path.exists(self.stage))
+    _, entries = read_plan(self.plan)
+    dests = sorted(os.path.basename(e['dest']) for e in entries)
+    self.assertEqual(dests, ['20210506_070809_CanonEOS5D.jpg', '20210506_070809_CanonEOS5D_1.jpg'])
+    self.assertTrue(all(e['action'] == IMPORT for e in entries))
+
+    # Planned photos are not analysed again
+    with mock.patch('main.open_photo', side_effect=AssertionError('photo analysed again')):
+      self.assertEqual(main.main([self.config, '--apply', self.plan]), 0)
+    self.assertEqual(self.staged(), dests)
+    self.assertEqual(os.listdir(self.src), [])
+
+  def test_source_changed_since_plan_is_analysed_again(self):
+    path = _photo(os.path.join(self.src, 'a.jpg'))
+    self.assertEqual(main.main([self.config, '--plan', self.plan]), 0)
+    _photo(path, taken=b'2021:05:20 10:00:00')
+    self.assertEqual(main.main([self.config, '--apply', self.plan]), 0)
+    self.assertEqual(self.staged(), ['20210520_100000_CanonEOS5D.jpg'])
+
+  def test_apply_finds_output_staged_under_the_unnumbered_name(self):
+    _photo(os.path.join(self.src, 'a.jpg'))
+    _photo(os.path.join(self.src, 'b.jpg'), color=(10, 20, 30))
+    self.assertEqual(main.main([self.config, '--plan', self.plan]), 0)
+    _, entries = read_plan(self.plan)
+    # Which burst shot got the counter depends on the order the analyses finished
+    numbered, first = sorted(entries, key=lambda e: not e['dest'].endswith('_1.jpg'))
+    # Since planned, the first one was imported elsewhere and the other staged without the counter
+    os.remove(first['source'])
+    unnumbered = first['dest']
+    os.makedirs(os.path.dirname(unnumbered))
+    shutil.copy2(numbered['source'], unnumbered)
+    taken = main.file_time(main.datetime(2021, 5, 6, 7, 8, 9))
+    os.utime(unnumbered, (taken, taken))
+    self.assertEqual(main.main([self.config, '--apply', self.plan]), 0)
+    self.assertEqual(self.staged(), [os.path.basename(unnumbered)])
+    self.assertEqual(os.listdir(self.src), [os.path.basename(numbered['source'])])
+
+  def test_placeholder_left_by_a_killed_run_does_not_block_import(self):
+    with open(self.config) as f:
+      text = f.read()
+    with open(self.config, 'w') as f:
+      f.write(text.replace('duplicate_strategy: counter', 'duplicate_strategy: skip'))
+    _photo(os.path.join(self.src, 'a.jpg'))
+    month = os.path.join(self.stage, 'Photos', '2021', '2021.05')
+    os.makedirs(month)
+    stale = os.path.join(month, '20210506_070809_CanonEOS5D.jpg')
+    open(stale, 'wb').close()
+    self.assertEqual(main.main([self.config, '--plan', self.plan]), 0)
+    _, entries = read_plan(self.plan)
+    self.assertEqual([(e['action'], e['dest']) for e in entries], [(IMPORT, stale)])
+    self.assertEqual(main.main([self.config, '--apply', self.plan]), 0)
+    self.assertEqual(self.staged(), [os.path.basename(stale)])
+    self.assertGreater(os.path.getsize(stale), 0)
+    self.assertEqual(os.listdir(self.src), [])
+
+  def test_apply_refuses_plan_for_another_staging_folder(self):
+    _photo(os.path.join(self.src, 'a.jpg'))
+    self.assertEqual(main.main([self.config, '--plan', self.plan]), 0)
+    with open(self.config) as f:
+      text = f.read()
+    with open(self.config, 'w') as f:
+      f.write(text.replace(f'staging_folder: {self.stage}', f'staging_folder: {self.stage}2'))
+    self.assertEqual(main.main([self.config, '--apply', self.plan]), 1)
+    self.assertEqual(os.listdir(self.src), ['a.jpg'])
+    self.assertFalse(os.path.exists(self.stage))
+
+  def test_plan_excludes_watch(self):
+    with self.assertRaises(SystemExit):
+      main.parse_args([self.config, '--plan', self.plan, '--watch'])
+
+if __name__ == '__main__':
+  unittest.main()
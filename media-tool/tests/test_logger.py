@@ -0,0 +1,75 @@
+"""Tests for the structured and async loggers."""
+import unittest
+import json
+import os
+import tempfile
+from logger import setup_logger, shutdown_logger, log_action, log_context
+
+class TestLogger(unittest.TestCase):
+  def setUp(self):
+    self._tmp = tempfile.TemporaryDirectory()
+    self.log_path = os.path.join(self._tmp.name, 'media.log')
+    self.json_path = os.path.join(self._tmp.name, 'media.jsonl')
+
+  def tearDown(self):
+    self._tmp.cleanup()
+
+  def _lines(self, path):
+    with open(path, encoding='utf-8') as f:
+      return f.read().splitlines()
+
+  def _log_some(self, logger):
+    log_action(logger, {'status': 'success', 'file': 'a.jpg', 'stages_ms': {'copy': 1.5}})
+    log_action(logger, {'status': 'error', 'file': 'b.jpg', 'error': 'boom'})
+    logger.info("plain message")
+
+  def test_sync_logger_writes_json_messages(self):
+    logger = setup_logger(self.log_path)
+    try:
+      self._log_some(logger)
+    finally:
+      shutdown_logger(logger)
+    lines = self._lines(self.log_path)
+    self.assertEqual(len(lines), 3)
+    self.assertIn('INFO {"status": "success", "file": "a.jpg"', lines[0])
+    self.assertIn('ERROR', lines[1])
+
+  def test_async_logger_drains_on_shutdown(self):
+    logger = setup_logger(self.log_path, async_mode=True, json_path=self.json_path,
+                          flush_interval=60, batch_size=1000)
+    try:
+      self._log_some(logger)
+    finally:
+      shutdown_logger(logger)
+    self.assertEqual(len(self._lines(self.log_path)), 3)
+    records = [json.loads(line) for line in self._lines(self.json_path)]
+    self.assertEqual([r['level'] for r in records], ['INFO', 'ERROR', 'INFO'])
+    self.assertEqual(records[0]['stages_ms'], {'copy': 1.5})
+    self.assertEqual(records[1]['error'], 'boom')
+    self.assertEqual(records[2]['message'], 'plain message')
+    self.assertNotIn(' ', self._lines(self.json_path)[0])
+
+  def test_logged_dict_is_snapshotted(self):
+    logger = setup_logger(self.log_path, async_mode=True, json_path=self.json_path)
+    try:
+      info = {'status': 'success', 'file': 'a.jpg'}
+      log_action(logger, info)
+      info['file'] = 'changed.jpg'
+    finally:
+      shutdown_logger(logger)
+    self.assertEqual(json.loads(self._lines(self.json_path)[0])['file'], 'a.jpg')
+
+  def test_log_context_fields_are_added(self):
+    logger = setup_logger(self.log_path, json_path=self.json_path)
+    try:
+      with log_context(config_generation=3):
+        log_action(logger, {'status': 'success', 'file': 'a.jpg'})
+      log_action(logger, {'status': 'success', 'file': 'b.jpg'})
+    finally:
+      shutdown_logger(logger)
+    records = [json.loads(line) for line in self._lines(self.json_path)]
+    self.assertEqual(records[0]['config_generation'], 3)
+    self.assertNotIn('config_generation', records[1])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,62 @@
+"""Tests for the persistent metadata cache."""
+import os
+import tempfile
+import unittest
+from media.metadata_cache import MetadataCache
+
+class TestMetadataCache(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.TemporaryDirectory()
+    self.db_path = os.path.join(self.tmpdir.name, 'cache.sqlite')
+    self.file_path = os.path.join(self.tmpdir.name, 'photo.jpg')
+    with open(self.file_path, 'wb') as f:
+      f.write(b'data')
+
+  def tearDown(self):
+    self.tmpdir.cleanup()
+
+  def test_store_and_lookup(self):
+    cache = MetadataCache(self.db_path)
+    meta = {'camera_model': 'iPhone 13', 'taken_time': '2025:01:02 03:04:05'}
+    cache.store(self.file_path, 'photo', meta)
+    self.assertEqual(cache.lookup(self.file_path, 'photo'), meta)
+    self.assertIsNone(cache.lookup(self.file_path, 'video'))
+    cache.close()
+
+    # Entries persist across instances
+    cache = MetadataCache(self.db_path)
+    self.assertEqual(cache.lookup(self.file_path, 'photo'), meta)
+    cache.close()
+
+  def test_entry_survives_rename(self):
+    cache = MetadataCache(self.db_path)
+    cache.store(self.file_path, 'photo', {'camera_model': 'X'})
+    renamed = os.path.join(self.tmpdir.name, 'renamed.jpg')
+    os.rename(self.file_path, renamed)
+    self.assertEqual(cache.lookup(renamed, 'photo'), {'camera_model': 'X'})
+    cache.close()
+
+  def test_modified_file_invalidates(self):
+    cache = MetadataCache(self.db_path)
+    cache.store(self.file_path, 'photo', {'camera_model': 'X'})
+    with open(self.file_path, 'ab') as f:
+      f.write(b'more')
+    self.assertIsNone(cache.lookup(self.file_path, 'photo'))
+    self.assertEqual(len(cache), 0)
+    cache.close()
+
+  def test_size_cap(self):
+    cache = MetadataCache(self.db_path, max_entries=3)
+    for i in range(6):
+      path = os.path.join(self.tmpdir.name, f'{i}.jpg')
+      with open(path, 'wb') as f:
+        f.write(b'x')
+      cache.store(path, 'photo', {'index': i})
+    cache.close()
+    cache = MetadataCache(self.db_path, max_entries=3)
+    self.assertEqual(len(cache), 3)
+    self.assertEqual(cache.lookup(os.path.join(self.tmpdir.name, '5.jpg'), 'photo'), {'index': 5})
+    cache.close()
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,103 @@
+"""Tests for per-directory name allocation."""
+import unittest
+import os
+import tempfile
+from unittest import mock
+from utils.name_allocator import NameAllocator
+
+def _touch(path, data=b'x'):
+  with open(path, 'wb') as f:
+    f.write(data)
+
+class TestNameAllocator(unittest.TestCase):
+  def test_burst_gets_sequential_counters_without_exists_calls(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      target = os.path.join(tmpdir, 'burst.jpg')
+      allocator = NameAllocator()
+      with mock.patch('os.path.exists', side_effect=AssertionError('exists() called')):
+        paths = [allocator.allocate(target) for _ in range(30)]
+      expected = [target] + [os.path.join(tmpdir, f'burst_{i}.jpg') for i in range(1, 30)]
+      self.assertEqual(paths, expected)
+      # Every name is reserved on disk
+      self.assertEqual(len(os.listdir(tmpdir)), 30)
+
+  def test_skip_strategy(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      target = os.path.join(tmpdir, 'a.jpg')
+      _touch(target)
+      self.assertIsNone(NameAllocator().allocate(target, 'skip'))
+
+  def test_placeholder_left_by_a_killed_run_is_reclaimed(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      target = os.path.join(tmpdir, 'a.jpg')
+      _touch(target, b'')
+      allocator = NameAllocator()
+      self.assertEqual(allocator.allocate(target, 'skip'), target)
+      # Our own reservation is not taken for a stale one
+      self.assertIsNone(allocator.allocate(target, 'skip'))
+      self.assertEqual(allocator.allocate(target), os.path.join(tmpdir, 'a_1.jpg'))
+
+  def test_file_created_elsewhere_is_not_handed_out(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      target = os.path.join(tmpdir, 'a.jpg')
+      allocator = NameAllocator()
+      self.assertEqual(allocator.allocate(target), target)
+      # Created in the same mtime tick, so the cached listing looks current
+      _touch(os.path.join(tmpdir, 'a_1.jpg'))
+      allocator._dirs[tmpdir].mtime_ns = os.stat(tmpdir).st_mtime_ns
+      self.assertEqual(allocator.allocate(target), os.path.join(tmpdir, 'a_2.jpg'))
+
+  def test_dry_run_reserves_in_memory_only(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      _touch(os.path.join(tmpdir, 'a.jpg'))
+      target = os.path.join(tmpdir, 'a.jpg')
+      allocator = NameAllocator(dry_run=True)
+      paths = [allocator.allocate(target) for _ in range(3)]
+      self.assertEqual(paths, [os.path.join(tmpdir, f'a_{i}.jpg') for i in range(1, 4)])
+      self.assertEqual(os.listdir(tmpdir), ['a.jpg'])
+      missing = os.path.join(tmpdir, 'new', 'b.jpg')
+      self.assertEqual(allocator.allocate(missing), missing)
+      self.assertEqual(allocator.allocate(missing), os.path.join(tmpdir, 'new', 'b_1.jpg'))
+      self.assertFalse(os.path.exists(os.path.join(tmpdir, 'new')))
+
+  def test_release_removes_unwritten_placeholder_only(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      target = os.path.join(tmpdir, 'a.jpg')
+      allocator = NameAllocator()
+      first = allocator.allocate(target)
+      second = allocator.allocate(target)
+      _touch(first, b'written')
+      allocator.release(first)
+      allocator.release(second)
+      self.assertTrue(os.path.exists(first))
+      self.assertFalse(os.path.exists(second))
+      # The abandoned counter is handed out again
+      self.assertEqual(allocator.allocate(target), second)
+
+  def test_own_rename_into_place_does_not_force_relist(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      target = os.path.join(tmpdir, 'a.jpg')
+      allocator = NameAllocator()
+      first = allocator.allocate(target)
+      temp = os.path.join(tmpdir, 'a.tmp.jpg')
+      _touch(temp, b'encoded')
+      os.replace(temp, first)
+      # Make the directory change visible whatever the mtime granularity
+      st = os.stat(tmpdir)
+      os.utime(tmpdir, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+      allocator.committed(first)
+      with mock.patch('os.scandir', side_effect=AssertionError('directory listed again')):
+        self.assertEqual(allocator.allocate(target), os.path.join(tmpdir, 'a_1.jpg'))
+
+  def test_outside_removal_is_noticed(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      target = os.path.join(tmpdir, 'a.jpg')
+      allocator = NameAllocator()
+      path = allocator.allocate(target)
+      _touch(path)
+      allocator.release(path)
+      os.remove(path)
+      self.assertEqual(allocator.allocate(target), target)
+
+if __name__ == '__main__':
+  unittest.main()
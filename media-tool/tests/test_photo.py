@@ -1,16 +1,159 @@
 """Tests for photo processing functions."""
+import os
+import tempfile
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import piexif
+from PIL import Image, ImageChops
 from media.photo import Photo
 
+def _write_jpeg(path, size, model='Canon EOS 5D', taken='2024:06:01 12:00:00', noisy=False):
+  exif = piexif.dump({
+    '0th': {piexif.ImageIFD.Model: model.encode()},
+    'Exif': {piexif.ExifIFD.DateTimeOriginal: taken.encode()},
+  })
+  if noisy:
+    img = Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3))
+  else:
+    img = Image.new('RGB', size, (120, 80, 40))
+  img.save(path, 'JPEG', quality=95, exif=exif)
+
 class TestPhotoProcessing(unittest.TestCase):
   def test_extract_photo_metadata(self):
-    # TODO: Implement test with sample image
-    pass
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'a.jpg')
+      _write_jpeg(path, (640, 480))
+      with Photo(path) as photo:
+        self.assertEqual(photo.camera_model, 'Canon EOS 5D')
+        self.assertEqual(photo.official_time, '2024:06:01 12:00:00')
+        self.assertEqual((photo.width, photo.height), (640, 480))
+        self.assertEqual(photo.metadata['format'], 'JPEG')
   
   def test_resize_photo(self):
-    # TODO: Implement test
-    pass
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'big.jpg')
+      out = os.path.join(tmpdir, 'out.jpg')
+      _write_jpeg(path, (1600, 1200), noisy=True)
+      self.assertGreater(os.path.getsize(path), 2 * 1024 * 1024)
+      with Photo(path) as photo:
+        # Metadata came from the header reader; Pillow is only opened to resize
+        self.assertIsNone(photo._image)
+        photo.resize(out, 800, 800, 90)
+        self.assertIsNotNone(photo._image)
+      with Image.open(out) as img:
+        self.assertEqual(img.size, (800, 600))
+        self.assertIn('exif', img.info)
+  
+  def test_resize_photo_stamps_output_while_open(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'big.jpg')
+      out = os.path.join(tmpdir, 'out.jpg')
+      _write_jpeg(path, (1600, 1200), noisy=True)
+      with Photo(path) as photo:
+        self.assertIsNone(photo.resize(out, 800, 800, 90, mtime=1_700_000_000.5))
+        self.assertTrue(photo.resize_stats['stamped'])
+      self.assertEqual(os.stat(out).st_mtime, 1_700_000_000.5)
+      with Image.open(out) as img:
+        self.assertEqual(img.size, (800, 600))
+  
+  def test_resize_photo_full_and_draft_modes_match_size(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'big.jpg')
+      _write_jpeg(path, (2000, 1000), noisy=True)
+      for mode in ('full', 'draft'):
+        out = os.path.join(tmpdir, f'{mode}.jpg')
+        with Photo(path) as photo:
+          photo.resize(out, 450, 450, 90, mode)
+        with Image.open(out) as img:
+          self.assertEqual(img.size, (450, 225))
   
+  def test_resize_photo_within_limits_is_copied(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'small.jpg')
+      out = os.path.join(tmpdir, 'out.jpg')
+      _write_jpeg(path, (640, 480))
+      with Photo(path) as photo:
+        photo.resize(out, 800, 800, 90)
+        # Passthrough decision comes from metadata, the file is not reopened
+        self.assertIsNone(photo._image)
+      with open(path, 'rb') as a, open(out, 'rb') as b:
+        self.assertEqual(a.read(), b.read())
+  
+  def test_budget_mode_uses_draft_for_jpeg(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'big.jpg')
+      out = os.path.join(tmpdir, 'out.jpg')
+      _write_jpeg(path, (2000, 1000), noisy=True)
+      with Photo(path) as photo:
+        self.assertIsNone(photo.resize(out, 450, 450, 90, 'budget'))
+        self.assertEqual(photo.resize_stats['strategy'], 'draft')
+        self.assertGreater(photo.resize_stats['peak_rss_mb'], 0)
+      with Image.open(out) as img:
+        self.assertEqual(img.size, (450, 225))
+
+  def test_budget_mode_strips_match_reduce(self):
+    # 3000x2000 RGB: ~30 MB to decode and reduce in full, ~12 MB strip-wise
+    with tempfile.TemporaryDirectory() as tmpdir, mock.patch('media.photo.current_rss_mb', return_value=0):
+      for ext in ('tif', 'bmp'):  # BMP rows are stored bottom-up
+        path = os.path.join(tmpdir, f'big.{ext}')
+        Image.frombytes('RGB', (3000, 2000), os.urandom(3000 * 2000 * 3)).save(path)
+        outputs = {}
+        for max_rss_mb, strategy in ((64, 'reduce'), (20, 'strips')):
+          outputs[strategy] = os.path.join(tmpdir, f'{strategy}.{ext}.png')
+          with Photo(path) as photo:
+            photo.resize(outputs[strategy], 400, 400, 90, 'budget', max_rss_mb=max_rss_mb)
+            self.assertEqual(photo.resize_stats['strategy'], strategy)
+        with Image.open(outputs['reduce']) as a, Image.open(outputs['strips']) as b:
+          self.assertEqual(a.size, (400, 267))
+          self.assertIsNone(ImageChops.difference(a, b).getbbox())
+
+  def test_budget_mode_copies_when_nothing_fits(self):
+    with tempfile.TemporaryDirectory() as tmpdir, mock.patch('media.photo.current_rss_mb', return_value=0):
+      path = os.path.join(tmpdir, 'big.png')
+      out = os.path.join(tmpdir, 'out.png')
+      Image.frombytes('RGB', (3000, 2000), os.urandom(3000 * 2000 * 3)).save(path)
+      with Photo(path) as photo:
+        self.assertIsNotNone(photo.resize(out, 400, 400, 90, 'budget', max_rss_mb=20))
+        self.assertEqual(photo.resize_stats['strategy'], 'passthrough')
+      with open(path, 'rb') as a, open(out, 'rb') as b:
+        self.assertEqual(a.read(), b.read())
+
+  def test_budget_resizes_in_one_process_take_turns(self):
+    running, overlaps = [], []
+    original = Photo._resize_within_budget
+    def tracked(photo, *args):
+      running.append(photo)
+      overlaps.append(len(running))
+      time.sleep(0.05)
+      try:
+        return original(photo, *args)
+      finally:
+        running.remove(photo)
+    with tempfile.TemporaryDirectory() as tmpdir, mock.patch.object(Photo, '_resize_within_budget', tracked):
+      paths = []
+      for i in range(3):
+        paths.append(os.path.join(tmpdir, f'big{i}.jpg'))
+        _write_jpeg(paths[-1], (2000, 1000), noisy=True)
+      def resize(path):
+        with Photo(path) as photo:
+          photo.resize(path + '.out.jpg', 450, 450, 90, 'budget')
+          return photo.resize_stats
+      with ThreadPoolExecutor(max_workers=3) as pool:
+        stats = list(pool.map(resize, paths))
+    self.assertEqual(max(overlaps), 1)
+    self.assertTrue(all(s['peak_rss_mb'] for s in stats))
+
+  def test_overlapping_resize_reports_no_peak(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'big.jpg')
+      _write_jpeg(path, (2000, 1000), noisy=True)
+      # Another resize is running in this process
+      with mock.patch.dict('media.photo._resizes', {'running': 1}), Photo(path) as photo:
+        photo.resize(os.path.join(tmpdir, 'out.jpg'), 450, 450, 90)
+      self.assertIsNone(photo.resize_stats['peak_rss_mb'])
+
   def test_generate_photo_filename(self):
     photo = Photo(file_path='dummy.heic')
     # Simulate metadata for test
@@ -0,0 +1,121 @@
+"""Tests for the shared ffprobe service."""
+import os
+import stat
+import tempfile
+import unittest
+from media.exceptions import MetadataError
+from media.probe import ProbeService, display_size, parse_probe_output
+
+SAMPLE = {
+  'streams': [{'width': 1920, 'height': 1080, 'codec_name': 'hevc', 'bit_rate': '8000000',
+               'color_primaries': 'bt709', 'color_trc': 'bt709', 'colorspace': 'bt709'}],
+  'format': {'duration': '12.5', 'tags': {'creation_time': '2024-05-06T07:08:09.000000Z'}},
+}
+
+FAKE_FFPROBE = """#!/bin/sh
+# Records each invocation, then prints canned JSON (fails for *.bad files)
+echo "$@" >> "{log}"
+case "$*" in *.bad) exit 1;; esac
+cat <<'JSON'
+{{"streams": [{{"width": 640, "height": 480, "codec_name": "h264"}}], "format": {{"duration": "3.0"}}}}
+JSON
+"""
+
+class TestProbe(unittest.TestCase):
+  def test_parse_probe_output(self):
+    info = parse_probe_output(SAMPLE)
+    self.assertEqual(info['creation_time'], '2024-05-06T07:08:09.000000Z')
+    self.assertEqual((info['width'], info['height'], info['codec']), (1920, 1080, 'hevc'))
+    self.assertEqual(info['duration'], 12.5)
+    self.assertEqual(info['bitrate'], 8000000)
+
+  def test_parse_probe_output_rotation(self):
+    side_data = dict(SAMPLE, streams=[dict(SAMPLE['streams'][0], side_data_list=[{'rotation': -90}])])
+    tagged = dict(SAMPLE, streams=[dict(SAMPLE['streams'][0], tags={'rotate': '90'})])
+    for info in (parse_probe_output(side_data), parse_probe_output(tagged)):
+      self.assertEqual(info['rotation'] % 180, 90)
+      self.assertEqual(display_size(info), (1080, 1920))
+    self.assertEqual(display_size(parse_probe_output(SAMPLE)), (1920, 1080))
+
+  def test_parse_probe_output_empty(self):
+    info = parse_probe_output({})
+    self.assertEqual(info['codec'], 'unknown')
+    self.assertEqual((info['width'], info['duration'], info['bitrate']), (0, 0.0, 0))
+
+  def test_probe_caches_and_runs_concurrently(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      log = os.path.join(tmpdir, 'calls.log')
+      ffprobe = os.path.join(tmpdir, 'ffprobe')
+      with open(ffprobe, 'w') as f:
+        f.write(FAKE_FFPROBE.format(log=log))
+      os.chmod(ffprobe, os.stat(ffprobe).st_mode | stat.S_IEXEC)
+      paths = []
+      for name in ('a.mp4', 'b.mp4', 'c.bad'):
+        paths.append(os.path.join(tmpdir, name))
+        with open(paths[-1], 'wb') as f:
+          f.write(name.encode())
+
+      service = ProbeService(max_workers=3)
+      results = service.probe_many(paths, ffprobe)
+      self.assertEqual(results[paths[0]]['width'], 640)
+      self.assertIsInstance(results[paths[2]], MetadataError)
+
+      # Cached: no further ffprobe runs for unchanged files
+      self.assertEqual(service.probe(paths[0], ffprobe)['codec'], 'h264')
+      self.assertIsNotNone(service.cached(paths[1]))
+      with open(log) as f:
+        self.assertEqual(len(f.readlines()), 3)
+
+      # A rewritten file is probed again
+      with open(paths[0], 'ab') as f:
+        f.write(b'more')
+      service.probe(paths[0], ffprobe)
+      with open(log) as f:
+        self.assertEqual(len(f.readlines()), 4)
+
+  def test_cache_keeps_the_most_recently_used(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      log = os.path.join(tmpdir, 'calls.log')
+      ffprobe = os.path.join(tmpdir, 'ffprobe')
+      with open(ffprobe, 'w') as f:
+        f.write(FAKE_FFPROBE.format(log=log))
+      os.chmod(ffprobe, os.stat(ffprobe).st_mode | stat.S_IEXEC)
+      paths = []
+      for name in ('a.mp4', 'b.mp4', 'c.mp4'):
+        paths.append(os.path.join(tmpdir, name))
+        with open(paths[-1], 'wb') as f:
+          f.write(name.encode())
+
+      service = ProbeService(max_entries=2)
+      service.probe(paths[0], ffprobe)
+      service.probe(paths[1], ffprobe)
+      service.probe(paths[0], ffprobe)
+      service.probe(paths[2], ffprobe)
+      # b was the least recently used when c came in
+      self.assertIsNone(service.cached(paths[1]))
+      self.assertIsNotNone(service.cached(paths[0]))
+      self.assertEqual(service.probe_count, 3)
+
+  def test_prefetch_larger_than_cache_probes_each_file_once(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      log = os.path.join(tmpdir, 'calls.log')
+      ffprobe = os.path.join(tmpdir, 'ffprobe')
+      with open(ffprobe, 'w') as f:
+        f.write(FAKE_FFPROBE.format(log=log))
+      os.chmod(ffprobe, os.stat(ffprobe).st_mode | stat.S_IEXEC)
+      paths = []
+      for i in range(10):
+        paths.append(os.path.join(tmpdir, f'v{i}.mp4'))
+        with open(paths[-1], 'wb') as f:
+          f.write(str(i).encode())
+
+      # The batch prefetch, then the pipeline probing each video in turn
+      service = ProbeService(max_workers=3, max_entries=4)
+      service.probe_many(paths, ffprobe)
+      for path in paths:
+        self.assertEqual(service.probe(path, ffprobe)['codec'], 'h264')
+      self.assertEqual(service.probe_count, 10)
+      self.assertEqual(len(service._results), 4)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,113 @@
+"""Tests for the write-ahead run manifest and resuming from it."""
+import unittest
+import os
+import tempfile
+from datetime import datetime
+from unittest import mock
+from utils.run_manifest import RunManifest, DISCOVERED, RENAMED, STAGING, TIMESTAMPED, SOURCE_REMOVED
+import main
+
+class TestRunManifest(unittest.TestCase):
+  def setUp(self):
+    self._tmp = tempfile.TemporaryDirectory()
+    self.dir = self._tmp.name
+    self.path = os.path.join(self.dir, 'manifest.jsonl')
+
+  def tearDown(self):
+    self._tmp.cleanup()
+
+  def _touch(self, name, data=b'x'):
+    path = os.path.join(self.dir, name)
+    with open(path, 'wb') as f:
+      f.write(data)
+    return path
+
+  def test_unfinished_files_are_resumed_under_their_new_name(self):
+    renamed = self._touch('20240101_120000.jpg')
+    manifest = RunManifest(self.path)
+    entry = manifest.begin(os.path.join(self.dir, 'IMG_1.jpg'))
+    self.assertEqual(entry.state, DISCOVERED)
+    entry.step(RENAMED, path=renamed)
+    entry.step(STAGING, dest='/staging/a.jpg')
+    done = manifest.begin(self._touch('IMG_2.jpg'))
+    done.step(SOURCE_REMOVED)
+    done.finish('success')
+    manifest.close()
+
+    manifest = RunManifest(self.path)
+    self.assertEqual(len(manifest), 1)
+    resumed = manifest.begin(renamed)
+    self.assertEqual(resumed.state, STAGING)
+    self.assertEqual(resumed.data['dest'], '/staging/a.jpg')
+    self.assertEqual(manifest.begin(os.path.join(self.dir, 'IMG_2.jpg')).state, DISCOVERED)
+    manifest.close()
+
+  def test_torn_line_and_vanished_files_are_dropped(self):
+    kept = self._touch('kept.jpg')
+    with open(self.path, 'w') as f:
+      f.write(f'{{"file": "{kept}", "state": "renamed"}}\n')
+      f.write('{"file": "/gone.jpg", "state": "staging"}\n')
+      f.write('{"file": "' + kept + '", "state": "sta')
+    manifest = RunManifest(self.path)
+    self.assertEqual(len(manifest), 1)
+    self.assertEqual(manifest.begin(kept).state, RENAMED)
+    manifest.close()
+
+class TestResumeFromManifest(unittest.TestCase):
+  def setUp(self):
+    self._tmp = tempfile.TemporaryDirectory()
+    self.dir = self._tmp.name
+    self.manifest = RunManifest(os.path.join(self.dir, 'manifest.jsonl'))
+    self.src = os.path.join(self.dir, 'src.jpg')
+    self.dest = os.path.join(self.dir, 'dest.jpg')
+    for path in (self.src, self.dest):
+      with open(path, 'wb') as f:
+        f.write(b'photo')
+    self.logger = mock.Mock()
+
+  def tearDown(self):
+    self.manifest.close()
+    self._tmp.cleanup()
+
+  def test_completed_copy_is_finished_without_reprocessing(self):
+    entry = self.manifest.begin(self.src)
+    main.record_staged(entry, self.src, self.dest, datetime(2020, 1, 2, 3, 4, 5), moved=False)
+    result = main.resume_from_manifest(entry, 'photo', self.logger)
+    self.assertEqual(result, {'status': 'success', 'path': self.dest})
+    self.assertFalse(os.path.exists(self.src))
+    self.assertEqual(entry.state, SOURCE_REMOVED)
+    self.assertEqual(datetime.fromtimestamp(os.stat(self.dest).st_mtime), datetime(2020, 1, 2, 3, 4, 5))
+
+  def test_source_that_could_not_be_removed_stays_open(self):
+    entry = self.manifest.begin(self.src)
+    main.record_staged(entry, self.src, self.dest, datetime(2020, 1, 2), moved=False)
+    with mock.patch('os.remove', side_effect=PermissionError('read-only')):
+      result = main.resume_from_manifest(entry, 'photo', self.logger)
+    entry.finish(result['status'])
+    self.assertEqual(result['status'], 'success')
+    self.assertEqual(entry.state, TIMESTAMPED)
+    self.assertEqual(len(self.manifest), 1)
+
+  def test_changed_source_is_reprocessed(self):
+    entry = self.manifest.begin(self.src)
+    main.record_staged(entry, self.src, self.dest, datetime(2020, 1, 2), moved=False)
+    with open(self.src, 'ab') as f:
+      f.write(b'more')
+    self.assertIsNone(main.resume_from_manifest(entry, 'photo', self.logger))
+    self.assertTrue(os.path.exists(self.src))
+
+  def test_interrupted_copy_is_discarded(self):
+    entry = self.manifest.begin(self.src)
+    entry.step(STAGING, dest=self.dest)
+    self.assertIsNone(main.resume_from_manifest(entry, 'photo', self.logger))
+    self.assertFalse(os.path.exists(self.dest))
+    self.assertTrue(os.path.exists(self.src))
+
+  def test_interrupted_reuse_of_finished_encode_keeps_it(self):
+    entry = self.manifest.begin(self.src)
+    entry.step(STAGING, dest=self.dest, reused=True)
+    self.assertIsNone(main.resume_from_manifest(entry, 'video', self.logger))
+    self.assertTrue(os.path.exists(self.dest))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,44 @@
+"""Tests for per-stage timing."""
+import unittest
+import time
+from utils.timing import collect_stages, current_stages, stage, StageProfile
+
+class TestStageTiming(unittest.TestCase):
+  def test_nested_stages_record_self_time(self):
+    with collect_stages() as stages:
+      with stage('outer'):
+        time.sleep(0.02)
+        with stage('inner'):
+          time.sleep(0.05)
+    self.assertGreaterEqual(stages['inner'], 45)
+    self.assertLess(stages['outer'], 45)
+    self.assertGreaterEqual(stages['outer'], 15)
+
+  def test_decorator_accumulates_repeated_calls(self):
+    @stage('work')
+    def work():
+      time.sleep(0.01)
+    with collect_stages() as stages:
+      work()
+      work()
+    self.assertGreaterEqual(stages['work'], 18)
+
+  def test_noop_outside_collector(self):
+    with stage('ignored'):
+      pass
+    self.assertEqual(current_stages(), {})
+
+  def test_profile_rows(self):
+    profile = StageProfile()
+    profile.add({'metadata': 10.0, 'copy': 30.0})
+    profile.add({'metadata': 20.0})
+    rows = {r['stage']: r for r in profile.rows()}
+    self.assertEqual(profile.rows()[0]['stage'], 'metadata')
+    self.assertEqual(rows['metadata']['files'], 2)
+    self.assertEqual(rows['metadata']['mean_ms'], 15.0)
+    self.assertEqual(rows['metadata']['p95_ms'], 20.0)
+    self.assertEqual(rows['copy']['share'], 50.0)
+    self.assertIn('metadata', profile.format_table())
+
+if __name__ == '__main__':
+  unittest.main()
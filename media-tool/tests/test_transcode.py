@@ -0,0 +1,91 @@
+"""Tests for the transcode scheduler."""
+import json
+import os
+import stat
+import tempfile
+import unittest
+from media.exceptions import FFmpegError
+from media.transcode import TranscodeScheduler, parse_progress_block, progress_fraction, INTERRUPTED
+from media.video import FFmpegWrapper
+
+# Fake ffmpeg: emits two progress blocks and writes its last argument (fails for *.bad inputs)
+FAKE_FFMPEG = """#!/bin/sh
+for last; do :; done
+case "$3" in *.bad) echo "boom" >&2; exit 1;; esac
+printf 'frame=10\\nout_time_us=1000000\\nprogress=continue\\n'
+printf 'frame=20\\nout_time_us=2000000\\nprogress=end\\n'
+echo encoded > "$last"
+"""
+
+CODEC = {'codec': 'libx264', 'extra_args': ['-crf', '22']}
+
+class TestTranscodeScheduler(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.TemporaryDirectory()
+    ffmpeg = os.path.join(self.tmpdir.name, 'ffmpeg')
+    with open(ffmpeg, 'w') as f:
+      f.write(FAKE_FFMPEG)
+    os.chmod(ffmpeg, os.stat(ffmpeg).st_mode | stat.S_IEXEC)
+    self._saved_cmd = FFmpegWrapper.ffmpeg_cmd
+    FFmpegWrapper.ffmpeg_cmd = ffmpeg
+    self.journal = os.path.join(self.tmpdir.name, 'journal.json')
+
+  def tearDown(self):
+    FFmpegWrapper.ffmpeg_cmd = self._saved_cmd
+    self.tmpdir.cleanup()
+
+  def _source(self, name):
+    path = os.path.join(self.tmpdir.name, name)
+    with open(path, 'wb') as f:
+      f.write(b'video')
+    return path
+
+  def test_progress_parsing(self):
+    block = parse_progress_block(['frame=1\n', 'out_time_us=5000000\n', 'progress=continue\n'])
+    self.assertEqual(progress_fraction(block, 10.0), 0.5)
+    self.assertEqual(progress_fraction({'progress': 'end'}, 0), 1.0)
+    self.assertIsNone(progress_fraction({'out_time_us': 'N/A'}, 10.0))
+
+  def test_thread_budget(self):
+    scheduler = TranscodeScheduler(self.journal, max_jobs=2, threads_per_job=0)
+    self.assertEqual(scheduler.max_jobs, 2)
+    self.assertGreaterEqual(scheduler.threads_per_job, 1)
+
+  def test_transcode_records_journal(self):
+    src = self._source('in.mp4')
+    out = os.path.join(self.tmpdir.name, 'out.mp4')
+    progress = []
+    scheduler = TranscodeScheduler(self.journal, max_jobs=1, threads_per_job=1)
+    scheduler.transcode(src, out, 1920, 1080, CODEC, duration=4.0, on_progress=progress.append)
+    self.assertTrue(os.path.exists(out))
+    self.assertEqual(progress, [0.25, 1.0])
+    self.assertEqual(scheduler.completed_output(src), os.path.abspath(out))
+
+    # A new scheduler (restart) still knows the encode finished
+    self.assertEqual(TranscodeScheduler(self.journal).completed_output(src), os.path.abspath(out))
+
+  def test_failure_raises_and_cleans_up(self):
+    src = self._source('in.bad')
+    out = os.path.join(self.tmpdir.name, 'out.mp4')
+    scheduler = TranscodeScheduler(self.journal, max_jobs=1, threads_per_job=1)
+    with self.assertRaises(FFmpegError):
+      scheduler.transcode(src, out, 1920, 1080, CODEC)
+    self.assertFalse(os.path.exists(out))
+    self.assertIsNone(scheduler.completed_output(src))
+
+  def test_interrupted_jobs_recovered(self):
+    src = self._source('in.mp4')
+    temp = os.path.join(self.tmpdir.name, 'out.tmp.mp4')
+    with open(temp, 'w') as f:
+      f.write('partial')
+    with open(self.journal, 'w') as f:
+      json.dump({TranscodeScheduler.job_id(src): {
+        'input': src, 'output': os.path.join(self.tmpdir.name, 'out.mp4'), 'temp': temp,
+        'codec': 'libx264', 'state': 'running', 'progress': 0.4, 'updated': 0}}, f)
+    scheduler = TranscodeScheduler(self.journal)
+    jobs = scheduler.interrupted_jobs()
+    self.assertEqual([job['state'] for job in jobs], [INTERRUPTED])
+    self.assertFalse(os.path.exists(temp))
+
+if __name__ == '__main__':
+  unittest.main()
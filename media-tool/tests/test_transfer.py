@@ -0,0 +1,62 @@
+"""Tests for the file transfer engine."""
+import unittest
+import os
+import tempfile
+from unittest import mock
+from utils import transfer
+from utils.transfer import TransferEngine, RENAME, REFLINK, COPY_FILE_RANGE, SENDFILE, COPY
+
+class TestTransferEngine(unittest.TestCase):
+  def setUp(self):
+    self._tmp = tempfile.TemporaryDirectory()
+    self.src = os.path.join(self._tmp.name, 'src.mp4')
+    self.dst = os.path.join(self._tmp.name, 'dst.mp4')
+    self.data = os.urandom(300 * 1024)
+    with open(self.src, 'wb') as f:
+      f.write(self.data)
+    os.utime(self.src, (1_600_000_000, 1_600_000_000))
+
+  def tearDown(self):
+    self._tmp.cleanup()
+
+  def _read(self, path):
+    with open(path, 'rb') as f:
+      return f.read()
+
+  def test_copy_keeps_source_and_timestamps(self):
+    method = TransferEngine().transfer(self.src, self.dst)
+    self.assertIn(method, [REFLINK, COPY_FILE_RANGE, SENDFILE, COPY])
+    self.assertEqual(self._read(self.dst), self.data)
+    self.assertTrue(os.path.exists(self.src))
+    self.assertEqual(os.stat(self.dst).st_mtime, 1_600_000_000)
+
+  def test_move_on_same_filesystem_renames(self):
+    inode = os.stat(self.src).st_ino
+    self.assertEqual(TransferEngine().transfer(self.src, self.dst, move=True), RENAME)
+    self.assertFalse(os.path.exists(self.src))
+    self.assertEqual(os.stat(self.dst).st_ino, inode)
+
+  def test_each_copier_copies_everything(self):
+    for method in (COPY_FILE_RANGE, SENDFILE, COPY):
+      with self.subTest(method=method):
+        TransferEngine._copy_with(method, self.src, self.dst, len(self.data))
+        self.assertEqual(self._read(self.dst), self.data)
+        os.remove(self.dst)
+
+  def test_unsupported_methods_fall_back_and_are_remembered(self):
+    engine = TransferEngine()
+    def unsupported(*args):
+      raise transfer._Unsupported()
+    with mock.patch.dict(transfer._COPIERS, {REFLINK: unsupported, COPY_FILE_RANGE: unsupported}):
+      self.assertEqual(engine.transfer(self.src, self.dst), SENDFILE)
+    self.assertEqual(self._read(self.dst), self.data)
+    dev = os.stat(self.src).st_dev
+    self.assertEqual(engine.methods(dev, dev), [SENDFILE, COPY])
+
+  def test_copy_over_existing_placeholder(self):
+    open(self.dst, 'wb').close()
+    TransferEngine().transfer(self.src, self.dst)
+    self.assertEqual(self._read(self.dst), self.data)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,7 +1,13 @@
 """Tests for video processing functions."""
 import unittest
+from unittest import mock
+from media.exceptions import ValidationError
 from media.video import Video, FFmpegWrapper
 
+# A phone portrait clip: stored as landscape frames plus a 90 degree display rotation
+PORTRAIT = {'creation_time': '', 'codec': 'hevc', 'width': 3840, 'height': 2160, 'rotation': 90,
+            'duration': 10.0, 'bitrate': 40000000, 'color_primaries': '', 'color_trc': '', 'colorspace': ''}
+
 
 class TestVideoProcessing(unittest.TestCase):
     def test_generate_video_filename(self):
@@ -23,5 +29,25 @@ class TestVideoProcessing(unittest.TestCase):
         self.assertEqual(params['codec'], 'libx265')
         self.assertIn('-crf', params['extra_args'])
 
+    def test_portrait_display_size(self):
+        video = Video('portrait.mov', metadata=PORTRAIT)
+        self.assertEqual(video.display_size, (2160, 3840))
+
+    def test_resize_keeps_aspect_ratio(self):
+        cmd = FFmpegWrapper.build_resize_cmd('in.mov', 'out.mov', 1920, 1080, {'codec': 'libx265'})
+        vf = cmd[cmd.index('-vf') + 1]
+        self.assertEqual(vf, 'scale=1920:1080:force_original_aspect_ratio=decrease:force_divisible_by=2')
+
+    def test_validate_portrait_output(self):
+        # Fitted inside 1920x1080, the portrait clip comes out 608x1080
+        fitted = dict(PORTRAIT, width=608, height=1080, rotation=0, bitrate=2000000)
+        stretched = dict(fitted, width=1920)
+        with mock.patch('os.path.getsize', return_value=1000000):
+            with mock.patch.object(FFmpegWrapper, 'get_video_info', return_value=fitted):
+                FFmpegWrapper.validate_video_output('in.mov', 'out.mov', 1920, 1080, src_info=PORTRAIT)
+            with mock.patch.object(FFmpegWrapper, 'get_video_info', return_value=stretched):
+                with self.assertRaises(ValidationError):
+                    FFmpegWrapper.validate_video_output('in.mov', 'out.mov', 1920, 1080, src_info=PORTRAIT)
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,96 @@
+"""Tests for watch mode helpers."""
+import unittest
+import os
+import tempfile
+import time
+from utils.watcher import InotifyWatcher, PollingWatcher, StableFileTracker
+
+def _write(path, data=b'x'):
+  with open(path, 'ab') as f:
+    f.write(data)
+
+class TestStableFileTracker(unittest.TestCase):
+  def test_ready_after_stable_period(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'a.jpg')
+      _write(path)
+      tracker = StableFileTracker(stable_seconds=5)
+      tracker.add(path, now=0)
+      self.assertEqual(tracker.pop_ready(now=0), [])
+      self.assertEqual(tracker.pop_ready(now=3), [])
+      self.assertEqual(tracker.pop_ready(now=5), [path])
+      self.assertEqual(len(tracker), 0)
+
+  def test_growing_file_is_not_ready(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'a.mp4')
+      _write(path)
+      tracker = StableFileTracker(stable_seconds=5)
+      tracker.add(path, now=0)
+      tracker.pop_ready(now=0)
+      _write(path, b'more')
+      self.assertEqual(tracker.pop_ready(now=6), [])
+      self.assertEqual(tracker.pop_ready(now=10), [])
+      self.assertEqual(tracker.pop_ready(now=11), [path])
+
+  def test_vanished_file_is_dropped(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'a.jpg')
+      _write(path)
+      tracker = StableFileTracker(stable_seconds=1)
+      tracker.add(path, now=0)
+      os.remove(path)
+      self.assertEqual(tracker.pop_ready(now=5), [])
+      self.assertEqual(len(tracker), 0)
+
+  def test_processed_file_ignored_after_rename(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'IMG_1.jpg')
+      _write(path)
+      tracker = StableFileTracker(stable_seconds=1, processed_ttl=60)
+      tracker.mark_processed(path, now=0)
+      renamed = os.path.join(tmpdir, '20240101_120000.jpg')
+      os.rename(path, renamed)
+      tracker.add(renamed, now=10)
+      self.assertEqual(len(tracker), 0)
+      # Forgotten once the TTL expires
+      tracker.add(renamed, now=61)
+      self.assertEqual(len(tracker), 1)
+
+class TestWatchers(unittest.TestCase):
+  def test_polling_reports_new_files_once(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      _write(os.path.join(tmpdir, 'old.jpg'))
+      watcher = PollingWatcher(tmpdir, ['.jpg'], interval=0.01)
+      time.sleep(0.02)
+      new_path = os.path.join(tmpdir, 'new.jpg')
+      _write(new_path)
+      _write(os.path.join(tmpdir, 'notes.txt'))
+      self.assertEqual(list(watcher.poll(0.1)), [new_path])
+      time.sleep(0.02)
+      self.assertEqual(list(watcher.poll(0.1)), [])
+
+  def test_inotify_reports_files_in_new_subfolder(self):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      try:
+        watcher = InotifyWatcher(tmpdir, ['.jpg'])
+      except (OSError, AttributeError):
+        self.skipTest('inotify not available')
+      try:
+        top = os.path.join(tmpdir, 'top.jpg')
+        _write(top)
+        sub = os.path.join(tmpdir, 'album')
+        os.mkdir(sub)
+        _write(os.path.join(sub, 'ignored.txt'))
+        seen = set()
+        for _ in range(5):
+          seen.update(watcher.poll(0.2))
+        _write(os.path.join(sub, 'late.jpg'))
+        for _ in range(5):
+          seen.update(watcher.poll(0.2))
+        self.assertEqual(seen, {top, os.path.join(sub, 'late.jpg')})
+      finally:
+        watcher.close()
+
+if __name__ == '__main__':
+  unittest.main()
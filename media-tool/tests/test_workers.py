@@ -0,0 +1,32 @@
+"""Tests for worker pool helpers."""
+import threading
+import time
+import unittest
+from utils.workers import imap_bounded
+
+class TestImapBounded(unittest.TestCase):
+  def test_all_items_processed(self):
+    results = dict(imap_bounded(lambda x: x * x, range(50), max_workers=4))
+    self.assertEqual(results, {i: i * i for i in range(50)})
+
+  def test_queue_size_bounds_in_flight(self):
+    lock = threading.Lock()
+    state = {'active': 0, 'peak': 0}
+
+    def work(item):
+      with lock:
+        state['active'] += 1
+        state['peak'] = max(state['peak'], state['active'])
+      time.sleep(0.01)
+      with lock:
+        state['active'] -= 1
+      return item
+
+    consumed = 0
+    for _ in imap_bounded(work, iter(range(30)), max_workers=3, queue_size=3):
+      consumed += 1
+    self.assertEqual(consumed, 30)
+    self.assertLessEqual(state['peak'], 3)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -2,35 +2,72 @@ import os
 import re
 import platform
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Tuple
+
+# All filename date schemes in one precompiled pattern. Every scheme starts with a
+# 4-digit group, so alternatives are factored on it and each position is tried once.
+_FILENAME_DATE = re.compile(r"""
+  (?P<Y>\d{4})
+  (?:
+    (?P<M>\d{2})(?P<D>\d{2})
+    (?:
+      [_-](?P<h>\d{2})(?P<m>\d{2})(?P<s>\d{2})           # 20240101_120000, IMG_/VID_/PXL_..., Screenshot_20240101-120000
+    | (?P<wa>-WA\d)                                      # IMG-20240101-WA0001 (WhatsApp, date only)
+    | (?P<ts>\d{2})                                      # 10-digit Unix timestamp
+    )
+  | -(?P<M2>\d{2})-(?P<D2>\d{2})
+    (?:
+      [_\s](?P<h2>\d{2})-(?P<m2>\d{2})-(?P<s2>\d{2})     # 2024-01-01_12-00-00
+    | \ at\ (?P<h3>\d{2})\.(?P<m3>\d{2})\.(?P<s3>\d{2})  # WhatsApp Image 2024-01-01 at 12.00.00
+    )
+  )
+""", re.VERBOSE)
+
+# Scheme priorities when a filename matches more than one (lower wins)
+_COMPACT, _DASHED, _WHATSAPP_ID, _UNIX = range(4)
+
+
+def _match_date(m: 're.Match') -> Tuple[int, Optional[datetime]]:
+  """
+  Build the datetime for one match straight from its groups. The scheme is
+  told by the last group that matched; None if the digits are not a valid date.
+  """
+  scheme = m.lastgroup
+  try:
+    if scheme == 's':
+      return _COMPACT, datetime(*map(int, m.group('Y', 'M', 'D', 'h', 'm', 's')))
+    if scheme == 's2':
+      return _DASHED, datetime(*map(int, m.group('Y', 'M2', 'D2', 'h2', 'm2', 's2')))
+    if scheme == 's3':
+      return _DASHED, datetime(*map(int, m.group('Y', 'M2', 'D2', 'h3', 'm3', 's3')))
+    if scheme == 'wa':
+      return _WHATSAPP_ID, datetime(*map(int, m.group('Y', 'M', 'D')))
+    return _UNIX, datetime.fromtimestamp(int(''.join(m.group('Y', 'M', 'D', 'ts'))))
+  except (ValueError, OverflowError, OSError):
+    return _UNIX + 1, None
+
 
 def parse_date_from_filename(filename: str) -> Optional[datetime]:
-  """Try to extract date from filename using common patterns."""
-  # Pattern 1: YYYYMMDD_HHMMSS
-  match = re.search(r'(\d{8})_(\d{6})', filename)
-  if match:
-    try:
-      return datetime.strptime(match.group(1) + match.group(2), '%Y%m%d%H%M%S')
-    except Exception:
-      pass
-  
-  # Pattern 2: YYYY-MM-DD_HH-MM-SS
-  match = re.search(r'(\d{4})-(\d{2})-(\d{2})[_\s](\d{2})-(\d{2})-(\d{2})', filename)
-  if match:
-    try:
-      return datetime.strptime(f"{match.group(1)}{match.group(2)}{match.group(3)}{match.group(4)}{match.group(5)}{match.group(6)}", '%Y%m%d%H%M%S')
-    except Exception:
-      pass
-  
-  # Pattern 3: Unix timestamp (10 digits)
-  match = re.search(r'(\d{10})', filename)
-  if match:
-    try:
-      return datetime.fromtimestamp(int(match.group(1)))
-    except Exception:
-      pass
-  
-  return None
+  """
+  Try to extract date from filename using common patterns.
+
+  Usually a single search of one precompiled pattern; the match is turned into
+  a datetime without strptime. If the first match is not a valid date or not
+  the highest-priority scheme, later (possibly overlapping) matches are tried
+  and the best one wins.
+  """
+  best, best_priority = None, _UNIX + 1
+  pos = 0
+  while True:
+    m = _FILENAME_DATE.search(filename, pos)
+    if m is None:
+      return best
+    priority, dt = _match_date(m)
+    if priority < best_priority:
+      if priority == _COMPACT:
+        return dt
+      best, best_priority = dt, priority
+    pos = m.start() + 1
 
 def get_file_modification_time(file_path: str) -> datetime:
   """
@@ -1,25 +1,104 @@
 import os
-from typing import List, Optional
-import shutil
+from typing import Iterator, List, Optional
+
+from utils.name_allocator import NameAllocator
+from utils.transfer import transfer_file
+from utils.timing import stage
+
+# Shared by all workers so two files never resolve to the same name
+_names = NameAllocator()
+
+# Directories created (or found) by ensure_dir during this run
+_made_dirs = set()
 
 def scan_folder_recursive(folder: str, extensions: List[str]) -> List[str]:
   """Scan folder recursively for files matching extensions."""
-  matches = []
-  for root, _, files in os.walk(folder):
-    for f in files:
-      if any(f.lower().endswith(ext.lower()) for ext in extensions):
-        matches.append(os.path.join(root, f))
-  return matches
-
-def copy_file(src: str, dst: str):
-  """Copy file, creating parent directories as needed."""
-  os.makedirs(os.path.dirname(dst), exist_ok=True)
-  shutil.copy2(src, dst)
+  return list(iter_folder(folder, extensions))
+
+def iter_folder(folder: str, extensions: List[str], journal=None) -> Iterator[str]:
+  """
+  Yield files under folder matching extensions, top-down like os.walk.
+  
+  Uses os.scandir so entry types come from the directory listing without extra
+  stats. With a ScanJournal, directories whose mtime is unchanged since the last
+  run are not listed again; their remembered files are yielded instead. The
+  journal is saved once the scan completes.
+  """
+  suffixes = tuple(ext.lower() for ext in extensions)
+  stack = [folder]
+  while stack:
+    directory = stack.pop()
+    try:
+      mtime_ns = os.stat(directory).st_mtime_ns
+    except OSError:
+      continue
+    entry = journal.lookup(directory, mtime_ns) if journal is not None else None
+    if entry is not None:
+      files, subdirs = entry['files'], entry['dirs']
+    else:
+      files, subdirs = [], []
+      try:
+        with os.scandir(directory) as it:
+          for e in it:
+            try:
+              is_dir = e.is_dir()
+            except OSError:
+              is_dir = False
+            if is_dir:
+              # Like os.walk: symlinked directories are not followed
+              if not e.is_symlink():
+                subdirs.append(e.name)
+            elif e.name.lower().endswith(suffixes):
+              files.append(e.name)
+      except OSError:
+        continue
+      if journal is not None:
+        journal.record(directory, mtime_ns, files, subdirs)
+    for name in files:
+      yield os.path.join(directory, name)
+    stack.extend(os.path.join(directory, d) for d in reversed(subdirs))
+  if journal is not None:
+    journal.save()
+
+def ensure_dir(path: str) -> None:
+  """
+  os.makedirs(path, exist_ok=True), once per directory per run. A staging
+  folder that disappears later is recreated by handle_duplicates, which
+  always runs before a file is written into it.
+  """
+  if path in _made_dirs:
+    return
+  os.makedirs(path, exist_ok=True)
+  _made_dirs.add(path)
 
+def stamp_fd(fd: int, timestamp: float) -> bool:
+  """Set the atime and mtime of an open file. Returns False if the filesystem refuses."""
+  try:
+    os.utime(fd, (timestamp, timestamp))
+  except (OSError, NotImplementedError):
+    return False
+  return True
+
+@stage('copy')
+def copy_file(src: str, dst: str, move: bool = False) -> str:
+  """
+  Copy file, creating parent directories as needed.
+  With move=True the source may be renamed instead when on the same filesystem.
+  Returns the transfer method used (see utils.transfer); 'rename' means src is gone.
+  """
+  ensure_dir(os.path.dirname(dst))
+  return transfer_file(src, dst, move)
+
+@stage('allocate')
 def handle_duplicates(dst_path: str, strategy: str = 'counter') -> Optional[str]:
   """
   Handle duplicate files based on strategy.
   
+  The returned path is reserved with an empty placeholder file until
+  release_path() is called, so concurrent callers resolving the same name get
+  distinct results (first come, lowest counter). Write the file over the
+  placeholder; releasing an unwritten placeholder removes it.
+  
   Args:
     dst_path: Destination file path
     strategy: 'counter' (append _1, _2, etc.) or 'skip' (return None)
@@ -27,21 +106,21 @@ def handle_duplicates(dst_path: str, strategy: str = 'counter') -> Optional[str]
   Returns:
     Available path or None if strategy is 'skip' and file exists
   """
-  if not os.path.exists(dst_path):
-    return dst_path
-  
-  if strategy == 'skip':
+  new_path = _names.allocate(dst_path, strategy)
+  if new_path is None:
     return None
-  
-  # Counter strategy
-  base, ext = os.path.splitext(dst_path)
-  counter = 1
-  new_path = dst_path
-  while os.path.exists(new_path):
-    new_path = f"{base}_{counter}{ext}"
-    counter += 1
-  return new_path
+  # Keep the caller's spelling of the directory (relative or absolute)
+  return os.path.join(os.path.dirname(dst_path), os.path.basename(new_path))
+
+def commit_path(path: str):
+  """Tell the allocator a file reserved by handle_duplicates was renamed into place."""
+  _names.committed(path)
+
+def release_path(path: Optional[str]):
+  """Release a reservation made by handle_duplicates once the file is written (or abandoned)."""
+  _names.release(path)
 
+@stage('rename')
 def rename_in_place(src_path: str, new_filename: str, strategy: str = 'counter') -> Optional[str]:
   """Rename a file within its current directory, handling duplicates per strategy."""
   directory = os.path.dirname(src_path)
@@ -51,9 +130,12 @@ def rename_in_place(src_path: str, new_filename: str, strategy: str = 'counter')
   target_path = handle_duplicates(target_base, strategy)
   if target_path is None:
     return None
-  os.makedirs(os.path.dirname(target_path), exist_ok=True)
   try:
+    ensure_dir(os.path.dirname(target_path))
     os.replace(src_path, target_path)
+    _names.committed(target_path)
   except OSError:
     return None
+  finally:
+    release_path(target_path)
   return target_path
@@ -0,0 +1,265 @@
+"""Content-hash index of the staging library, used to skip re-imports of the same file."""
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Iterable, Optional, Tuple
+
+# Bytes hashed from each end of a file for the partial hash
+CHUNK_SIZE = 64 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS content (
+  path TEXT NOT NULL,
+  origin TEXT NOT NULL,
+  size INTEGER NOT NULL,
+  partial TEXT NOT NULL,
+  full TEXT,
+  file_size INTEGER NOT NULL,
+  mtime_ns INTEGER NOT NULL,
+  PRIMARY KEY (path, origin)
+);
+CREATE INDEX IF NOT EXISTS content_by_hash ON content (size, partial);
+"""
+
+# origin values: FILE rows hash the staged file itself, SOURCE rows hash the
+# import source it was produced from (which differs once resized or re-encoded)
+FILE = 'file'
+SOURCE = 'source'
+
+
+def partial_hash(path: str, size: int) -> str:
+  """BLAKE2 of the size and the first and last CHUNK_SIZE bytes (the whole file if small)."""
+  h = hashlib.blake2b(str(size).encode(), digest_size=16)
+  with open(path, 'rb') as f:
+    h.update(f.read(CHUNK_SIZE))
+    if size > CHUNK_SIZE:
+      f.seek(max(CHUNK_SIZE, size - CHUNK_SIZE))
+      h.update(f.read(CHUNK_SIZE))
+  return h.hexdigest()
+
+
+def full_hash(path: str) -> str:
+  """BLAKE2 of the whole file."""
+  h = hashlib.blake2b(digest_size=32)
+  with open(path, 'rb') as f:
+    for block in iter(lambda: f.read(1024 * 1024), b''):
+      h.update(block)
+  return h.hexdigest()
+
+
+class ContentClaim:
+  """A source file being checked/imported; holds its hashes and any duplicate found."""
+
+  def __init__(self, path: str, size: int, partial: str):
+    self.path = path
+    self.size = size
+    self.partial = partial
+    self.full: Optional[str] = None
+    self.duplicate: Optional[str] = None
+
+  @property
+  def key(self) -> Tuple[int, str]:
+    return self.size, self.partial
+
+  def full_hash(self) -> str:
+    if self.full is None:
+      self.full = full_hash(self.path)
+    return self.full
+
+
+class HashIndex:
+  """
+  SQLite index from content hash to files in the staging library.
+
+  Lookups use an indexed (size, partial hash) query, so checking a source
+  costs two small reads however big the library is; the full BLAKE2 of both
+  files is only computed when the partial hashes collide. Files up to
+  2 x CHUNK_SIZE are hashed completely by the partial hash.
+
+  claim() serialises sources with the same partial hash, so two copies of a
+  file imported concurrently cannot both pass the check.
+  """
+
+  def __init__(self, db_path: str):
+    self.db_path = db_path
+    self._lock = threading.Lock()
+    self._inflight = set()
+    self._inflight_cond = threading.Condition()
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    self._conn = sqlite3.connect(db_path, check_same_thread=False)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute("PRAGMA synchronous=NORMAL")
+    self._conn.executescript(_SCHEMA)
+    self._conn.commit()
+
+  def refresh(self, folders: Iterable[str]) -> Tuple[int, int]:
+    """
+    Bring the index in line with the files under folders.
+    Only new or changed files are hashed. Returns (indexed, removed) counts.
+    """
+    with self._lock:
+      known = {
+        path: (file_size, mtime_ns) for path, file_size, mtime_ns in
+        self._conn.execute("SELECT path, file_size, mtime_ns FROM content WHERE origin = ?", (FILE,))
+      }
+    seen = set()
+    indexed = 0
+    for path, st in self._walk(folders):
+      seen.add(path)
+      if known.get(path) == (st.st_size, st.st_mtime_ns):
+        continue
+      try:
+        digest = partial_hash(path, st.st_size)
+      except OSError:
+        continue
+      self._store(path, FILE, st.st_size, digest, None, st, commit=False)
+      indexed += 1
+    with self._lock:
+      stale = [
+        (path,) for (path,) in self._conn.execute("SELECT DISTINCT path FROM content")
+        if path not in seen
+      ]
+      self._conn.executemany("DELETE FROM content WHERE path = ?", stale)
+      self._conn.commit()
+    return indexed, len(stale)
+
+  @staticmethod
+  def _walk(folders: Iterable[str]):
+    stack = [f for f in folders if os.path.isdir(f)]
+    while stack:
+      directory = stack.pop()
+      try:
+        with os.scandir(directory) as it:
+          entries = list(it)
+      except OSError:
+        continue
+      for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+          stack.append(entry.path)
+        elif entry.is_file(follow_symlinks=False) and '.tmp' not in entry.name:
+          try:
+            yield entry.path, entry.stat()
+          except OSError:
+            continue
+
+  def _store(self, path: str, origin: str, size: int, partial: str, full: Optional[str],
+             st: os.stat_result, commit: bool = True) -> None:
+    with self._lock:
+      self._conn.execute(
+        "INSERT OR REPLACE INTO content (path, origin, size, partial, full, file_size, mtime_ns) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (path, origin, size, partial, full, st.st_size, st.st_mtime_ns)
+      )
+      if commit:
+        self._conn.commit()
+
+  def claim(self, path: str) -> ContentClaim:
+    """
+    Hash path and look for the same content in the library.
+    The returned claim's duplicate is the matching library file, or None.
+    Always pass the claim to release() when done with it.
+    """
+    size = os.path.getsize(path)
+    claim = ContentClaim(path, size, partial_hash(path, size))
+    with self._inflight_cond:
+      while claim.key in self._inflight:
+        self._inflight_cond.wait()
+      self._inflight.add(claim.key)
+    try:
+      claim.duplicate = self._find(claim)
+    except Exception:
+      self.release(claim)
+      raise
+    return claim
+
+  def _find(self, claim: ContentClaim) -> Optional[str]:
+    with self._lock:
+      rows = self._conn.execute(
+        "SELECT path, origin, full FROM content WHERE size = ? AND partial = ?", claim.key
+      ).fetchall()
+    for path, origin, full in rows:
+      if not os.path.exists(path):
+        with self._lock:
+          self._conn.execute("DELETE FROM content WHERE path = ?", (path,))
+          self._conn.commit()
+        continue
+      if claim.size <= 2 * CHUNK_SIZE:
+        return path
+      if full is None and origin == FILE:
+        full = full_hash(path)
+        with self._lock:
+          self._conn.execute(
+            "UPDATE content SET full = ? WHERE path = ? AND origin = ?", (full, path, origin)
+          )
+          self._conn.commit()
+      if full is not None and full == claim.full_hash():
+        return path
+    return None
+
+  def record(self, claim: ContentClaim, library_path: str, same_content: bool = False) -> None:
+    """
+    Record that claim's source was imported as library_path.
+    same_content says library_path is a byte-for-byte move or copy of the
+    source: its FILE row then stands for the source's content and is hashed
+    in full only on a later collision, so an import that was a rename never
+    reads the file end to end.
+    """
+    st = os.stat(library_path)
+    if same_content and st.st_size == claim.size:
+      full = file_full = claim.full
+      file_partial = claim.partial
+    else:
+      # The source is removed after import, so its full hash has to be taken now
+      full = claim.full_hash() if claim.size > 2 * CHUNK_SIZE else None
+      file_full = None
+      file_partial = partial_hash(library_path, st.st_size)
+    self._store(library_path, SOURCE, claim.size, claim.partial, full, st)
+    self._store(library_path, FILE, st.st_size, file_partial, file_full, st)
+
+  def is_import_of(self, library_path: str, size: int, partial: str) -> bool:
+    """
+    True if library_path was recorded as imported from a source with this size
+    and partial hash, and has not changed since.
+    """
+    with self._lock:
+      row = self._conn.execute(
+        "SELECT size, partial, file_size, mtime_ns FROM content WHERE path = ? AND origin = ?",
+        (library_path, SOURCE)
+      ).fetchone()
+    if row is None or row[:2] != (size, partial):
+      return False
+    try:
+      st = os.stat(library_path)
+    except OSError:
+      return False
+    return row[2:] == (st.st_size, st.st_mtime_ns)
+
+  def release(self, claim: Optional[ContentClaim]) -> None:
+    if claim is None:
+      return
+    with self._inflight_cond:
+      self._inflight.discard(claim.key)
+      self._inflight_cond.notify_all()
+
+  def __len__(self) -> int:
+    with self._lock:
+      return self._conn.execute("SELECT COUNT(*) FROM content").fetchone()[0]
+
+  def close(self) -> None:
+    with self._lock:
+      self._conn.commit()
+      self._conn.close()
+
+
+def open_hash_index(config, log_file: str) -> Optional[HashIndex]:
+  """Open and refresh the index configured under `dedup`, or None if disabled."""
+  if not config.get('dedup.enabled', False):
+    return None
+  db_path = config.get('dedup.index')
+  if not db_path:
+    db_path = os.path.join(os.path.dirname(log_file), 'media_tool_hashes.sqlite')
+  index = HashIndex(db_path)
+  staging_folder = config.get('staging_folder')
+  index.refresh([os.path.join(staging_folder, 'Photos'), os.path.join(staging_folder, 'Videos')])
+  return index
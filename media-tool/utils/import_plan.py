@@ -0,0 +1,68 @@
+"""JSON-lines import plans: written by a --plan run, executed by an --apply run."""
+import json
+import os
+import time
+from typing import Dict, List, Tuple
+
+PLAN_VERSION = 1
+
+# Planned actions
+IMPORT = 'import'
+SKIP = 'skip'
+ERROR = 'error'
+
+
+class PlanWriter:
+  """
+  Writes a plan: a header line, then one line per source file.
+
+  Lines go to a temp file that replaces path on close(), so an interrupted
+  planning run never leaves a partial plan behind to be applied.
+  """
+
+  def __init__(self, path: str, **header):
+    self.path = path
+    self.counts: Dict[str, int] = {IMPORT: 0, SKIP: 0, ERROR: 0}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    self._temp = path + '.tmp'
+    self._f = open(self._temp, 'w', encoding='utf-8')
+    self._write({'plan': PLAN_VERSION, 'created': time.time(), **header})
+
+  def _write(self, record: Dict) -> None:
+    self._f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+  def add(self, entry: Dict) -> None:
+    """Append one file's entry; entry['action'] is IMPORT, SKIP or ERROR."""
+    self.counts[entry['action']] += 1
+    self._write(entry)
+
+  def close(self) -> None:
+    self._f.close()
+    os.replace(self._temp, self.path)
+
+  def abort(self) -> None:
+    """Drop the plan written so far."""
+    self._f.close()
+    os.remove(self._temp)
+
+
+def read_plan(path: str) -> Tuple[Dict, List[Dict]]:
+  """Return (header, entries) of the plan at path. Raises ValueError if it is not a plan."""
+  with open(path, 'r', encoding='utf-8') as f:
+    try:
+      header = json.loads(f.readline())
+      entries = [json.loads(line) for line in f if line.strip()]
+    except ValueError as e:
+      raise ValueError(f"Invalid plan file {path}: {e}")
+  if not isinstance(header, dict) or header.get('plan') != PLAN_VERSION:
+    raise ValueError(f"Invalid plan file {path}: unsupported plan version")
+  return header, entries
+
+
+def source_unchanged(entry: Dict) -> bool:
+  """True if the entry's source still has the size and mtime it was planned with."""
+  try:
+    st = os.stat(entry['source'])
+  except OSError:
+    return False
+  return (st.st_size, st.st_mtime_ns) == (entry['size'], entry['mtime_ns'])
@@ -0,0 +1,52 @@
+"""Process memory readings (Linux /proc), used to budget and report photo resizes."""
+import resource
+from typing import Optional
+
+# Process peak recorded before the last reset, so peak_rss_mb() stays process-wide
+_peak_before_reset = 0.0
+
+
+def _status_mb(field: str) -> Optional[float]:
+  try:
+    with open('/proc/self/status') as f:
+      for line in f:
+        if line.startswith(field):
+          return round(int(line.split()[1]) / 1024, 1)
+  except (OSError, ValueError, IndexError):
+    pass
+  return None
+
+
+def current_rss_mb() -> Optional[float]:
+  """Resident set size of this process in MB, or None if it cannot be read."""
+  return _status_mb('VmRSS:')
+
+
+def peak_rss_mb() -> float:
+  """
+  Peak resident set size of this process in MB since it started. Falls back to
+  ru_maxrss where /proc is not available.
+  """
+  # VmHWM is per address space; ru_maxrss survives exec on Linux and would
+  # report the parent's peak.
+  peak = _status_mb('VmHWM:')
+  if peak is not None:
+    return max(peak, _peak_before_reset)
+  return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def window_peak_rss_mb() -> Optional[float]:
+  """Peak resident set size in MB since the last reset_peak_rss()."""
+  return _status_mb('VmHWM:')
+
+
+def reset_peak_rss() -> bool:
+  """Start a new window_peak_rss_mb() window (Linux >= 4.0). Returns False if unsupported."""
+  global _peak_before_reset
+  _peak_before_reset = max(_peak_before_reset, _status_mb('VmHWM:') or 0.0)
+  try:
+    with open('/proc/self/clear_refs', 'w') as f:
+      f.write('5')
+    return True
+  except OSError:
+    return False
@@ -0,0 +1,197 @@
+"""Per-directory allocation of free destination names for parallel workers."""
+import os
+import re
+import stat
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+
+def _mtime_ns(path: str) -> Optional[int]:
+  try:
+    return os.stat(path).st_mtime_ns
+  except OSError:
+    return None
+
+
+class _Directory:
+  """Names present in one directory when listed, and the next counter to try per base name."""
+
+  def __init__(self, path: str):
+    self.path = path
+    self.mtime_ns = _mtime_ns(path)
+    try:
+      with os.scandir(path) as it:
+        self.names: Set[str] = {e.name for e in it}
+    except OSError:
+      self.names = set()
+    self.next_counter: Dict[Tuple[str, str], int] = {}
+
+  def touched(self) -> None:
+    """Note a change we made ourselves, so it does not look like an outside one."""
+    self.mtime_ns = _mtime_ns(self.path)
+
+
+class NameAllocator:
+  """
+  Hands out free file names, appending _1, _2, ... on collisions.
+
+  Each target directory is listed once and its names kept in memory, so
+  resolving a name costs set lookups instead of an exists() call per
+  counter. The next counter for each base name is remembered, making a burst
+  of photos with the same timestamp constant time per file. The listing is
+  re-read only when the directory's mtime shows a change made elsewhere
+  (files renamed in or removed, encodes moved into place).
+
+  The chosen name is reserved on disk with an O_EXCL create of an empty
+  placeholder, so a stale listing can never hand out a taken name; the caller
+  then overwrites the placeholder, calling committed() if that went through a
+  rename. release() removes a placeholder that was never written. A run that
+  is killed leaves its placeholders behind, so an empty file this allocator
+  did not reserve itself is taken as one and its name handed out again.
+
+  With dry_run, names are only reserved in memory and nothing is created on
+  disk, so a planner can resolve the collisions a real run would hit. Every
+  directory is then listed once and kept for the allocator's lifetime, since
+  its reservations exist nowhere else.
+  """
+
+  def __init__(self, max_dirs: int = 64, dry_run: bool = False):
+    self.max_dirs = max_dirs
+    self.dry_run = dry_run
+    self._lock = threading.Lock()
+    self._dirs: 'OrderedDict[str, _Directory]' = OrderedDict()
+    # placeholder path -> (inode, mtime_ns) as created, to tell it apart from a written file
+    # (None for a dry-run reservation)
+    self._placeholders: Dict[str, Optional[Tuple[int, int]]] = {}
+
+  def _directory(self, path: str) -> _Directory:
+    entry = self._dirs.get(path)
+    if entry is None or (not self.dry_run and entry.mtime_ns != _mtime_ns(path)):
+      entry = _Directory(path)
+      self._dirs[path] = entry
+      if len(self._dirs) > self.max_dirs and not self.dry_run:
+        self._dirs.popitem(last=False)
+    else:
+      self._dirs.move_to_end(path)
+    return entry
+
+  def _stale_placeholder(self, path: str) -> bool:
+    """Whether path is an empty regular file that was not reserved by this allocator."""
+    if path in self._placeholders:
+      return False
+    try:
+      st = os.lstat(path)
+    except OSError:
+      return False
+    return stat.S_ISREG(st.st_mode) and st.st_size == 0
+
+  def _reserve(self, directory: _Directory, path: str) -> bool:
+    name = os.path.basename(path)
+    if name in directory.names:
+      if not self._stale_placeholder(path):
+        return False
+      if not self.dry_run:
+        try:
+          os.remove(path)
+        except FileNotFoundError:
+          pass
+        except OSError:
+          return False
+    if self.dry_run:
+      directory.names.add(name)
+      self._placeholders[path] = None
+      return True
+    try:
+      fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+      directory.names.add(name)
+      return False
+    try:
+      st = os.fstat(fd)
+    finally:
+      os.close(fd)
+    directory.names.add(name)
+    directory.touched()
+    self._placeholders[path] = (st.st_ino, st.st_mtime_ns)
+    return True
+
+  def allocate(self, dst_path: str, strategy: str = 'counter') -> Optional[str]:
+    """
+    Reserve dst_path, or with strategy 'counter' the first free base_N.ext after it.
+    Returns None if dst_path is taken and strategy is 'skip'.
+    """
+    dst_path = os.path.abspath(dst_path)
+    parent = os.path.dirname(dst_path)
+    with self._lock:
+      directory = self._directory(parent)
+      if directory.mtime_ns is None and not self.dry_run:
+        os.makedirs(parent, exist_ok=True)
+        directory.touched()
+      if self._reserve(directory, dst_path):
+        return dst_path
+      if strategy == 'skip':
+        return None
+      base, ext = os.path.splitext(dst_path)
+      key = (os.path.basename(base), ext)
+      counter = directory.next_counter.get(key, 1)
+      while True:
+        candidate = f"{base}_{counter}{ext}"
+        counter += 1
+        if self._reserve(directory, candidate):
+          directory.next_counter[key] = counter
+          return candidate
+
+  def committed(self, path: str) -> None:
+    """
+    Note that the file reserved at path was written, when writing it changed
+    the directory itself (a temp file renamed over the placeholder, a move
+    into place), so that change does not force a re-list.
+    """
+    if self.dry_run:
+      return
+    with self._lock:
+      directory = self._dirs.get(os.path.dirname(os.path.abspath(path)))
+      if directory is not None:
+        directory.touched()
+
+  def release(self, path: Optional[str]) -> None:
+    """Forget the reservation of path; removes the placeholder if it was never written."""
+    if not path:
+      return
+    path = os.path.abspath(path)
+    with self._lock:
+      created = self._placeholders.pop(path, None)
+      if created is None:
+        return
+      try:
+        st = os.stat(path)
+        unwritten = (st.st_ino, st.st_mtime_ns) == created and st.st_size == 0
+      except OSError:
+        unwritten = False
+        exists = False
+      else:
+        exists = True
+      if unwritten:
+        try:
+          os.remove(path)
+          exists = False
+        except OSError:
+          pass
+      if not exists:
+        self._forget(path)
+
+  def _forget(self, path: str) -> None:
+    directory = self._dirs.get(os.path.dirname(path))
+    if directory is None:
+      return
+    name = os.path.basename(path)
+    directory.names.discard(name)
+    directory.touched()
+    # Let the counter step back so an abandoned name is handed out again
+    base, ext = os.path.splitext(name)
+    match = re.fullmatch(r'(.*)_(\d+)', base)
+    if match:
+      key = (match.group(1), ext)
+      if key in directory.next_counter:
+        directory.next_counter[key] = min(directory.next_counter[key], int(match.group(2)))
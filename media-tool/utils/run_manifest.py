@@ -0,0 +1,157 @@
+"""Write-ahead manifest of per-file import progress, used to resume interrupted runs."""
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+# File states, in the order a successful import goes through them
+DISCOVERED = 'discovered'
+RENAMED = 'renamed'
+STAGING = 'staging'            # written before the staging copy starts
+STAGED = 'staged'
+TIMESTAMPED = 'timestamped'
+SOURCE_REMOVED = 'source-removed'
+# Terminal states for files that did not complete
+SKIPPED = 'skipped'
+ERROR = 'error'
+
+_TERMINAL = {SOURCE_REMOVED, SKIPPED, ERROR}
+
+
+class ManifestEntry:
+  """Progress of one source file; `path` follows it through the in-place rename."""
+
+  def __init__(self, manifest: 'RunManifest', file: str, data: Dict):
+    self._manifest = manifest
+    self.file = file
+    self.data = data
+
+  @property
+  def state(self) -> str:
+    return self.data['state']
+
+  @property
+  def path(self) -> str:
+    return self.data.get('path', self.file)
+
+  def step(self, state: str, **fields) -> None:
+    """Record that this file reached `state` (appended to the manifest before returning)."""
+    self._manifest._record(self, state, fields)
+
+  def finish(self, status: str) -> None:
+    """
+    Close the entry after process_file; no-op if it already reached a terminal
+    state. A success is closed by the pipeline recording SOURCE_REMOVED once
+    the source is gone; if removing it failed the entry stays open, so the
+    next run finds the staged copy and retries the removal.
+    """
+    if self.state in _TERMINAL:
+      return
+    if status == 'error':
+      self.step(ERROR)
+    elif status == 'skipped':
+      self.step(SKIPPED)
+
+
+class RunManifest:
+  """
+  Append-only JSON-lines log of each file's state transitions.
+
+  Every transition is one line, written with a single os.write on an O_APPEND
+  descriptor before the pipeline moves on, so after a crash (of the process,
+  not the machine, unless fsync is set) the manifest shows the last step each
+  file completed. Opening the manifest replays it and keeps only the files
+  that were left unfinished and still exist; begin() hands those back with
+  their recorded state so the pipeline can resume rather than start over.
+  """
+
+  def __init__(self, path: str, fsync: bool = False):
+    self.path = path
+    self.fsync = fsync
+    self._lock = threading.Lock()
+    self._entries: Dict[str, Dict] = {}
+    self._by_path: Dict[str, str] = {}
+    self._load()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    self._compact()
+    self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+  def _load(self) -> None:
+    try:
+      with open(self.path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    except OSError:
+      return
+    entries: Dict[str, Dict] = {}
+    for line in lines:
+      try:
+        record = json.loads(line)
+        file = record.pop('file')
+      except (ValueError, KeyError, TypeError, AttributeError):
+        continue  # torn last line of a crashed run
+      entries.setdefault(file, {}).update(record)
+    for file, data in entries.items():
+      if data.get('state') in _TERMINAL:
+        continue
+      path = data.get('path', file)
+      if not os.path.exists(path):
+        # Moved into staging (or removed by hand): nothing left to resume
+        continue
+      self._entries[file] = data
+      self._by_path[path] = file
+
+  def _compact(self) -> None:
+    temp = self.path + '.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+      for file, data in self._entries.items():
+        f.write(json.dumps({'file': file, **data}, ensure_ascii=False) + '\n')
+    os.replace(temp, self.path)
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def begin(self, path: str) -> ManifestEntry:
+    """Entry for a file picked up from the source folder, resumed if it was left unfinished."""
+    with self._lock:
+      file = self._by_path.get(path)
+      if file is not None:
+        return ManifestEntry(self, file, self._entries[file])
+    entry = ManifestEntry(self, path, {'state': DISCOVERED})
+    self._record(entry, DISCOVERED, {})
+    return entry
+
+  def _record(self, entry: ManifestEntry, state: str, fields: Dict) -> None:
+    line = json.dumps({'file': entry.file, 'state': state, **fields}, ensure_ascii=False) + '\n'
+    with self._lock:
+      os.write(self._fd, line.encode('utf-8'))
+      if self.fsync:
+        os.fsync(self._fd)
+      old_path = entry.path
+      entry.data['state'] = state
+      entry.data.update(fields)
+      if state in _TERMINAL:
+        self._entries.pop(entry.file, None)
+        self._by_path.pop(old_path, None)
+      else:
+        self._entries[entry.file] = entry.data
+        self._by_path.pop(old_path, None)
+        self._by_path[entry.path] = entry.file
+
+  def close(self) -> None:
+    """Close the log, keeping only unfinished files for the next run."""
+    with self._lock:
+      if self._fd is None:
+        return
+      os.close(self._fd)
+      self._fd = None
+      self._compact()
+
+
+def open_run_manifest(config, log_file: str) -> Optional[RunManifest]:
+  """Open the run manifest if manifest.enabled is set; defaults next to log_file."""
+  if not config.get('manifest.enabled', False):
+    return None
+  path = config.get('manifest.path') or os.path.join(
+    os.path.dirname(log_file), 'media_tool_manifest.jsonl'
+  )
+  return RunManifest(path, config.get('manifest.fsync', False))
@@ -0,0 +1,70 @@
+"""On-disk journal of directory listings used for incremental source scans."""
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+# Directories modified this close to the scan are re-listed next time: on
+# coarse-mtime filesystems (FAT, SMB) a file added in the same tick would
+# otherwise leave the mtime unchanged.
+_MTIME_SAFETY_NS = 2 * 1_000_000_000
+
+
+class ScanJournal:
+  """
+  Remembers, per directory, its mtime and the matching files and
+  subdirectories seen when it was last listed.
+
+  A directory's mtime changes whenever an entry is added, removed or
+  renamed in it, so while it is unchanged its remembered listing is still
+  exact and the directory does not need to be read again. Subdirectories
+  are still visited, since changes deeper down do not touch the parent's
+  mtime.
+  """
+
+  VERSION = 1
+
+  def __init__(self, path: str, extensions: List[str]):
+    self.path = path
+    self.extensions = sorted(e.lower() for e in extensions)
+    self._previous: Dict[str, Dict] = {}
+    self._current: Dict[str, Dict] = {}
+    self._scan_start_ns = time.time_ns()
+    self.reused = 0
+    self.listed = 0
+    self._load()
+
+  def _load(self) -> None:
+    try:
+      with open(self.path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    except (OSError, ValueError):
+      return
+    if data.get('version') == self.VERSION and data.get('extensions') == self.extensions:
+      self._previous = data.get('dirs', {})
+
+  def lookup(self, directory: str, mtime_ns: int) -> Optional[Dict]:
+    """Remembered listing {'files': [...], 'dirs': [...]} if directory is unchanged."""
+    entry = self._previous.get(directory)
+    if entry is None or entry.get('mtime_ns') != mtime_ns:
+      return None
+    self.reused += 1
+    self._current[directory] = entry
+    return entry
+
+  def record(self, directory: str, mtime_ns: int, files: List[str], dirs: List[str]) -> None:
+    self.listed += 1
+    trusted = mtime_ns < self._scan_start_ns - _MTIME_SAFETY_NS
+    self._current[directory] = {
+      'mtime_ns': mtime_ns if trusted else None,
+      'files': files,
+      'dirs': dirs,
+    }
+
+  def save(self) -> None:
+    """Persist the listings seen during this scan (directories not visited are dropped)."""
+    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+    temp = self.path + '.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+      json.dump({'version': self.VERSION, 'extensions': self.extensions, 'dirs': self._current}, f)
+    os.replace(temp, self.path)
@@ -0,0 +1,65 @@
+"""Early exit for sources whose output is already in the staging library."""
+import os
+import re
+from typing import List, Optional
+
+from utils.hash_index import partial_hash
+
+# Slack when comparing a staged file's mtime with the photo/video date (FAT stores 2s steps)
+MTIME_SLACK_SEC = 2.0
+
+
+def staged_candidates(staging_path: str) -> List[str]:
+  """
+  staging_path and its _1, _2, ... counter variants present in its folder,
+  in counter order. One listing of the folder, whatever the number of variants.
+  """
+  folder, name = os.path.split(staging_path)
+  base, ext = os.path.splitext(name)
+  pattern = re.compile(re.escape(base) + r'(?:_(\d+))?' + re.escape(ext))
+  found = []
+  try:
+    with os.scandir(folder or '.') as it:
+      for entry in it:
+        match = pattern.fullmatch(entry.name)
+        if match:
+          found.append((int(match.group(1) or 0), entry.path))
+  except OSError:
+    return []
+  return [path for _, path in sorted(found)]
+
+
+def find_staged_output(source_path: str, staging_path: str, timestamp: Optional[float],
+                       hash_index=None) -> Optional[str]:
+  """
+  The file an earlier run staged from source_path, if it is still in place:
+  staging_path or one of its counter variants (burst shots share a name).
+
+  A candidate matches when it is a passthrough copy: same size and partial
+  hash as the source, with its mtime set to the media date (timestamp). With
+  a HashIndex it also matches when the index recorded it as imported from a
+  source of the same size and partial hash and it has not changed since,
+  which covers resized and re-encoded output. Only stats and a few small
+  reads are needed, never a decode or a full hash.
+  """
+  try:
+    size = os.path.getsize(source_path)
+  except OSError:
+    return None
+  partial = None
+  for candidate in staged_candidates(staging_path):
+    try:
+      st = os.stat(candidate)
+    except OSError:
+      continue
+    copied = (timestamp is not None and st.st_size == size
+              and abs(st.st_mtime - timestamp) < MTIME_SLACK_SEC)
+    if not copied and hash_index is None:
+      continue
+    if partial is None:
+      partial = partial_hash(source_path, size)
+    if copied and partial_hash(candidate, size) == partial:
+      return candidate
+    if hash_index is not None and hash_index.is_import_of(candidate, size, partial):
+      return candidate
+  return None
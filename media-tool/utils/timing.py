@@ -0,0 +1,104 @@
+"""Lightweight per-file stage timing and an aggregated end-of-run profile."""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+_local = threading.local()
+
+
+@contextmanager
+def collect_stages() -> Iterator[Dict[str, float]]:
+  """
+  Collect stage() timings made by this thread into the yielded dict (stage -> ms).
+  Used once per file; outside of it stage() is a no-op.
+  """
+  previous = getattr(_local, 'frame', None)
+  stages: Dict[str, float] = {}
+  _local.frame = (stages, [])
+  try:
+    yield stages
+  finally:
+    _local.frame = previous
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+  """
+  Time the enclosed block as stage `name` of the current file.
+
+  Stages may nest; each records only its own time (minus nested stages), so
+  the stages of a file add up to the instrumented time without double counting.
+  """
+  frame = getattr(_local, 'frame', None)
+  if frame is None:
+    yield
+    return
+  stages, stack = frame
+  stack.append(0.0)
+  start = time.perf_counter()
+  try:
+    yield
+  finally:
+    elapsed = (time.perf_counter() - start) * 1000
+    nested = stack.pop()
+    stages[name] = stages.get(name, 0.0) + elapsed - nested
+    if stack:
+      stack[-1] += elapsed
+
+
+def current_stages() -> Dict[str, float]:
+  """Stage breakdown of the current file so far, rounded for logging."""
+  frame = getattr(_local, 'frame', None)
+  if frame is None:
+    return {}
+  return {name: round(ms, 1) for name, ms in frame[0].items()}
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+  if not ordered:
+    return 0.0
+  index = max(0, min(len(ordered) - 1, int(len(ordered) * pct / 100 + 0.5) - 1))
+  return ordered[index]
+
+
+class StageProfile:
+  """Aggregates per-file stage breakdowns over a run (thread-safe)."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._samples: Dict[str, List[float]] = {}
+
+  def add(self, stages_ms: Dict[str, float]) -> None:
+    with self._lock:
+      for name, ms in stages_ms.items():
+        self._samples.setdefault(name, []).append(ms)
+
+  def rows(self) -> List[Dict]:
+    """One row per stage, slowest total first."""
+    with self._lock:
+      samples = {name: sorted(values) for name, values in self._samples.items()}
+    grand_total = sum(sum(v) for v in samples.values()) or 1.0
+    rows = []
+    for name, values in samples.items():
+      total = sum(values)
+      rows.append({
+        'stage': name,
+        'files': len(values),
+        'total_s': round(total / 1000, 2),
+        'mean_ms': round(total / len(values), 1),
+        'p50_ms': round(_percentile(values, 50), 1),
+        'p95_ms': round(_percentile(values, 95), 1),
+        'share': round(total / grand_total * 100, 1),
+      })
+    rows.sort(key=lambda r: r['total_s'], reverse=True)
+    return rows
+
+  def format_table(self) -> str:
+    lines = [f"{'Stage':<12}{'Files':>7}{'Total s':>10}{'Mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'Share':>8}"]
+    for r in self.rows():
+      lines.append(
+        f"{r['stage']:<12}{r['files']:>7}{r['total_s']:>10.2f}{r['mean_ms']:>10.1f}"
+        f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['share']:>7.1f}%"
+      )
+    return '\n'.join(lines)
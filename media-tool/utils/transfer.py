@@ -0,0 +1,161 @@
+"""File transfer engine: rename, reflink or in-kernel copy, picked per device pair."""
+import errno
+import fcntl
+import os
+import shutil
+import threading
+from typing import Dict, List, Tuple
+
+# ioctl(2) request to share the source's extents with the destination (btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+RENAME = 'rename'
+REFLINK = 'reflink'
+COPY_FILE_RANGE = 'copy_file_range'
+SENDFILE = 'sendfile'
+COPY = 'copy'
+
+_COPY_METHODS = [REFLINK, COPY_FILE_RANGE, SENDFILE, COPY]
+
+# errno values meaning "this method does not work between these files", as opposed to real I/O errors
+_UNSUPPORTED = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS, errno.EBADF, errno.EPERM}
+if hasattr(errno, 'ENOTSUP'):
+  _UNSUPPORTED.add(errno.ENOTSUP)
+
+_CHUNK = 64 * 1024 * 1024
+
+
+class _Unsupported(Exception):
+  pass
+
+
+def _reflink(src_fd: int, dst_fd: int, size: int) -> None:
+  try:
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+  except OSError as e:
+    if e.errno in _UNSUPPORTED:
+      raise _Unsupported() from e
+    raise
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, size: int) -> None:
+  if not hasattr(os, 'copy_file_range'):
+    raise _Unsupported()
+  copied = 0
+  while copied < size:
+    try:
+      n = os.copy_file_range(src_fd, dst_fd, min(_CHUNK, size - copied))
+    except OSError as e:
+      if copied == 0 and e.errno in _UNSUPPORTED:
+        raise _Unsupported() from e
+      raise
+    if n == 0:
+      if copied == 0 and size > 0:
+        # Some filesystems report success but copy nothing (e.g. procfs, older overlayfs)
+        raise _Unsupported()
+      break
+    copied += n
+
+
+def _sendfile(src_fd: int, dst_fd: int, size: int) -> None:
+  copied = 0
+  while copied < size:
+    try:
+      n = os.sendfile(dst_fd, src_fd, copied, min(_CHUNK, size - copied))
+    except OSError as e:
+      if copied == 0 and e.errno in _UNSUPPORTED:
+        raise _Unsupported() from e
+      raise
+    if n == 0:
+      if copied == 0 and size > 0:
+        # Some filesystems report success but copy nothing (e.g. procfs, older overlayfs)
+        raise _Unsupported()
+      break
+    copied += n
+
+
+def _copy(src_fd: int, dst_fd: int, size: int) -> None:
+  with open(src_fd, 'rb', closefd=False) as src, open(dst_fd, 'wb', closefd=False) as dst:
+    shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+_COPIERS = {
+  REFLINK: _reflink,
+  COPY_FILE_RANGE: _copy_file_range,
+  SENDFILE: _sendfile,
+  COPY: _copy,
+}
+
+
+class TransferEngine:
+  """
+  Copies (or moves) files using the cheapest method that works.
+
+  A move on the same filesystem is a rename, a pure metadata operation.
+  Copies try, in order: a reflink (FICLONE, shares extents on btrfs/XFS),
+  copy_file_range (in-kernel, lets NFS/SMB servers copy server-side) and
+  sendfile, falling back to a plain read/write loop. The first method that
+  works is remembered per (source device, destination device) pair, so later
+  transfers between the same filesystems go straight to it.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._copy_method: Dict[Tuple[int, int], str] = {}
+    self._no_rename = set()
+
+  def methods(self, src_dev: int, dst_dev: int) -> List[str]:
+    """Copy methods still worth trying between two devices, best first."""
+    with self._lock:
+      best = self._copy_method.get((src_dev, dst_dev))
+    if best is None:
+      return list(_COPY_METHODS)
+    return _COPY_METHODS[_COPY_METHODS.index(best):]
+
+  def transfer(self, src: str, dst: str, move: bool = False) -> str:
+    """
+    Copy src to dst with its permission bits and timestamps, like shutil.copy2.
+    With move=True src may instead be renamed to dst when both are on the same
+    filesystem. Returns the method used; RENAME means src no longer exists.
+    """
+    src_st = os.stat(src)
+    dst_dir = os.path.dirname(os.path.abspath(dst))
+    dst_dev = os.stat(dst_dir).st_dev
+    pair = (src_st.st_dev, dst_dev)
+    if move and src_st.st_dev == dst_dev and pair not in self._no_rename:
+      try:
+        os.replace(src, dst)
+        return RENAME
+      except OSError as e:
+        # Bind mounts of one filesystem share st_dev but still refuse rename
+        if e.errno != errno.EXDEV:
+          raise
+        with self._lock:
+          self._no_rename.add(pair)
+
+    for method in self.methods(*pair):
+      if method == REFLINK and src_st.st_dev != dst_dev:
+        continue
+      try:
+        self._copy_with(method, src, dst, src_st.st_size)
+      except _Unsupported:
+        continue
+      with self._lock:
+        self._copy_method.setdefault(pair, method)
+      shutil.copystat(src, dst)
+      return method
+    raise OSError(f"No transfer method could copy {src} to {dst}")
+
+  @staticmethod
+  def _copy_with(method: str, src: str, dst: str, size: int) -> None:
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+      _COPIERS[method](fsrc.fileno(), fdst.fileno(), size)
+
+
+# Shared engine so the per-device-pair choices are learned once per run
+engine = TransferEngine()
+
+
+def transfer_file(src: str, dst: str, move: bool = False) -> str:
+  """Transfer src to dst through the shared TransferEngine; see TransferEngine.transfer."""
+  return engine.transfer(src, dst, move)
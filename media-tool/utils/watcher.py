@@ -0,0 +1,207 @@
+"""Source folder watching for daemon mode: inotify with a polling fallback."""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utils.file_ops import iter_folder
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY | IN_DELETE_SELF
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+  """
+  Recursive inotify watch on a folder (Linux only).
+
+  poll() yields paths of matching files that were created, written or moved
+  in. Newly created subdirectories are watched and their existing contents
+  reported, since files can land before the watch is in place.
+  """
+
+  def __init__(self, folder: str, extensions: List[str]):
+    self.folder = folder
+    self.extensions = extensions
+    self._suffixes = tuple(e.lower() for e in extensions)
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    self._add_watch = libc.inotify_add_watch
+    self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if self._fd < 0:
+      raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+    self._dirs: Dict[int, str] = {}
+    self._watch_tree(folder)
+
+  def _watch(self, directory: str) -> None:
+    wd = self._add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+    if wd < 0:
+      err = ctypes.get_errno()
+      raise OSError(err, f'inotify_add_watch failed for {directory}: {os.strerror(err)}')
+    self._dirs[wd] = directory
+
+  def _watch_tree(self, top: str) -> None:
+    self._watch(top)
+    for root, dirs, _ in os.walk(top):
+      for d in dirs:
+        self._watch(os.path.join(root, d))
+
+  def poll(self, timeout: float) -> Iterator[str]:
+    readable, _, _ = select.select([self._fd], [], [], timeout)
+    if not readable:
+      return
+    try:
+      data = os.read(self._fd, 64 * 1024)
+    except BlockingIOError:
+      return
+    pos = 0
+    while pos + _EVENT_HEADER.size <= len(data):
+      wd, mask, _, length = _EVENT_HEADER.unpack_from(data, pos)
+      name = data[pos + _EVENT_HEADER.size:pos + _EVENT_HEADER.size + length].rstrip(b'\0')
+      pos += _EVENT_HEADER.size + length
+      if mask & IN_Q_OVERFLOW:
+        # Events were dropped: report everything and let the caller de-duplicate
+        yield from iter_folder(self.folder, self.extensions)
+        continue
+      if mask & IN_IGNORED:
+        self._dirs.pop(wd, None)
+        continue
+      directory = self._dirs.get(wd)
+      if directory is None or not name:
+        continue
+      path = os.path.join(directory, os.fsdecode(name))
+      if mask & IN_ISDIR:
+        if mask & (IN_CREATE | IN_MOVED_TO):
+          try:
+            self._watch_tree(path)
+          except OSError:
+            continue
+          yield from iter_folder(path, self.extensions)
+      elif path.lower().endswith(self._suffixes):
+        yield path
+
+  def close(self) -> None:
+    if self._fd >= 0:
+      os.close(self._fd)
+      self._fd = -1
+
+
+class PollingWatcher:
+  """Fallback watcher that rescans the folder every interval seconds and reports new paths."""
+
+  def __init__(self, folder: str, extensions: List[str], interval: float = 10.0):
+    self.folder = folder
+    self.extensions = extensions
+    self.interval = interval
+    self._known = set(iter_folder(folder, extensions))
+    self._next_scan = time.monotonic() + interval
+
+  def poll(self, timeout: float) -> Iterator[str]:
+    wait = self._next_scan - time.monotonic()
+    if wait > 0:
+      time.sleep(min(wait, timeout))
+      if time.monotonic() < self._next_scan:
+        return
+    self._next_scan = time.monotonic() + self.interval
+    current = set(iter_folder(self.folder, self.extensions))
+    new_paths = current - self._known
+    self._known = current
+    yield from sorted(new_paths)
+
+  def close(self) -> None:
+    pass
+
+
+def create_watcher(folder: str, extensions: List[str], use_inotify: bool = True, poll_interval: float = 10.0):
+  """Return an InotifyWatcher when available, else a PollingWatcher."""
+  if use_inotify:
+    try:
+      return InotifyWatcher(folder, extensions)
+    except (OSError, AttributeError):
+      # Not Linux, no inotify symbols in libc, or out of watches
+      pass
+  return PollingWatcher(folder, extensions, poll_interval)
+
+
+class StableFileTracker:
+  """
+  Debounces candidate files until they stop changing.
+
+  A file is ready once its size and mtime have stayed the same for
+  stable_seconds, so uploads still being written are left alone. Files the
+  daemon already processed are remembered by (device, inode, size) for
+  processed_ttl seconds, so events caused by the pipeline's own in-place
+  rename of a source do not queue it again.
+  """
+
+  def __init__(self, stable_seconds: float = 5.0, processed_ttl: float = 600.0):
+    self.stable_seconds = stable_seconds
+    self.processed_ttl = processed_ttl
+    self._pending: Dict[str, Tuple[Optional[Tuple[int, int]], float]] = {}
+    self._processed: Dict[Tuple[int, int, int], float] = {}
+
+  @staticmethod
+  def _identity(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+      st = os.stat(path)
+    except OSError:
+      return None
+    return st.st_dev, st.st_ino, st.st_size
+
+  def add(self, path: str, now: Optional[float] = None) -> None:
+    now = time.monotonic() if now is None else now
+    identity = self._identity(path)
+    if identity is not None and now < self._processed.get(identity, 0):
+      return
+    if path not in self._pending:
+      self._pending[path] = (None, now)
+
+  def __len__(self) -> int:
+    return len(self._pending)
+
+  def pop_ready(self, now: Optional[float] = None) -> List[str]:
+    """Remove and return the files that have been stable long enough."""
+    now = time.monotonic() if now is None else now
+    ready = []
+    for path, (last_sig, since) in list(self._pending.items()):
+      try:
+        st = os.stat(path)
+      except OSError:
+        del self._pending[path]
+        continue
+      sig = (st.st_size, st.st_mtime_ns)
+      if sig != last_sig:
+        self._pending[path] = (sig, now)
+      elif now - since >= self.stable_seconds:
+        del self._pending[path]
+        ready.append(path)
+    return ready
+
+  def mark_processed(self, path: str, now: Optional[float] = None) -> None:
+    now = time.monotonic() if now is None else now
+    identity = self._identity(path)
+    if identity is not None:
+      self._processed[identity] = now + self.processed_ttl
+    for key, expiry in list(self._processed.items()):
+      if expiry <= now:
+        del self._processed[key]
+
+  def renew_processed(self, now: Optional[float] = None) -> None:
+    """Restart the TTL of every remembered file (e.g. after a long initial import)."""
+    now = time.monotonic() if now is None else now
+    for key in self._processed:
+      self._processed[key] = now + self.processed_ttl
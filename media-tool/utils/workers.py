@@ -0,0 +1,45 @@
+"""Worker pools for running the media pipeline in parallel."""
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+
+def imap_bounded(fn: Callable[[Any], Any], items: Iterable[Any], max_workers: int,
+                 queue_size: int = 0) -> Iterator[Tuple[Any, Any]]:
+  """
+  Run fn over items on a thread pool, yielding (item, result) as tasks complete.
+
+  At most queue_size tasks are in flight at any time, so items may be a lazy
+  iterator over a very large folder without materialising it in memory.
+  Results are consumed by the calling thread, so callers can aggregate them
+  without locking.
+  """
+  max_workers = max(1, max_workers)
+  if queue_size <= 0:
+    queue_size = max_workers * 2
+  queue_size = max(queue_size, max_workers)
+
+  with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='media-io') as pool:
+    pending = {}
+    for item in items:
+      if len(pending) >= queue_size:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+          yield pending.pop(future), future.result()
+      pending[pool.submit(fn, item)] = item
+    while pending:
+      done, _ = wait(pending, return_when=FIRST_COMPLETED)
+      for future in done:
+        yield pending.pop(future), future.result()
+
+
+def create_process_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+  """
+  Create a process pool for CPU-bound work (Pillow resizes), or None if disabled.
+
+  Workers are spawned rather than forked because the pool is fed from
+  I/O threads, and forking a multi-threaded process is unsafe.
+  """
+  if not workers or workers <= 0:
+    return None
+  return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))